@@ -252,10 +252,10 @@ class WaterFloodingModelSolver():
         # 压强方程对应的位移散度矩阵, (\nabla\cdot u, w) 位移散度矩阵
         # * 注意这里利用了压强空间分片常数, 线性函数导数也是分片常数的事实
         cellmeasure = self.mesh.entity_measure('cell')
-        cellmeasure *= self.model.rock['biot']
+        cellmeasure = cellmeasure*self.model.rock['biot']
 
         gphi = self.mesh.grad_lambda() # (NC, TD+1, GD)
-        gphi *= cellmeasure[:, None, None]
+        gphi = gphi*cellmeasure[:, None, None]
         pc2d = self.pspace.cell_to_dof()
         cc2d = self.cspace.cell_to_dof()
         pgdof = self.pspace.number_of_global_dofs()
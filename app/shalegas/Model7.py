@@ -201,10 +201,10 @@ class WaterFloodingModelSolver():
         # 压强方程对应的位移散度矩阵, (\nabla\cdot u, w) 位移散度矩阵
         # * 注意这里利用了压强空间分片常数, 线性函数导数也是分片常数的事实
         c = self.mesh.entity_measure('cell')
-        c *= self.model.rock['biot']
+        c = c*self.model.rock['biot']
 
         val = self.mesh.grad_lambda() # (NC, TD+1, GD)
-        val *= c[:, None, None]
+        val = val*c[:, None, None]
         pc2d = self.pspace.cell_to_dof()
         cc2d = self.cspace.cell_to_dof()
         pgdof = self.pspace.number_of_global_dofs()
@@ -562,7 +562,7 @@ class WaterFloodingModelSolver():
         val = self.mesh.grad_lambda() # (NC, TD+1, GD)
         c = self.cs[:]*self.model.rock['biot'] # (NC, ), 注意用当前的水饱和度
         c *= cellmeasure 
-        val *= c[:, None, None]
+        val = val*c[:, None, None]
 
         pgdof = self.pspace.number_of_global_dofs() # 压力空间自由度个数
         cgdof = self.cspace.number_of_global_dofs() # 连续空间自由度个数
@@ -6,6 +6,7 @@ from scipy.sparse import csr_matrix, coo_matrix, bmat, diags
 from scipy.sparse.linalg import spsolve
 
 from fealpy.decorator import barycentric
+from fealpy.boundarycondition import dirichlet_elimination
 from fealpy.timeintegratoralg.timeline import UniformTimeLine
 from fealpy.functionspace import LagrangeFiniteElementSpace
 from fealpy.functionspace import RaviartThomasFiniteElementSpace2d
@@ -105,10 +106,10 @@ class TwoFluidsWithGeostressSimulator():
         # 压力方程对应的位移散度矩阵, (\nabla\cdot u, w) 位移散度矩阵
         # * 注意这里利用了压力空间分片常数, 线性函数导数也是分片常数的事实
         c = self.mesh.entity_measure('cell')
-        c *= self.mesh.celldata['biot']
+        c = c*self.mesh.celldata['biot']
 
         val = self.mesh.grad_lambda() # (NC, TD+1, GD)
-        val *= c[:, None, None]
+        val = val*c[:, None, None]
         pc2d = self.pspace.cell_to_dof()
         cc2d = self.cspace.cell_to_dof()
         pgdof = self.pspace.number_of_global_dofs()
@@ -358,7 +359,7 @@ class TwoFluidsWithGeostressSimulator():
         val = self.mesh.grad_lambda() # (NC, TD+1, GD)
         c = self.cs[:]*b # (NC, ), 注意用当前的水饱和度
         c *= cellmeasure 
-        val *= c[:, None, None]
+        val = val*c[:, None, None]
 
         pgdof = self.pspace.number_of_global_dofs() # 压力空间自由度个数
         cgdof = self.cspace.number_of_global_dofs() # 连续空间自由度个数
@@ -587,7 +588,12 @@ class TwoFluidsWithGeostressSimulator():
         注意这里的拉梅常数是单元分片常数
         lam.shape == (NC, ) # MPa
         mu.shape == (NC, ) # MPa
+
+        format 为 'bsr' 时返回按结点交错排列的 BSR 矩阵, 块的大小为 (GD, GD)
         """
+        if format == 'bsr':
+            return self.cspace.linear_elasticity_matrix(lam, mu, format='bsr',
+                    q=q)
 
         GD = self.GD
         if GD == 2:
@@ -634,9 +640,7 @@ class TwoFluidsWithGeostressSimulator():
                 C[j][i] = C[i][j].T 
 
         if format == 'csr':
-            return bmat(C, format='csr') # format = bsr ??
-        elif format == 'bsr':
-            return bmat(C, format='bsr')
+            return bmat(C, format='csr')
         elif format == 'list':
             return C
 
@@ -645,13 +649,7 @@ class TwoFluidsWithGeostressSimulator():
         A, F, isBdDof = self.get_total_system()
 
         # 处理边界条件, 这里是 0 边界
-        gdof = len(isBdDof)
-        bdIdx = np.zeros(gdof, dtype=np.int_)
-        bdIdx[isBdDof] = 1 
-        Tbd = diags(bdIdx)
-        T = diags(1-bdIdx)
-        A = T@A@T + Tbd
-        F[isBdDof] = 0.0
+        A, F = dirichlet_elimination(A, isBdDof, F=F, inplace=True)
 
         # 求解
         if ctx is None:
@@ -737,13 +735,7 @@ class TwoFluidsWithGeostressSimulator():
 
         isBdDof = np.r_['0', isBdDof1, isBdDof2, isBdDof3]
 
-        gdof = len(isBdDof)
-        bdIdx = np.zeros(gdof, dtype=np.int_)
-        bdIdx[isBdDof] = 1 
-        Tbd = diags(bdIdx)
-        T = diags(1-bdIdx)
-        A = T@A@T + Tbd
-        F[isBdDof] = 0.0
+        A, F = dirichlet_elimination(A, isBdDof, F=F, inplace=True)
 
         #[   S, None,   SP,  SU0,  SU1, SU2]
         if ctx is None:
@@ -820,13 +812,7 @@ class TwoFluidsWithGeostressSimulator():
 
         isBdDof = np.r_['0', isBdDof1, isBdDof2, isBdDof3]
 
-        gdof = len(isBdDof)
-        bdIdx = np.zeros(gdof, dtype=np.int_)
-        bdIdx[isBdDof] = 1 
-        Tbd = diags(bdIdx)
-        T = diags(1-bdIdx)
-        A = T@A@T + Tbd
-        F[isBdDof] = 0.0
+        A, F = dirichlet_elimination(A, isBdDof, F=F, inplace=True)
 
         #[   S, None,   SP,  SU0,  SU1, SU2]
         solver = FastSover(A, F)
@@ -130,12 +130,13 @@ for i in range(maxit):
     space = LagrangeFiniteElementSpace(mesh, p=p)
     NDof[i] = space.number_of_global_dofs()
     uh = space.function() 	# 返回一个有限元函数，初始自由度值全为 0
-    A = space.stiff_matrix(c=pde.diffusion_coefficient)
-    B = space.convection_matrix(c=pde.convection_coefficient)
-    M = space.mass_matrix(c=pde.reaction_coefficient)
+    # 三个矩阵一起组装, 共用基函数的值和稀疏结构
+    A, B, M = space.construct_matrices([
+        ('stiff', pde.diffusion_coefficient),
+        ('convection', pde.convection_coefficient),
+        ('mass', pde.reaction_coefficient)])
     F = space.source_vector(pde.source)
-    A += B 
-    A += M
+    A = space.assembly_plan().combine([A, B, M])
     
     bc = DirichletBC(space, pde.dirichlet)
     A, F = bc.apply(A, F, uh)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+#
+"""
+
+Notes
+-----
+测试并行组装刚度矩阵的强可扩展性。
+
+用法:
+    python3 ParallelAssembly_example.py p n d nprocs...
+
+例如在四面体网格上用 3 次元, 分别用 1, 16, 32, 64 个进程组装:
+    python3 ParallelAssembly_example.py 3 5 3 1 16 32 64
+"""
+
+import sys
+import numpy as np
+from timeit import default_timer as dtimer
+
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+p = int(sys.argv[1])
+n = int(sys.argv[2])
+d = int(sys.argv[3])
+nps = [int(a) for a in sys.argv[4:]] or [1, 2, 4]
+
+if d == 2:
+    from fealpy.pde.poisson_2d import CosCosData as PDE
+elif d == 3:
+    from fealpy.pde.poisson_3d import CosCosCosData as PDE
+
+pde = PDE()
+mesh = pde.init_mesh(n=n)
+space = LagrangeFiniteElementSpace(mesh, p=p)
+print('NC:', mesh.number_of_cells(), 'gdof:', space.number_of_global_dofs())
+
+space.assembly_plan() # 稀疏结构只生成一次, 不计入组装时间
+
+start = dtimer()
+A = space.stiff_matrix()
+t0 = dtimer() - start
+print('serial: {:.3f}s'.format(t0))
+
+for nprocs in nps:
+    start = dtimer()
+    B = space.parallel_stiff_matrix(nprocs=nprocs)
+    t = dtimer() - start
+    print('nprocs: {:3d}, time: {:.3f}s, speedup: {:.2f}, identical: {}'.format(
+        nprocs, t, t0/t, np.array_equal(A.data, B.data)))
@@ -10,6 +10,7 @@ import pyamg
 from fealpy.pde.poisson_2d import LShapeRSinData
 from fealpy.functionspace import LagrangeFiniteElementSpace
 from fealpy.boundarycondition import DirichletBC
+from fealpy.quadrature import CellMatrixCache
 
 from fealpy.mesh.adaptive_tools import mark
 from fealpy.tools.show import showmultirate
@@ -32,10 +33,11 @@ mesh.add_plot(plt)
 plt.savefig('./test-0.png')
 plt.close()
 
+cache = CellMatrixCache() # 只在新单元上计算单元矩阵
 for i in range(maxit):
     print('step:', i)
     space = LagrangeFiniteElementSpace(mesh, p=p)
-    A = space.stiff_matrix()
+    A = space.stiff_matrix(cache=cache)
     F = space.source_vector(pde.source)
 
     NDof[i] = space.number_of_global_dofs()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#
+"""
+
+Notes
+-----
+比较 np.add.at 和 fealpy.common.scatter_add 在各个组装位置上的速度。
+
+用法:
+    python3 ScatterAdd_example.py p n
+
+例如在 3 次元, 初始网格加密 7 次的三角形网格上测试:
+    python3 ScatterAdd_example.py 3 7
+"""
+
+import sys
+import numpy as np
+from timeit import default_timer as dtimer
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.common import scatter_add
+
+p = int(sys.argv[1])
+n = int(sys.argv[2])
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2**n, ny=2**n, meshtype='tri')
+space = LagrangeFiniteElementSpace(mesh, p=p)
+
+NC = mesh.number_of_cells()
+NE = mesh.number_of_edges()
+gdof = space.number_of_global_dofs()
+ldof = space.number_of_local_dofs()
+cell2dof = space.cell_to_dof()
+edge2dof = space.edge_to_dof()
+edge2cell = mesh.ds.edge_to_cell()
+print('NC:', NC, 'gdof:', gdof)
+
+smldof = (p+1)*(p+2)//2
+cases = [
+    # (名称, target, index, value)
+    ('source_vector', np.zeros(gdof), cell2dof, np.random.rand(NC, ldof)),
+    ('source_vector(dim=2)', np.zeros((gdof, 2)), (cell2dof, np.s_[:]),
+        np.random.rand(NC, ldof, 2)),
+    ('grad_recovery', np.zeros((gdof, 2)), cell2dof,
+        np.random.rand(NC, ldof, 2)),
+    ('grad_recovery(deg)', np.zeros(gdof), cell2dof, 1.0),
+    ('NeumannBC', np.zeros(gdof), edge2dof, np.random.rand(NE, p+1)),
+    ('residual_estimate', np.zeros(NC), edge2cell[:, 0], np.random.rand(NE)),
+    ('ScaledMonomial H', np.zeros((NC, smldof, smldof)), edge2cell[:, 0],
+        np.random.rand(NE, smldof, smldof)),
+    ('VEM matrix_B', np.zeros((smldof, gdof)), (np.s_[:], cell2dof),
+        np.random.rand(smldof, NC, ldof)),
+    ]
+
+print('{:>24s} {:>12s} {:>12s} {:>8s}'.format('call site', 'np.add.at', 'scatter_add', 'speedup'))
+for name, target, index, value in cases:
+    a = target.copy()
+    start = dtimer()
+    np.add.at(a, index, value)
+    t0 = dtimer() - start
+
+    b = target.copy()
+    start = dtimer()
+    scatter_add(b, index, value)
+    t1 = dtimer() - start
+
+    assert np.allclose(a, b)
+    print('{:>24s} {:12.4f} {:12.4f} {:8.1f}'.format(name, t0, t1, t0/t1))
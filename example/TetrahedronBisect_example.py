@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#
+"""
+
+Notes
+-----
+测试 TetrahedronMesh.bisect 的速度和内存峰值: 在立方体网格上反复加密靠近一
+点或一个球面的单元, 模拟自适应有限元中的局部加密。
+
+用法:
+    python3 TetrahedronBisect_example.py n maxit
+
+例如在 20x20x20 的初始网格上加密 6 次:
+    python3 TetrahedronBisect_example.py 20 6
+"""
+
+import sys
+import tracemalloc
+import numpy as np
+from timeit import default_timer as dtimer
+
+from fealpy.mesh import MeshFactory as MF
+
+n = int(sys.argv[1])
+maxit = int(sys.argv[2])
+
+mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=n, ny=n, nz=n, meshtype='tet')
+np.random.seed(0)
+
+print('{:>4s} {:>10s} {:>10s} {:>10s} {:>12s}'.format(
+    'it', 'NC', 'marked', 'time(s)', 'peak(MB)'))
+total = 0.0
+for i in range(maxit):
+    bc = mesh.entity_barycenter('cell')
+    r = np.linalg.norm(bc - 0.5, axis=-1)
+    h = mesh.entity_measure('cell')**(1/3)
+    isMarkedCell = (r < 2*h) | (np.abs(r - 0.3) < h)
+
+    tracemalloc.start()
+    start = dtimer()
+    mesh.bisect(isMarkedCell)
+    end = dtimer()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total += end - start
+    print('{:4d} {:10d} {:10d} {:10.3f} {:12.1f}'.format(
+        i, mesh.number_of_cells(), isMarkedCell.sum(), end - start, peak/2**20))
+
+print('total time:', total)
+print('volume:', mesh.entity_measure('cell').sum())
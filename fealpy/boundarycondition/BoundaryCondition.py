@@ -1,5 +1,118 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, bmat
+from scipy.sparse import bsr_matrix
+from scipy.sparse.linalg import LinearOperator
+from ..common import scatter_add
+
+
+def is_interleaved(A, dim):
+    """
+
+    Notes
+    -----
+    判断向量型问题的矩阵 A 的自由度是否按结点交错排列, 即块大小为 (dim, dim)
+    的 BSR 矩阵, 见 `LagrangeFiniteElementSpace.linear_elasticity_matrix` 。
+    """
+    return isinstance(A, bsr_matrix) and (A.blocksize == (dim, dim))
+
+
+def dirichlet_elimination(A, isDDof, F=None, x=None, inplace=False):
+    """
+
+    Parameters
+    ----------
+    A: csr_matrix 或者 bsr_matrix, 其它稀疏格式会先转为 CSR
+    isDDof: Dirichlet 自由度的布尔数组或者编号数组, 向量型问题的自由度可以按分
+        量排列 (np.tile(isDDof, dim)), 也可以按结点交错排列
+        (np.repeat(isDDof, dim), 对应块大小为 (dim, dim) 的 BSR 矩阵)
+    F: 右端向量, 默认为 None
+    x: Dirichlet 自由度上的值, 只用到 x[isDDof], 默认为 0
+    inplace: 为 True 时直接修改 A.data
+
+    Returns
+    -------
+    A: 或者 (A, F), F 为 ndarray 时原地修改
+
+    Notes
+    -----
+    把 A 中 Dirichlet 自由度对应的行和列置零, 对角元置为 1, 并把 Dirichlet 值
+    提升到右端 F -= A[:, isDDof]@x[isDDof], F[isDDof] = x[isDDof] 。结果和
+    T@A@T + Tbd 相同, 但只需要对 `indptr/indices/data` 做一遍 O(nnz) 的运算,
+    不做稀疏矩阵乘法。
+
+    结果和 A 共享 `indptr` 和 `indices`, 稀疏结构不变 (被消去的元素作为显式的
+    0 保留下来), 所以基于稀疏结构的组装计划, 符号分解和 AMG 的结构都可以继续
+    使用。只有当某个 Dirichlet 自由度的对角元不在稀疏结构中时才会增加非零元。
+
+    有重复元素的 (非规范的) A 会先合并重复元素 (inplace 为 False 时在副本上
+    合并), 这时结果的稀疏结构是合并后的。
+    """
+    if not isinstance(A, (csr_matrix, bsr_matrix)):
+        A = A.tocsr()
+        inplace = True # 已经是新的矩阵
+
+    if not A.has_canonical_format: # 先合并重复的元素, 否则对角元会被多次置为 1
+        if not inplace:
+            A = A.copy()
+            inplace = True
+        A.sum_duplicates()
+
+    N = A.shape[0]
+    isDDof = np.asarray(isDDof)
+    if isDDof.dtype != np.bool_:
+        flag = np.zeros(N, dtype=np.bool_)
+        flag[isDDof] = True
+        isDDof = flag
+
+    if F is not None:
+        F = F if isinstance(F, np.ndarray) else np.array(F)
+        if x is not None:
+            x = np.asarray(x)
+            xd = np.zeros(N, dtype=x.dtype)
+            xd[isDDof] = x[isDDof]
+            F -= A@xd
+            F[isDDof] = xd[isDDof]
+        else:
+            F[isDDof] = 0
+
+    m, n = A.blocksize if isinstance(A, bsr_matrix) else (1, 1)
+    I = np.repeat(np.arange(N//m), np.diff(A.indptr))
+    J = A.indices
+    data = A.data if inplace else A.data.copy()
+    isDiag = (I == J)
+    if m == 1:
+        data[isDDof[I] | isDDof[J]] = 0
+        isDiag &= isDDof[I]
+        data[isDiag] = 1
+        hasDiag = np.zeros(N, dtype=np.bool_)
+        hasDiag[I[isDiag]] = True
+    else: # 块矩阵, 在块内置零
+        flag = isDDof.reshape(-1, m)
+        data *= ~flag[I][:, :, None]
+        data *= ~flag[J][:, None, :]
+        k = np.arange(m)
+        D = data[isDiag]
+        D[:, k, k] += flag[I[isDiag]]
+        data[isDiag] = D
+        hasDiag = np.zeros(N//m, dtype=np.bool_)
+        hasDiag[I[isDiag]] = True
+        hasDiag = np.repeat(hasDiag, m)
+
+    if inplace:
+        B = A
+    else:
+        B = A.__class__((data, A.indices, A.indptr), shape=A.shape, copy=False)
+        B.has_sorted_indices = A.has_sorted_indices
+
+    miss = isDDof & ~hasDiag
+    if np.any(miss): # 对角元不在稀疏结构中
+        D = spdiags(miss.astype(A.dtype), 0, N, N)
+        B = (B + D).asformat(A.format) if m == 1 else (B + D).tobsr(
+                blocksize=(m, n))
+
+    if F is None:
+        return B
+    return B, F
 
 
 class DirichletBC():
@@ -19,35 +132,35 @@ class DirichletBC():
         if uh is None:
             uh = self.space.function(dim=dim)
         isDDof = space.set_dirichlet_bc(uh, gD, threshold=threshold)
-        if dim > 1:
+        if (dim > 1) and is_interleaved(A, dim): # 按结点交错排列的 BSR 矩阵
+            isDDof = np.repeat(isDDof, dim)
+            F = F.flat
+            x = uh.flat
+        elif dim > 1:
             isDDof = np.tile(isDDof, dim)
             F = F.T.flat
-        x = uh.T.flat # 把 uh 按列展平
-        F -= A@x
-        bdIdx = np.zeros(A.shape[0], dtype=np.int)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
-        F[isDDof] = x[isDDof]
-        return A, F 
-
-    def apply_on_matrix(self, A):
+            x = uh.T.flat # 把 uh 按列展平
+        else:
+            x = uh
+        if isinstance(A, LinearOperator): # 无矩阵的算子
+            F -= A@x
+            A = A.dirichlet(isDDof)
+            F[isDDof] = x[isDDof]
+            return A, F
+        return dirichlet_elimination(A, isDDof, F=F, x=x)
+
+    def apply_on_matrix(self, A, threshold=None):
         space = self.space
         gdof = space.number_of_global_dofs()
         threshold = self.threshold if threshold is None else threshold
 
         isDDof = space.boundary_dof(threshold=threshold)
         dim = A.shape[0]//gdof # 如果是向量型问题
-        if dim > 1:
+        if (dim > 1) and is_interleaved(A, dim):
+            isDDof = np.repeat(isDDof, dim)
+        elif dim > 1:
             isDDof = np.tile(isDDof, dim)
-
-        bdIdx = np.zeros((A.shape[0], ), np.int)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
-        return A
+        return dirichlet_elimination(A, isDDof)
 
     def apply_on_vector(self, A, F):
         space = self.space
@@ -171,9 +284,9 @@ class BoundaryCondition():
             val, kappa = self.robin(pp, n) # (NQ, NF, ...)
             bb = np.einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
             if dim == 1:
-                np.add.at(b, face2dof[idx], bb)
+                scatter_add(b, face2dof[idx], bb)
             else:
-                np.add.at(b, (face2dof[idx], np.s_[:]), bb)
+                scatter_add(b, (face2dof[idx], np.s_[:]), bb)
 
             FM = np.einsum('m, mi, mij, mik, i->ijk', ws, kappa, phi, phi, measure)
 
@@ -226,9 +339,9 @@ class BoundaryCondition():
             val = self.neumann(pp, n) # (NQ, NF, ...)
             bb = np.einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
             if dim == 1:
-                np.add.at(b, face2dof[idx], bb)
+                scatter_add(b, face2dof[idx], bb)
             else:
-                np.add.at(b, (face2dof[idx], np.s_[:]), bb)
+                scatter_add(b, (face2dof[idx], np.s_[:]), bb)
 
 
     def apply_dirichlet_bc(self, A, b, uh, is_dirichlet_boundary=None):
@@ -263,15 +376,7 @@ class BoundaryCondition():
             if dim > 1:
                 isDDof = np.tile(isDDof, dim)
                 b = b.T.flat
-            gdof = self.space.number_of_global_dofs()
             x = uh.T.flat # 把 uh 按列展平
-            b -= A@x
-            bdIdx = np.zeros(dim*gdof, dtype=np.int)
-            bdIdx[isDDof] = 1
-            Tbd = spdiags(bdIdx, 0, dim*gdof, dim*gdof)
-            T = spdiags(1-bdIdx, 0, dim*gdof, dim*gdof)
-            A = T@A@T + Tbd
-            b[isDDof] = x[isDDof]
-            return A, b
+            return dirichlet_elimination(A, isDDof, F=b, x=x)
 
 
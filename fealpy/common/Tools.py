@@ -8,6 +8,18 @@ def ranges(nv, start = 0):
     id_arr[0] = start
     return id_arr.cumsum()
 
+def index_type(n, itype=np.int32):
+    """
+
+    Notes
+    -----
+    能存下 0, 1, ..., n 的整数类型: itype 够用时就用 itype, 否则提升为 int64 。
+    """
+    itype = np.dtype(itype)
+    if n > np.iinfo(itype).max:
+        return np.dtype(np.int64)
+    return itype
+
 def hash2map(dec, ha):
     n = ha.shape[1]
     b = np.floor(dec.reshape(-1, 1)/2**np.arange(n))%2
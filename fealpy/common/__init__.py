@@ -1,3 +1,6 @@
 from .Tools import *
 from .block import block, block_diag
 from .DynamicArray import DynamicArray
+from .scatter import scatter_add, segment_sum
+from .contraction import einsum, clear_einsum_cache
+from .fingerprint import array_fingerprint, cache_state, same_cache_state
@@ -0,0 +1,114 @@
+"""
+
+Notes
+-----
+组装中用到的 einsum 缩并。
+
+np.einsum(..., optimize=True) 每次调用都要重新搜索缩并路径, 而组装程序总是用同
+样的下标和形状反复调用它, 单元上的数组又比较小, 路径搜索的开销很可观。这里按
+(下标, 各个数组的形状) 缓存缩并路径, 只在第一次遇到时搜索。
+
+单元矩阵中最常见的缩并
+
+    'i, ijk..., ijm..., j->jkm'
+
+(i 为积分点, j 为单元, 其它下标求和) 直接转成批量的矩阵乘法 (matmul)。
+"""
+
+import numpy as np
+
+_paths = {}
+_kernels = {}
+MAXPATHS = 1024 # 缓存的缩并路径的个数上限
+
+
+def einsum(subscripts, *operands):
+    """
+
+    Notes
+    -----
+    和 np.einsum(subscripts, *operands, optimize=True) 的结果相同。
+    """
+    kernel = _kernels.get(subscripts)
+    if kernel is None:
+        kernel = _match_kernel(subscripts)
+        _kernels[subscripts] = kernel
+    if kernel is not False:
+        val = kernel(*operands)
+        if val is not None:
+            return val
+
+    key = (subscripts, ) + tuple(np.shape(a) for a in operands)
+    path = _paths.get(key)
+    if path is None:
+        if len(_paths) >= MAXPATHS:
+            _paths.clear()
+        path = np.einsum_path(subscripts, *operands, optimize='greedy')[0]
+        _paths[key] = path
+    return np.einsum(subscripts, *operands, optimize=path)
+
+
+def clear_einsum_cache():
+    _paths.clear()
+    _kernels.clear()
+
+
+def _match_kernel(subscripts):
+    """
+
+    Notes
+    -----
+    判断 subscripts 是不是 'i, ijk..., ijm..., j->jkm' 的形式, 是的话返回对应的
+    批量矩阵乘法, 否则返回 False 。
+    """
+    s = subscripts.replace(' ', '')
+    if '->' not in s:
+        return False
+    ins, out = s.split('->')
+    ins = ins.split(',')
+    if len(ins) != 4:
+        return False
+    q, c, s0, s1 = ins[0], ins[3], ins[1], ins[2]
+    if (len(q) != 1) or (len(c) != 1) or (q == c):
+        return False
+    if (len(s0) < 3) or (len(s1) < 3) or (s0[:2] != q + c) or (s1[:2] != q + c):
+        return False
+    k, m, rest = s0[2], s1[2], s0[3:]
+    if (s1[3:] != rest) or (k == m) or (out != c + k + m):
+        return False
+    if len(set(q + c + k + m + rest.replace('.', ''))) != 4 + len(rest.replace('.', '')):
+        return False
+    return _gram
+
+
+def _gram(ws, phi0, phi1, measure):
+    """
+
+    Notes
+    -----
+    M[j] = \\sum_i ws[i]*measure[j]*phi0[i, j]^T phi1[i, j], 其中 phi0[i, j] 和
+    phi1[i, j] 的第 0 个轴为基函数, 其余的轴一起求和。
+
+    形状不符合要求时返回 None, 交给 np.einsum 计算。
+    """
+    if (ws.ndim != 1) or (measure.ndim != 1) or (phi0.ndim != phi1.ndim) \
+            or (phi0.ndim < 3) or (phi0.shape[3:] != phi1.shape[3:]):
+        return None
+    NQ = len(ws)
+    NC = len(measure)
+    if (phi0.shape[0] != NQ) or (phi1.shape[0] != NQ) or \
+            (phi0.shape[1] not in {1, NC}) or (phi1.shape[1] not in {1, NC}):
+        return None
+
+    k = phi0.shape[2]
+    m = phi1.shape[2]
+    n = int(np.prod(phi0.shape[3:], dtype=np.int_))
+    w = np.multiply.outer(ws, measure).reshape((NQ, NC) + (1, )*(phi0.ndim - 2))
+
+    # (NC, k, NQ*n) @ (NC, NQ*n, m)
+    A = np.moveaxis(w*phi0, 2, 0).reshape(k, NQ, NC, n)
+    A = A.transpose(2, 0, 1, 3).reshape(NC, k, NQ*n)
+    B = np.broadcast_to(phi1, (NQ, NC) + phi1.shape[2:])
+    B = np.moveaxis(B, 2, -1).reshape(NQ, NC, n, m)
+    B = B.transpose(1, 0, 2, 3).reshape(NC, NQ*n, m)
+    return A@B
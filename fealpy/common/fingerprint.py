@@ -0,0 +1,66 @@
+import zlib
+
+import numpy as np
+
+
+def array_fingerprint(a, nsample=1024):
+    """
+
+    Parameters
+    ----------
+    a : numpy.ndarray, 如网格的 node
+    nsample : 参与校验的最多行数
+
+    Returns
+    -------
+    key : (shape, checksum), 可以用 == 比较
+
+    Notes
+    -----
+    网格上的各种缓存 (GeometryCache, FaceIntegralAlg, PointLocator) 除了比较
+    node 是不是同一个数组, 还用这个键检查 node 是否被原地修改过 (如
+    `mesh.node *= scale` 或者 `node[:] = ...` )。
+
+    只对均匀取出的至多 nsample 行做 adler32 校验, 代价和网格规模无关, 整体的
+    缩放, 平移和光滑等修改都能发现。只原地修改少数几个节点时可能发现不了,
+    这时需要手动调用缓存的 clear() 。
+    """
+    shape = a.shape
+    if len(a) > nsample:
+        a = a[np.linspace(0, len(a)-1, nsample).astype(np.int_)]
+    return shape, zlib.adler32(np.ascontiguousarray(a).view(np.uint8))
+
+
+def cache_state(node, *keys):
+    """
+
+    Parameters
+    ----------
+    node : 网格的节点数组
+    keys : 缓存还依赖的其它数组 (如 cell, edge) 或者个数
+
+    Returns
+    -------
+    state : (node, *keys, node 的指纹), 用 same_cache_state 比较
+
+    Notes
+    -----
+    GeometryCache, FaceIntegralAlg 和 PointLocator 共用的失效规则: node 和
+    keys 中的数组被替换 (加密, 二分或者移动网格节点), keys 中的个数改变, 或者
+    node 被原地修改 (指纹改变) 时, 缓存失效。
+    """
+    return (node, ) + keys + (array_fingerprint(node), )
+
+
+def same_cache_state(state0, state1):
+    """
+
+    Notes
+    -----
+    比较 cache_state 返回的两个状态, 数组按是不是同一个对象比较, 其它的 (个数,
+    指纹) 用 == 比较。state0 为 None 时返回 False 。
+    """
+    if (state0 is None) or (len(state0) != len(state1)):
+        return False
+    return all((a is b) if isinstance(a, np.ndarray) else (a == b)
+            for a, b in zip(state0, state1))
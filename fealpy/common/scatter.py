@@ -0,0 +1,106 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def scatter_add(target, index, value):
+    """
+
+    Parameters
+    ----------
+    target : numpy.ndarray, 形状为 (n, ...) 的数组, 原地累加
+    index : 整数数组, 或者 (index, np.s_[:]), (np.s_[:], index) 形式的元组
+    value : 可以广播成 index.shape + target.shape[1:] 的数组或者数
+
+    Returns
+    -------
+    target : 累加后的 target
+
+    Notes
+    -----
+    和 np.add.at(target, index, value) 的结果相同, 即把 value 按 index 累加到
+    target 的第 0 个轴上, 例如把单元向量组装到全局向量上:
+
+        scatter_add(b, cell2dof, bb) # b.shape == (gdof, ), bb.shape == (NC, ldof)
+        scatter_add(b, (cell2dof, np.s_[:]), bb) # bb.shape == (NC, ldof, dim)
+
+    也可以累加到其它的轴上, 如 scatter_add(B, (np.s_[:], idx), val) 。
+
+    np.add.at 是不带缓冲的逐个元素累加, 非常慢。这里用 np.bincount 计算分段求和,
+    target 每个分量的列数较多时, 改用一个 (n, m) 的 0-1 稀疏矩阵乘 value 。
+
+    其它形式的 index (如布尔数组或者多个轴的整数数组) 直接调用 np.add.at 。
+    """
+    if isinstance(index, tuple):
+        # 只有一个轴上是整数数组, 其它轴都是 np.s_[:]
+        axes = [i for i, a in enumerate(index) 
+                if not (isinstance(a, slice) and (a == np.s_[:]))]
+        if len(axes) != 1:
+            np.add.at(target, index, value)
+            return target
+
+        axis = axes[0]
+        index = np.asarray(index[axis])
+        if axis > 0: # 把要累加的轴换到最前面
+            shape = target.shape[:axis] + index.shape + target.shape[axis+1:]
+            value = np.broadcast_to(value, shape)
+            value = np.moveaxis(value, range(axis, axis+index.ndim),
+                    range(index.ndim))
+            scatter_add(np.moveaxis(target, axis, 0), index, value)
+            return target
+
+    index = np.asarray(index)
+    if not np.issubdtype(index.dtype, np.integer):
+        np.add.at(target, index, value)
+        return target
+
+    n = target.shape[0]
+    shape = target.shape[1:]
+    I = index.reshape(-1)
+    if (len(I) > 0) and (I.min() < 0): # 负数下标
+        I = np.where(I < 0, I + n, I)
+
+    if np.ndim(value) == 0: # 常数, 只需要计数
+        val = np.bincount(I, minlength=n)*value
+        target += val.reshape((n, ) + (1, )*len(shape))
+        return target
+
+    m = len(I)
+    k = int(np.prod(shape))
+    value = np.broadcast_to(value, index.shape + shape).reshape(m, k)
+    val = segment_sum(I, value, n)
+    if np.issubdtype(target.dtype, np.integer) and \
+            np.issubdtype(value.dtype, np.integer):
+        val = val.astype(target.dtype)
+    target += val.reshape(target.shape)
+    return target
+
+
+def segment_sum(index, value, n):
+    """
+
+    Parameters
+    ----------
+    index : (m, ) 整数数组, 取值在 [0, n) 之间
+    value : (m, ) 或者 (m, k) 的数组
+    n : 结果的行数
+
+    Returns
+    -------
+    val : (n, ) 或者 (n, k) 的数组, val[i] = sum(value[index == i])
+    """
+    if np.iscomplexobj(value):
+        return segment_sum(index, value.real, n) \
+                + 1j*segment_sum(index, value.imag, n)
+
+    if value.ndim == 1:
+        return np.bincount(index, weights=value, minlength=n)
+
+    m, k = value.shape
+    if k <= 16:
+        val = np.empty((n, k), dtype=np.float64)
+        for j in range(k):
+            val[:, j] = np.bincount(index, weights=value[:, j], minlength=n)
+    else:
+        P = csr_matrix((np.ones(m), (index, np.arange(m))), shape=(n, m))
+        val = P@value
+    return val
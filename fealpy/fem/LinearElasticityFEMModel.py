@@ -15,6 +15,7 @@ from ..functionspace.lagrange_fem_space import LagrangeFiniteElementSpace
 from ..functionspace.mixed_fem_space import HuZhangFiniteElementSpace
 from .integral_alg import IntegralAlg
 from .doperator import stiff_matrix
+from ..common import einsum
 from timeit import default_timer as timer
 import cProfile
 
@@ -104,12 +105,12 @@ class LinearElasticityFEMModel:
             for i, bc in enumerate(bcs):
                 phi = tspace.basis(bc)
                 aphi = self.pde.compliance_tensor(phi)
-                M += ws[i]*np.einsum('jkm, m, jom->jko', aphi, d, phi, optimize=True)
+                M += ws[i]*einsum('jkm, m, jom->jko', aphi, d, phi)
             M *= self.measure[..., np.newaxis, np.newaxis]
         else:
             phi = tspace.basis(bcs)
             aphi = self.pde.compliance_tensor(phi)
-            M = np.einsum('i, ijkm, m, ijom, j->jko', ws, aphi, d, phi, self.measure, optimize=True)
+            M = einsum('i, ijkm, m, ijom, j->jko', ws, aphi, d, phi, self.measure)
 
         tcell2dof = tspace.cell_to_dof()
         I = np.einsum('ij, k->ijk', tcell2dof, np.ones(tldof))
@@ -124,12 +125,12 @@ class LinearElasticityFEMModel:
             for i, bc in enumerate(bcs):
                 dphi = tspace.div_basis(bc)
                 uphi = vspace.basis(bc)
-                B += ws[i]*np.einsum('km, jom->jko', uphi, dphi, optimize=True)
+                B += ws[i]*einsum('km, jom->jko', uphi, dphi)
             B *= self.measure[..., np.newaxis, np.newaxis]
         else:
             dphi = tspace.div_basis(bcs)
             uphi = vspace.basis(bcs)
-            B = np.einsum('i, ikm, ijom, j->jko', ws, uphi, dphi, self.measure, optimize=True)
+            B = einsum('i, ikm, ijom, j->jko', ws, uphi, dphi, self.measure)
 
         I = np.einsum('ij, k->ijk', vspace.cell_to_dof(), np.ones(tldof))
         J = np.einsum('ij, k->ikj', tspace.cell_to_dof(), np.ones(vldof))
@@ -2,13 +2,14 @@ import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye
 from timeit import default_timer as timer
 from itertools import combinations
+from ..common import einsum
 
 def stiff_matrix(space, qf, measure, cfun=None, barycenter=True):
     bcs, ws = qf.quadpts, qf.weights
     gphi = space.grad_basis(bcs)
 
     # Compute the element sitffness matrix
-    A = np.einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, measure, optimize=True)
+    A = einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, measure)
     cell2dof = space.cell_to_dof()
     ldof = space.number_of_local_dofs()
     I = np.einsum('k, ij->ijk', np.ones(ldof), cell2dof)
@@ -26,10 +27,10 @@ def stiff_matrix_1(space, qf, measure):
     cell2dof = space.cell_to_dof()
     ldof = space.number_of_local_dofs()
 
-    D = np.einsum('i, ijkm, ijkm, j->jk', ws, gphi, gphi, measure, optimize=True)
+    D = einsum('i, ijkm, ijkm, j->jk', ws, gphi, gphi, measure)
     A = coo_matrix((D.flat, (cell2dof.flat, cell2dof.flat)), shape=(gdof, gdof))
     for i, j in combinations(range(ldof), 2):
-        D = np.einsum('i, ijm, ijm, j->j', ws, gphi[..., i, :], gphi[..., j, :], measure, optimize=True)
+        D = einsum('i, ijm, ijm, j->j', ws, gphi[..., i, :], gphi[..., j, :], measure)
         A += coo_matrix((D, (cell2dof[:, i], cell2dof[:, j])), shape=(gdof, gdof))
         A += coo_matrix((D, (cell2dof[:, j], cell2dof[:, i])), shape=(gdof, gdof))
 
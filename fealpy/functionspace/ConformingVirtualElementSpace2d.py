@@ -7,6 +7,8 @@ from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from ..common import scatter_add
+from ..common import einsum
 
 
 class CVEMDof2d():
@@ -214,9 +216,9 @@ class ConformingVirtualElementSpace2d():
 
         uh = self.function(dim=2)
         ws = np.zeros(uh.shape[0], dtype=self.ftype)
-        np.add.at(uh[:, 0], cell2dof, sx)
-        np.add.at(uh[:, 1], cell2dof, sy)
-        np.add.at(ws, cell2dof, w)
+        scatter_add(uh[:, 0], cell2dof, sx)
+        scatter_add(uh[:, 1], cell2dof, sy)
+        scatter_add(ws, cell2dof, w)
         uh /=ws.reshape(-1, 1)
         return uh
 
@@ -592,8 +594,8 @@ class ConformingVirtualElementSpace2d():
 
             uI = self.function()
             ws = np.zeros(uI.shape[0], dtype=self.ftype)
-            np.add.at(uI, cell2dof, uh)
-            np.add.at(ws, cell2dof, w)
+            scatter_add(uI, cell2dof, uh)
+            scatter_add(ws, cell2dof, w)
             uI /=ws
             return uI
 
@@ -701,18 +703,18 @@ class ConformingVirtualElementSpace2d():
 
             NV = mesh.number_of_vertices_of_cells()
 
-            val = np.einsum('i, ijmk, jk->mji', ws, gphi0, nm, optimize=True)
+            val = einsum('i, ijmk, jk->mji', ws, gphi0, nm)
             idx = cell2dofLocation[edge2cell[:, [0]]] + \
                     (edge2cell[:, [2]]*p + np.arange(p+1))%(NV[edge2cell[:, [0]]]*p)
-            np.add.at(B, (np.s_[:], idx), val)
+            scatter_add(B, (np.s_[:], idx), val)
 
 
             if isInEdge.sum() > 0:
-                val = np.einsum('i, ijmk, jk->mji', ws, gphi1, -nm[isInEdge], optimize=True)
+                val = einsum('i, ijmk, jk->mji', ws, gphi1, -nm[isInEdge])
                 idx = cell2dofLocation[edge2cell[isInEdge, 1]].reshape(-1, 1) + \
                         (edge2cell[isInEdge, 3].reshape(-1, 1)*p + np.arange(p+1)) \
                         %(NV[edge2cell[isInEdge, 1]].reshape(-1, 1)*p)
-                np.add.at(B, (np.s_[:], idx), val)
+                scatter_add(B, (np.s_[:], idx), val)
             return B
 
     def matrix_G(self, B, D):
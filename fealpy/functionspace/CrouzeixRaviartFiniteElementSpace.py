@@ -5,6 +5,7 @@ from ..decorator import barycentric
 from ..quadrature import FEMeshIntegralAlg
 
 from .Function import Function
+from ..common import scatter_add
 
 class CRDof():
     def __init__(self, mesh):
@@ -337,9 +338,9 @@ class CrouzeixRaviartFiniteElementSpace():
                     ws, fval, phi, self.cellmeasure)
         cell2dof = self.cell_to_dof() #(NC, ldof)
         if dim is None:
-            np.add.at(b, cell2dof, bb)
+            scatter_add(b, cell2dof, bb)
         else:
-            np.add.at(b, (cell2dof, np.s_[:]), bb)
+            scatter_add(b, (cell2dof, np.s_[:]), bb)
 
         return b
 
@@ -9,6 +9,7 @@ from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from ..common import ranges
 from ..common import block, block_diag
+from ..common import scatter_add
 
 class DFNCVEMDof2d():
     """
@@ -390,19 +391,19 @@ class DivFreeNonConformingVirtualElementSpace2d:
         # val: (ndof, NE, p)
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, n[:, 0])
         # x[0]: (ndof, 1, 1)  idx0: (NE, p) --> x[0] and idx0: (ndof, NE, p)
-        np.add.at(R00, (x[0][:, None, None], idx0), val)
+        scatter_add(R00, (x[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, 0.5*n[:, 1])
-        np.add.at(R00, (y[0][:, None, None], idx0), val)
+        scatter_add(R00, (y[0][:, None, None], idx0), val)
 
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, 0.5*n[:, 0])
-        np.add.at(R11, (x[0][:, None, None], idx0), val)
+        scatter_add(R11, (x[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, n[:, 1])
-        np.add.at(R11, (y[0][:, None, None], idx0), val)
+        scatter_add(R11, (y[0][:, None, None], idx0), val)
 
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, 0.5*n[:, 0])
-        np.add.at(R01, (y[0][:, None, None], idx0), val)
+        scatter_add(R01, (y[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, 0.5*n[:, 1])
-        np.add.at(R10, (x[0][:, None, None], idx0), val)
+        scatter_add(R10, (x[0][:, None, None], idx0), val)
 
         a2 = area**2
         start = cell2dofLocation[edge2cell[:, 0]] + edge2cell[:, 2]*p
@@ -410,7 +411,7 @@ class DivFreeNonConformingVirtualElementSpace2d:
         val = np.einsum('jm, jm, j, j->mj',
             h3, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 1])
         # y[0]: (ndof, 1)  start: (NE, ) -->  y[0] and start : (ndof, NE)
-        np.add.at(R00, (y[0][:, None], start), val)
+        scatter_add(R00, (y[0][:, None], start), val)
 
         val = np.einsum('jm, jm, j, j->mj',
             h3, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 0])
@@ -422,7 +423,7 @@ class DivFreeNonConformingVirtualElementSpace2d:
 
         val = np.einsum('jm, jm, j, j->mj',
             h2, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 0])
-        np.add.at(R11, (x[0][:, None], start), val)
+        scatter_add(R11, (x[0][:, None], start), val)
 
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1)
@@ -456,11 +457,11 @@ class DivFreeNonConformingVirtualElementSpace2d:
 
             val = np.einsum('jm, jm, j, j->mj',
                 h3, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 0])
-            np.add.at(R01, (y[0][:, None], start[isInEdge]), val[:, isInEdge])
+            scatter_add(R01, (y[0][:, None], start[isInEdge]), val[:, isInEdge])
 
             val = np.einsum('jm, jm, j, j->mj',
                 h2, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 1])
-            np.add.at(R10, (x[0][:, None], start[isInEdge]), val[:, isInEdge])
+            scatter_add(R10, (x[0][:, None], start[isInEdge]), val[:, isInEdge])
 
             val = np.einsum('jm, jm, j, j->mj',
                 h2, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 0])
@@ -491,9 +492,9 @@ class DivFreeNonConformingVirtualElementSpace2d:
 
         idx0 = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
         val = np.einsum('ijk, i->jik', F0, n[:, 0])
-        np.add.at(J0, (np.s_[:], idx0), val)
+        scatter_add(J0, (np.s_[:], idx0), val)
         val = np.einsum('ijk, i->jik', F0, n[:, 1])
-        np.add.at(J1, (np.s_[:], idx0), val)
+        scatter_add(J1, (np.s_[:], idx0), val)
 
         if isInEdge.sum() > 0:
             idx0 = cell2dofLocation[edge2cell[:, [1]]] + edge2cell[:, [3]]*p + np.arange(p)
@@ -540,14 +541,14 @@ class DivFreeNonConformingVirtualElementSpace2d:
         phi = self.smspace.edge_basis(ps, p=p-1)
         F0 = np.einsum('i, ijm, ijn->jmn', ws, phi, phi0)
         idx = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
-        np.add.at(D0, (idx, np.s_[:]), F0)
+        scatter_add(D0, (idx, np.s_[:]), F0)
 
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p)
             F1 = np.einsum('i, ijm, ijn->jmn', ws, phi, phi1)
             idx = cell2dofLocation[edge2cell[:, [1]]] + edge2cell[:, [3]]*p + np.arange(p)
-            np.add.at(D0, (idx[isInEdge], np.s_[:]), F1[isInEdge])
+            scatter_add(D0, (idx[isInEdge], np.s_[:]), F1[isInEdge])
 
         D1 = np.zeros((NC, 2, idof, smldof), dtype=self.ftype)
         def u0(x, index):
@@ -634,11 +635,11 @@ class DivFreeNonConformingVirtualElementSpace2d:
 
         idx = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
         val = np.einsum('jmn, j-> mjn', F0, n[:, 0])
-        np.add.at(U00, (np.s_[:], idx), val)
-        np.add.at(U11, (np.s_[:], idx), val)
+        scatter_add(U00, (np.s_[:], idx), val)
+        scatter_add(U11, (np.s_[:], idx), val)
         val = np.einsum('jmn, j-> mjn', F0, n[:, 1])
-        np.add.at(U10, (np.s_[:], idx), val)
-        np.add.at(U21, (np.s_[:], idx), val)
+        scatter_add(U10, (np.s_[:], idx), val)
+        scatter_add(U21, (np.s_[:], idx), val)
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1) 
             F1 = np.einsum('i, ijm, ijn, j, j->jmn', ws, phi1, phi, eh, eh)
@@ -850,10 +851,10 @@ class DivFreeNonConformingVirtualElementSpace2d:
             list(map(u1, range(NC)))
             gdof = self.number_of_global_dofs()
             b = np.zeros((gdof, ), dtype=self.ftype)
-            np.add.at(b, cell2dof, eb[0])
-            np.add.at(b[NE*p:], cell2dof, eb[1])
+            scatter_add(b, cell2dof, eb[0])
+            scatter_add(b[NE*p:], cell2dof, eb[1])
             c2d = self.cell_to_dof(doftype='cell')
-            np.add.at(b, c2d, cb)
+            scatter_add(b, c2d, cb)
             return b
         else:
             area = self.smspace.cellmeasure
@@ -4,6 +4,7 @@ from numpy.linalg import inv
 from ..decorator import barycentric
 from .Function import Function
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from ..common import einsum
 
 class FKNDof2d:
     def __init__(self, mesh, p):
@@ -480,8 +481,8 @@ class FirstKindNedelecFiniteElementSpace2d:
 
         measure = self.integralalg.edgemeasure[index]
         gdof = self.number_of_global_dofs()
-        uh[edge2dof[index]] = np.einsum('i, ij, ijm, j->jm', ws, val, phi,
-                measure, optimize=True)
+        uh[edge2dof[index]] = einsum('i, ij, ijm, j->jm', ws, val, phi,
+                measure)
         isDDof = np.zeros(gdof, dtype=np.bool_) 
         isDDof[edge2dof[index]] = True
         return isDDof
@@ -1,8 +1,9 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csr_matrix, csc_matrix, spdiags, bmat
+from scipy.sparse import bsr_matrix
 from scipy.sparse.linalg import spsolve
 
-from ..decorator import barycentric
+from ..decorator import barycentric, cartesian
 
 from .Function import Function
 
@@ -15,12 +16,25 @@ from .femdof import multi_index_matrix
 from .femdof import CPLFEMDof1d, CPLFEMDof2d, CPLFEMDof3d
 from .femdof import DPLFEMDof1d, DPLFEMDof2d, DPLFEMDof3d
 
+from .LagrangeMatrixFreeOperator import LagrangeMatrixFreeOperator
+
 from ..quadrature import FEMeshIntegralAlg
+from ..quadrature import AssemblyPlan
 from ..decorator import timer
+from ..common import scatter_add
+from ..common import einsum
 
 
 class LagrangeFiniteElementSpace():
-    def __init__(self, mesh, p=1, spacetype='C', q=None, dof=None):
+    def __init__(self, mesh, p=1, spacetype='C', q=None, dof=None, ftype=None):
+        """
+
+        Parameters
+        ----------
+        ftype: 基函数表, 单元矩阵和组装出的矩阵的浮点类型, 默认为 mesh.ftype 。
+            取为 np.float32 时, 网格的几何量仍然用 mesh.ftype 计算, 组装时的
+            累加用 float64 进行, 最后再转成 float32 。
+        """
         self.mesh = mesh
         self.cellmeasure = mesh.entity_measure('cell')
         self.p = p
@@ -62,16 +76,22 @@ class LagrangeFiniteElementSpace():
 
         self.spacetype = spacetype
         self.itype = mesh.itype
-        self.ftype = mesh.ftype
+        self.ftype = mesh.ftype if ftype is None else np.dtype(ftype)
 
         q = q if q is not None else p+3 
         self.integralalg = FEMeshIntegralAlg(
                 self.mesh, q,
-                cellmeasure=self.cellmeasure)
+                cellmeasure=self.cellmeasure,
+                ftype=self.ftype)
         self.integrator = self.integralalg.integrator
 
         self.multi_index_matrix = multi_index_matrix 
 
+        self.assemblyplans = {}
+        self.basistables = {}
+        self.maxtablepoints = 1000 # 缓存的参考单元数据的最大点数和总字节数
+        self.maxtablebytes = 2**24
+
     def __str__(self):
         return "Lagrange finite element space!"
 
@@ -169,8 +189,8 @@ class LagrangeFiniteElementSpace():
         J = facemeasure*np.sum((grad[face2cell[:, 0]] - grad[face2cell[:, 1]])*n, axis=-1)**2
         
         eta = np.zeros(NC, dtype=self.ftype)
-        np.add.at(eta, face2cell[:, 0], J)
-        np.add.at(eta, face2cell[:, 1], J)
+        scatter_add(eta, face2cell[:, 0], J)
+        scatter_add(eta, face2cell[:, 1], J)
         eta *= ch 
         eta *= 0.25 # 2D: 1/8, 3D:   
 
@@ -211,9 +231,9 @@ class LagrangeFiniteElementSpace():
         if method == 'simple':
             deg = np.bincount(cell2dof.flat, minlength = gdof)
             if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+                scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             else:
-                np.add.at(rguh, cell2dof, guh)
+                scatter_add(rguh, cell2dof, guh)
 
         elif method == 'area':
             measure = self.mesh.entity_measure('cell')
@@ -221,9 +241,9 @@ class LagrangeFiniteElementSpace():
             deg = np.bincount(cell2dof.flat,weights = ws.flat, minlength = gdof)
             guh = np.einsum('ij..., i->ij...', guh, measure)
             if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+                scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             else:
-                np.add.at(rguh, cell2dof, guh)
+                scatter_add(rguh, cell2dof, guh)
 
         elif method == 'distance':
             ipoints = self.interpolation_points()
@@ -233,9 +253,9 @@ class LagrangeFiniteElementSpace():
             deg = np.bincount(cell2dof.flat,weights = d.flat, minlength = gdof)
             guh = np.einsum('ij..., ij->ij...', guh, d)
             if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+                scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             else:
-                np.add.at(rguh, cell2dof, guh)
+                scatter_add(rguh, cell2dof, guh)
 
         elif method == 'area_harmonic':
             measure = 1/self.mesh.entity_measure('cell')
@@ -243,9 +263,9 @@ class LagrangeFiniteElementSpace():
             deg = np.bincount(cell2dof.flat,weights = ws.flat, minlength = gdof)
             guh = np.einsum('ij..., i->ij...', guh, measure)
             if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+                scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             else:
-                np.add.at(rguh, cell2dof, guh)
+                scatter_add(rguh, cell2dof, guh)
 
         elif method == 'distance_harmonic':
             ipoints = self.interpolation_points()
@@ -255,9 +275,9 @@ class LagrangeFiniteElementSpace():
             deg = np.bincount(cell2dof.flat,weights = d.flat, minlength = gdof)
             guh = np.einsum('ij..., ij->ij...',guh,d)
             if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+                scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             else:
-                np.add.at(rguh, cell2dof, guh)
+                scatter_add(rguh, cell2dof, guh)
         rguh /= deg.reshape(-1, 1)
         return rguh
 
@@ -322,18 +342,117 @@ class LagrangeFiniteElementSpace():
             bcs[idx, ..., nmap[lidx]] = bc[..., 1]
             bcs[idx, ..., pmap[lidx]] = bc[..., 0]
 
-        p = self.p   # the degree of polynomial basis function
-        TD = self.TD
+        R = self.grad_basis_table(bcs)
+
+        Dlambda = self.mesh.grad_lambda()
+        Dlambda = Dlambda[index, :, :].astype(self.ftype, copy=False)
+        gphi = np.einsum('k...ij, kjm->k...im', R, Dlambda)
+        return gphi
+
+    @barycentric
+    def face_basis(self, bc):
+        phi = self.basis_table(bc)
+        return phi[..., np.newaxis, :] # (..., 1, ldof)
 
+    def basis_table(self, bc, p=None):
+        """
+
+        Parameters
+        ----------
+        bc : numpy.ndarray
+            the shape of `bc` can be `(TD+1,)` or `(NQ, TD+1)`
+
+        Returns
+        -------
+        phi : numpy.ndarray
+            参考单元上基函数的值, the shape of `phi` can be `(ldof, )` or
+            `(NQ, ldof)`
+
+        Notes
+        -----
+        参考单元上的基函数值和网格无关, 第一次计算后按 (p, bc) 缓存在空间中, 返回
+        的是只读数组。
+        """
+        p = self.p if p is None else p
+        return self.cached_table('basis', bc, p, self._basis_table)
+
+    def grad_basis_table(self, bc, p=None):
+        """
+
+        Parameters
+        ----------
+        bc : numpy.ndarray
+            the shape of `bc` can be `(TD+1,)` or `(NQ, TD+1)`
+
+        Returns
+        -------
+        R : numpy.ndarray
+            基函数关于重心坐标的导数, the shape of `R` can be `(ldof, TD+1)`
+            or `(NQ, ldof, TD+1)`
+
+        Notes
+        -----
+        和 basis_table 一样按 (p, bc) 缓存在空间中。基函数的梯度为
+        R@Dlambda, 只有 Dlambda 和网格有关。
+        """
+        p = self.p if p is None else p
+        return self.cached_table('grad_basis', bc, p, self._grad_basis_table)
+
+    def cached_table(self, name, bc, p, fun):
+        """
+
+        Notes
+        -----
+        在缓存 self.basistables 中查找 (name, p, bc) 对应的参考单元数据, 找不到
+        就用 fun(bc, p) 计算并存起来。
+
+        只缓存积分点这样的点数不超过 self.maxtablepoints 的一维或二维 bc 数组,
+        逐点求值 (如 point_value) 的 bc 每次都不同, 直接计算。缓存的总字节数
+        不超过 self.maxtablebytes, 超过时扔掉最早的数据。
+        """
+        if (bc.ndim > 2) or (bc.ndim == 2 and len(bc) > self.maxtablepoints):
+            return fun(bc, p)
+
+        key = (name, p, bc.shape, bc.dtype.str, bc.tobytes())
+        val = self.basistables.get(key)
+        if val is None:
+            val = fun(bc, p)
+            val.setflags(write=False)
+            if val.nbytes > self.maxtablebytes:
+                return val
+            nbytes = sum(v.nbytes for v in self.basistables.values())
+            while nbytes + val.nbytes > self.maxtablebytes:
+                nbytes -= self.basistables.pop(next(iter(self.basistables))).nbytes
+            self.basistables[key] = val
+        return val
+
+    def _basis_table(self, bc, p):
+        TD = bc.shape[-1] - 1 
+        multiIndex = self.multi_index_matrix[TD](p)
+
+        c = np.arange(1, p+1, dtype=np.int_)
+        P = 1.0/np.multiply.accumulate(c)
+        t = np.arange(0, p)
+        shape = bc.shape[:-1]+(p+1, TD+1)
+        A = np.ones(shape, dtype=self.ftype)
+        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
+        np.cumprod(A, axis=-2, out=A)
+        A[..., 1:, :] *= P.reshape(-1, 1)
+        idx = np.arange(TD+1)
+        phi = np.prod(A[..., multiIndex, idx], axis=-1)
+        return phi
+
+    def _grad_basis_table(self, bc, p):
+        TD = bc.shape[-1] - 1 
         multiIndex = self.multi_index_matrix[TD](p)
 
         c = np.arange(1, p+1, dtype=self.itype)
         P = 1.0/np.multiply.accumulate(c)
 
         t = np.arange(0, p)
-        shape = bcs.shape[:-1]+(p+1, TD+1)
+        shape = bc.shape[:-1]+(p+1, TD+1)
         A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bcs[..., np.newaxis, :] - t.reshape(-1, 1)
+        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
 
         FF = np.einsum('...jk, m->...kjm', A[..., 1:, :], np.ones(p))
         FF[..., range(p), range(p)] = p
@@ -347,36 +466,14 @@ class LagrangeFiniteElementSpace():
 
         Q = A[..., multiIndex, range(TD+1)]
         M = F[..., multiIndex, range(TD+1)]
-        ldof = self.number_of_local_dofs()
-        shape = bcs.shape[:-1]+(ldof, TD+1)
+        ldof = len(multiIndex)
+        shape = bc.shape[:-1]+(ldof, TD+1)
         R = np.zeros(shape, dtype=self.ftype)
         for i in range(TD+1):
             idx = list(range(TD+1))
             idx.remove(i)
             R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
-
-        Dlambda = self.mesh.grad_lambda()
-        gphi = np.einsum('k...ij, kjm->k...im', R, Dlambda[index, :, :])
-        return gphi
-
-    @barycentric
-    def face_basis(self, bc):
-        p = self.p   # the degree of polynomial basis function
-        TD = bc.shape[1] - 1
-        multiIndex = self.multi_index_matrix[TD](p)
-
-        c = np.arange(1, p+1, dtype=np.int)
-        P = 1.0/np.multiply.accumulate(c)
-        t = np.arange(0, p)
-        shape = bc.shape[:-1]+(p+1, TD+1)
-        A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
-        np.cumprod(A, axis=-2, out=A)
-        A[..., 1:, :] *= P.reshape(-1, 1)
-        idx = np.arange(TD+1)
-        phi = np.prod(A[..., multiIndex, idx], axis=-1)
-        return phi[..., np.newaxis, :] # (..., 1, ldof)
-
+        return R
 
     @barycentric
     def basis(self, bc, index=np.s_[:], p=None):
@@ -408,19 +505,7 @@ class LagrangeFiniteElementSpace():
             else:
                 return np.ones((bc.shape[0], 1), dtype=self.ftype)
 
-        TD = bc.shape[-1] - 1 
-        multiIndex = self.multi_index_matrix[TD](p)
-
-        c = np.arange(1, p+1, dtype=np.int)
-        P = 1.0/np.multiply.accumulate(c)
-        t = np.arange(0, p)
-        shape = bc.shape[:-1]+(p+1, TD+1)
-        A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
-        np.cumprod(A, axis=-2, out=A)
-        A[..., 1:, :] *= P.reshape(-1, 1)
-        idx = np.arange(TD+1)
-        phi = np.prod(A[..., multiIndex, idx], axis=-1)
+        phi = self.basis_table(bc, p=p)
         return phi[..., np.newaxis, :] # (..., 1, ldof)
 
     @barycentric
@@ -447,42 +532,11 @@ class LagrangeFiniteElementSpace():
 
         """
 
-        if p is None:
-            p= self.p
-        TD = self.TD
-
-        multiIndex = self.multi_index_matrix[TD](p)
-
-        c = np.arange(1, p+1, dtype=self.itype)
-        P = 1.0/np.multiply.accumulate(c)
-
-        t = np.arange(0, p)
-        shape = bc.shape[:-1]+(p+1, TD+1)
-        A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
-
-        FF = np.einsum('...jk, m->...kjm', A[..., 1:, :], np.ones(p))
-        FF[..., range(p), range(p)] = p
-        np.cumprod(FF, axis=-2, out=FF)
-        F = np.zeros(shape, dtype=self.ftype)
-        F[..., 1:, :] = np.sum(np.tril(FF), axis=-1).swapaxes(-1, -2)
-        F[..., 1:, :] *= P.reshape(-1, 1)
-
-        np.cumprod(A, axis=-2, out=A)
-        A[..., 1:, :] *= P.reshape(-1, 1)
-
-        Q = A[..., multiIndex, range(TD+1)]
-        M = F[..., multiIndex, range(TD+1)]
-        ldof = self.number_of_local_dofs()
-        shape = bc.shape[:-1]+(ldof, TD+1)
-        R = np.zeros(shape, dtype=self.ftype)
-        for i in range(TD+1):
-            idx = list(range(TD+1))
-            idx.remove(i)
-            R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
+        R = self.grad_basis_table(bc, p=p)
 
         Dlambda = self.mesh.grad_lambda()
-        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda[index,:,:])
+        Dlambda = Dlambda[index, :, :].astype(self.ftype, copy=False)
+        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda)
         return gphi #(..., NC, ldof, GD)
 
     @barycentric
@@ -497,6 +551,35 @@ class LagrangeFiniteElementSpace():
         val = np.einsum(s1, phi, uh[e2d])
         return val
 
+    @cartesian
+    def point_value(self, uh, points):
+        """
+
+        Parameters
+        ----------
+        uh: (gdof, ...) 的有限元函数
+        points: (..., GD) 的任意一组点
+
+        Returns
+        -------
+        val: (..., ...) uh 在这些点处的值, 网格外的点上为 nan
+
+        Notes
+        -----
+        点所在的单元和重心坐标由 `mesh.location` 给出, 每个点只计算它所在单元
+        上的基函数, 所以 `uh.point_value(points)` 的代价和点数成正比。
+        """
+        points = np.asarray(points)
+        cellidx, bc = self.mesh.location(points.reshape(-1, points.shape[-1]),
+                return_bc=True)
+        flag = cellidx >= 0
+        phi = self._basis_table(bc[flag], self.p) # (n, ldof), 不进入缓存
+        cell2dof = self.dof.cell2dof[cellidx[flag]]
+
+        val = np.full((len(cellidx), ) + uh.shape[1:], np.nan, dtype=self.ftype)
+        val[flag] = np.einsum('ij, ij...->i...', phi, np.asarray(uh)[cell2dof])
+        return val.reshape(points.shape[:-1] + uh.shape[1:])
+
     @barycentric
     def grad_value(self, uh, bc, index=np.s_[:]):
         """
@@ -618,7 +701,7 @@ class LagrangeFiniteElementSpace():
         cc = np.einsum('m, mik, i->ik', ws, phi, self.cellmeasure)
         gdof = self.number_of_global_dofs()
         c = np.zeros(gdof, dtype=self.ftype)
-        np.add.at(c, cell2dof, cc)
+        scatter_add(c, cell2dof, cc)
         return c
 
     def revcovery_matrix(self, rtype='simple'):
@@ -634,7 +717,7 @@ class LagrangeFiniteElementSpace():
         elif rtype == 'harmonic':
             gphi = gphi/cellmeasure.reshape(-1, 1, 1)
             d = np.zeros(NN, dtype=np.float)
-            np.add.at(d, cell, 1/cellmeasure.reshape(-1, 1))
+            scatter_add(d, cell, 1/cellmeasure.reshape(-1, 1))
             D = spdiags(1/d, 0, NN, NN)
 
         I = np.einsum('k, ij->ijk', np.ones(GD+1), cell)
@@ -647,7 +730,19 @@ class LagrangeFiniteElementSpace():
     def linear_elasticity_matrix(self, lam, mu, format='csr', q=None):
         """
         construct the linear elasticity fem matrix
+
+        Notes
+        -----
+        format 为 'csr' 或 'list' 时, 自由度按分量排列, 即 (GD*gdof, GD*gdof)
+        的矩阵由 GD x GD 个标量矩阵拼成, 对应 uh.T.flat 。
+
+        format 为 'bsr' 时, 直接从单元块矩阵组装按结点交错排列的 BSR 矩阵, 块的
+        大小为 (GD, GD), 对应 uh.flat, 见 `linear_elasticity_cell_matrix` 。这
+        时 lam 和 mu 可以是单元分片常数 (NC, )。
         """
+        if format == 'bsr':
+            K = self.linear_elasticity_cell_matrix(lam, mu, q=q)
+            return self.assembly_plan().assemble_block(K)
 
         GD = self.GD
         if GD == 2:
@@ -673,7 +768,7 @@ class LagrangeFiniteElementSpace():
         gdof = self.number_of_global_dofs()
         cellmeasure = self.cellmeasure
         for k, (i, j) in enumerate(idx):
-            Aij = np.einsum('i, ijm, ijn, j->jmn', ws, grad[..., i], grad[..., j], cellmeasure)
+            Aij = einsum('i, ijm, ijn, j->jmn', ws, grad[..., i], grad[..., j], cellmeasure)
             A.append(csr_matrix((Aij.flat, (I.flat, J.flat)), shape=(gdof, gdof)))
 
         T = csr_matrix((gdof, gdof), dtype=self.ftype)
@@ -692,12 +787,81 @@ class LagrangeFiniteElementSpace():
                     C[i][j] = lam*A[imap[(i, j)]] + mu*A[imap[(i, j)]].T
                     C[j][i] = C[i][j].T
         if format == 'csr':
-            return bmat(C, format='csr') # format = bsr ??
-        elif format == 'bsr':
-            return bmat(C, format='bsr')
+            return bmat(C, format='csr')
         elif format == 'list':
             return C
 
+    def linear_elasticity_cell_matrix(self, lam, mu, q=None):
+        """
+
+        Notes
+        -----
+        线弹性问题的单元块矩阵 K, 形状为 (NC, ldof, ldof, GD, GD), 其中
+
+        K[c, a, b, i, j] = \int_c lam d_i phi_a d_j phi_b + mu d_j phi_a d_i phi_b
+            + mu delta_{ij} grad phi_a . grad phi_b
+
+        lam 和 mu 可以是常数, 也可以是单元分片常数 (NC, )。
+        """
+        GD = self.GD
+        qf = self.integrator if q is None else self.mesh.integrator(q, 'cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        cellmeasure = self.cellmeasure
+        NC = len(cellmeasure)
+        ldof = self.number_of_local_dofs()
+
+        lam = np.asarray(lam)
+        mu = np.asarray(mu)
+        if lam.ndim == 1:
+            lam = lam[:, None, None, None, None]
+        if mu.ndim == 1:
+            mu = mu[:, None, None, None, None]
+
+        K = np.zeros((NC, ldof, ldof, GD, GD), dtype=self.ftype)
+        B = self.integralalg.cellblock
+        for start in range(0, NC, B):
+            index = np.s_[start:start+B]
+            gphi = self.grad_basis(bcs, index=index) # (NQ, NC, ldof, GD)
+            G = einsum('q, c, qcam, qcbn->cabmn', ws, cellmeasure[index],
+                    gphi, gphi)
+            l = lam[index] if lam.ndim > 0 else lam
+            m = mu[index] if mu.ndim > 0 else mu
+            tr = np.trace(G, axis1=-2, axis2=-1)[..., None, None]
+            Kc = l*G + m*G.swapaxes(-1, -2) + m*tr*np.eye(GD)
+            K[index] = Kc
+        return K
+
+    def interleave(self, C):
+        """
+
+        Parameters
+        ----------
+        C: GD x GD 个标量稀疏矩阵组成的列表, 如 format='list' 的返回值
+
+        Notes
+        -----
+        把按分量排列的分块矩阵转为按结点交错排列的 BSR 矩阵, 块的大小为
+        (GD, GD)。
+        """
+        m = len(C)
+        n = len(C[0])
+        I = []
+        J = []
+        val = []
+        for i in range(m):
+            for j in range(n):
+                if C[i][j] is None:
+                    continue
+                A = C[i][j].tocoo()
+                I.append(m*A.row + i)
+                J.append(n*A.col + j)
+                val.append(A.data)
+        N0 = m*C[0][0].shape[0]
+        N1 = n*C[0][0].shape[1]
+        A = csr_matrix((np.concatenate(val), (np.concatenate(I),
+            np.concatenate(J))), shape=(N0, N1))
+        return A.tobsr(blocksize=(m, n))
+
     def recovery_linear_elasticity_matrix(self, mu, lam, format='csr', q=None):
         """
         construct the recovery linear elasticity fem matrix
@@ -741,13 +905,13 @@ class LagrangeFiniteElementSpace():
                 C[i][j] = lam*A[imap[(i, j)]] + mu*A[imap[(i, j)]].T
                 C[j][i] = C[i][j].T
         if format == 'csr':
-            return bmat(C, format='csr') # format = bsr ??
-        elif format == 'bsr':
-            return bmat(C, format='bsr')
+            return bmat(C, format='csr')
+        elif format == 'bsr': # 按结点交错排列
+            return self.interleave(C)
         elif format == 'list':
             return C
 
-    def parallel_stiff_matrix(self, c=None, q=None):
+    def parallel_stiff_matrix(self, c=None, q=None, nprocs=None):
         """
 
         Notes
@@ -758,23 +922,37 @@ class LagrangeFiniteElementSpace():
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
-        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q)
+        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q,
+                plan=self.assembly_plan(), nprocs=nprocs)
         return M
 
-    def parallel_mass_matrix(self, c=None, q=None):
+    def parallel_mass_matrix(self, c=None, q=None, nprocs=None):
         """
 
         Notes
         -----
         并行组装质量矩阵 
-
-        TODO:
-        1. parallel_construct_matrix just work for stiff matrix
         """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.basis, cell2dof, gdof)
-        M = self.integralalg.parallel_construct_matrix(b0, cfun=cfun, q=q)
+        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q,
+                plan=self.assembly_plan(), nprocs=nprocs)
+        return M
+
+    def parallel_convection_matrix(self, c=None, q=None, nprocs=None):
+        """
+
+        Notes
+        -----
+        并行组装对流矩阵
+        """
+        gdof = self.number_of_global_dofs()
+        cell2dof = self.cell_to_dof()
+        b0 = (self.grad_basis, cell2dof, gdof)
+        b1 = (self.basis, cell2dof, gdof)
+        M = self.integralalg.parallel_construct_matrix(b0, b1=b1, c=c, q=q,
+                plan=self.assembly_plan(), nprocs=nprocs)
         return M
 
     def parallel_source_vector(self, f, dim=None):
@@ -793,20 +971,131 @@ class LagrangeFiniteElementSpace():
         b = self.integralalg.construct_vector_s_s(f, self.basis, cell2dof, gdof=gdof) 
         return b
 
-    def stiff_matrix(self, c=None, q=None):
+    def assembly_plan(self, space=None):
+        """
+
+        Notes
+        -----
+        返回 (self, space) 对应的组装计划 AssemblyPlan, 第一次调用时生成, 之后缓
+        存在空间中重复使用。space 为 None 时表示 self 和 self 。
+        """
+        key = None if space is None else id(space)
+        gdof0 = self.number_of_global_dofs()
+        cell2dof0 = self.cell_to_dof()
+        if key in self.assemblyplans:
+            s, plan = self.assemblyplans[key]
+            c2d1 = None if space is None else space.cell_to_dof()
+            if (s is space) and plan.is_compatible(cell2dof0, c2d1):
+                return plan
+
+        if space is None:
+            plan = AssemblyPlan(cell2dof0, gdof0)
+        else:
+            gdof1 = space.number_of_global_dofs()
+            cell2dof1 = space.cell_to_dof()
+            plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1)
+        self.assemblyplans[key] = (space, plan)
+        return plan
+
+    def stiff_matrix(self, c=None, q=None, out=None, cache=None):
+        """
+
+        Notes
+        -----
+        给定 cache (CellMatrixCache) 时, 只在网格上一次组装之后新产生的单元上计
+        算单元矩阵, 用于自适应加密。
+        """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q)
+        if cache is not None:
+            return self.integralalg.incremental_construct_matrix(b0, c=c, q=q,
+                    plan=self.assembly_plan(), cache=cache,
+                    key=self.cell_matrix_key('stiff', c, q))
+        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q,
+                plan=self.assembly_plan(), out=out)
         return A 
 
-    def mass_matrix(self, c=None, q=None):
+    def mass_matrix(self, c=None, q=None, out=None, cache=None):
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q)
+        if cache is not None:
+            return self.integralalg.incremental_construct_matrix(b0, c=c, q=q,
+                    plan=self.assembly_plan(), cache=cache,
+                    key=self.cell_matrix_key('mass', c, q))
+        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q,
+                plan=self.assembly_plan(), out=out)
         return A 
 
+    def cell_matrix_key(self, name, c, q):
+        """
+
+        Notes
+        -----
+        单元矩阵在 CellMatrixCache 中的标识。系数为函数时直接用函数对象, 缓存中
+        会保留对它的引用。
+        """
+        if isinstance(c, np.ndarray):
+            c = (c.shape, c.tobytes())
+        qf = self.integrator if q is None else self.mesh.integrator(q, 'cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        return (name, self.spacetype, self.p, bcs.tobytes(), ws.tobytes(),
+                np.dtype(self.ftype).str, c)
+
+    def construct_matrices(self, forms, q=None):
+        """
+
+        Parameters
+        ----------
+        forms: list, 每个元素为 'stiff', 'mass', 'convection' 或者
+            (name, c), c 为对应的系数
+
+        Notes
+        -----
+        一次组装多个矩阵, 基函数和基函数的梯度在积分点处只计算一次。返回的矩阵和
+        stiff_matrix 等组装出的矩阵共用稀疏结构, 可以用
+        self.assembly_plan().combine 计算它们的线性组合。
+
+        Examples
+        --------
+        A, M = space.construct_matrices(['stiff', ('mass', c)])
+        S = space.assembly_plan().combine([M, A], [1.0, dt]) # M + dt*A
+        """
+        gdof = self.number_of_global_dofs()
+        cell2dof = self.cell_to_dof()
+        bases = {
+                'stiff': (self.grad_basis, None),
+                'mass': (self.basis, None),
+                'convection': (self.grad_basis, self.basis)}
+
+        fs = []
+        for form in forms:
+            name, c = (form, None) if isinstance(form, str) else form
+            if name not in bases:
+                raise ValueError("the bilinear form `{}` is not supported!".format(name))
+            b0, b1 = bases[name]
+            b0 = (b0, cell2dof, gdof)
+            b1 = None if b1 is None else (b1, cell2dof, gdof)
+            fs.append((b0, b1, c))
+        return self.integralalg.serial_construct_matrices(fs, q=q,
+                plan=self.assembly_plan())
+
+    def stiff_operator(self, c=None, q=None):
+        """
+
+        Notes
+        -----
+        无矩阵形式的刚度矩阵, 见 LagrangeMatrixFreeOperator
+        """
+        return LagrangeMatrixFreeOperator(self, optype='stiff', c=c, q=q)
+
+    def mass_operator(self, c=None, q=None):
+        return LagrangeMatrixFreeOperator(self, optype='mass', c=c, q=q)
+
+    def convection_operator(self, c, q=None):
+        return LagrangeMatrixFreeOperator(self, optype='convection', c=c, q=q)
+
     def div_matrix(self, pspace, q=None):
         """
 
@@ -847,7 +1136,7 @@ class LagrangeFiniteElementSpace():
 
         B = []
         for i in range(GD):
-            D = np.einsum('q, qci, qcj, c->cij', ws, gphi[..., i], pphi, cellmeasure)
+            D = einsum('q, qci, qcj, c->cij', ws, gphi[..., i], pphi, cellmeasure)
             D = csr_matrix(
                     (D.flat, (I.flat, J.flat)), shape=(gdof0, gdof1)
                     )
@@ -897,7 +1186,7 @@ class LagrangeFiniteElementSpace():
         I = np.broadcast_to(c2d[:, :, None], shape=shape)
         J = np.broadcast_to(c2d[:, None, :], shape=shape)
 
-        val = np.einsum('q, qci, qcj, c->cij', ws, val, phi, cellmeasure)
+        val = einsum('q, qci, qcj, c->cij', ws, val, phi, cellmeasure)
         M = csr_matrix(
                 (val.flat, (I.flat, J.flat)),
                 shape=(gdof, gdof)
@@ -906,12 +1195,13 @@ class LagrangeFiniteElementSpace():
 
 
 
-    def convection_matrix(self, c=None, q=None):
+    def convection_matrix(self, c=None, q=None, out=None):
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
         b1 = (self.basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, b1=b1, c=c, q=q)
+        A = self.integralalg.serial_construct_matrix(b0, b1=b1, c=c, q=q,
+                plan=self.assembly_plan(), out=out)
         return A 
 
     def source_vector(self, f, dim=None, q=None):
@@ -935,20 +1225,20 @@ class LagrangeFiniteElementSpace():
                     return b
                 else:
                     phi = self.basis(bcs)
-                    bb = np.einsum('m, mik, i->ik...', 
+                    bb = einsum('m, mik, i->ik...', 
                             ws, phi, self.cellmeasure)
                     bb *= fval
             else:
                 phi = self.basis(bcs)
-                bb = np.einsum('m, mi..., mik, i->ik...',
+                bb = einsum('m, mi..., mik, i->ik...',
                         ws, fval, phi, self.cellmeasure)
             cell2dof = self.cell_to_dof() #(NC, ldof)
             if dim is None:
-                np.add.at(b, cell2dof, bb)
+                scatter_add(b, cell2dof, bb)
             else:
-                np.add.at(b, (cell2dof, np.s_[:]), bb)
+                scatter_add(b, (cell2dof, np.s_[:]), bb)
         else:
-            b = np.einsum('i, ik..., k->k...', ws, fval, cellmeasure)
+            b = einsum('i, ik..., k->k...', ws, fval, cellmeasure)
 
         return b
 
@@ -997,11 +1287,11 @@ class LagrangeFiniteElementSpace():
         pp = mesh.bc_to_point(bcs, etype='face', index=index)
         val = gN(pp, n) # (NQ, NF, ...), 这里假设 gN 是一个函数
 
-        bb = np.einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
+        bb = einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
         if dim == 1:
-            np.add.at(F, face2dof, bb)
+            scatter_add(F, face2dof, bb)
         else:
-            np.add.at(F, (face2dof, np.s_[:]), bb)
+            scatter_add(F, (face2dof, np.s_[:]), bb)
 
     def set_robin_bc(self, A, F, gR, threshold=None, q=None):
         """
@@ -1040,13 +1330,13 @@ class LagrangeFiniteElementSpace():
 
         val, kappa = gR(pp, n) # (NQ, NF, ...)
 
-        bb = np.einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
+        bb = einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
         if dim == 1:
-            np.add.at(F, face2dof, bb)
+            scatter_add(F, face2dof, bb)
         else:
-            np.add.at(F, (face2dof, np.s_[:]), bb)
+            scatter_add(F, (face2dof, np.s_[:]), bb)
 
-        FM = np.einsum('m, mi, mij, mik, i->ijk', ws, kappa, phi, phi, measure)
+        FM = einsum('m, mi, mij, mik, i->ijk', ws, kappa, phi, phi, measure)
 
         I = np.broadcast_to(face2dof[:, :, None], shape=FM.shape)
         J = np.broadcast_to(face2dof[:, None, :], shape=FM.shape)
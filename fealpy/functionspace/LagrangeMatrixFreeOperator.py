@@ -0,0 +1,247 @@
+import numpy as np
+from copy import copy
+from scipy.sparse.linalg import LinearOperator
+
+
+class LagrangeMatrixFreeOperator(LinearOperator):
+    """
+
+    Notes
+    -----
+    Lagrange 有限元空间上的无矩阵算子, 包括刚度, 质量和对流三种算子, 和
+    `stiff_matrix`, `mass_matrix`, `convection_matrix` 组装出的矩阵相同, 但不
+    组装矩阵, 也不存储单元矩阵。
+
+    每次乘向量时, 逐组单元把自由度上的值取出来 (gather), 用参考单元上的基函数表
+    (space.basis_table, space.grad_basis_table) 和网格的 grad_lambda 在积分点处
+    计算函数值或梯度, 乘上系数和积分权重后再用基函数测试, 最后累加到全局自由度上
+    (scatter)。
+
+    高次元的单元矩阵有 ldof**2 个元素, 这里只需要 O(NQ*ldof*(TD+1)) 的内存。
+
+    可以直接用于 scipy.sparse.linalg 中的 Krylov 迭代法, `diagonal()` 返回矩阵的
+    对角元, 用于 Jacobi 或 Chebyshev 光滑。
+    """
+    def __init__(self, space, optype='stiff', c=None, q=None, isDDof=None):
+        gdof = space.number_of_global_dofs()
+        super().__init__(dtype=space.ftype, shape=(gdof, gdof))
+
+        if optype not in {'stiff', 'mass', 'convection'}:
+            raise ValueError("`optype` should be 'stiff', 'mass' or 'convection'!")
+
+        self.space = space
+        self.optype = optype
+
+        mesh = space.mesh
+        qf = space.integrator if q is None else mesh.integrator(q, etype='cell')
+        self.bcs, self.ws = qf.get_quadrature_points_and_weights()
+
+        if callable(c):
+            if c.coordtype == 'barycentric':
+                c = c(self.bcs)
+            elif c.coordtype == 'cartesian':
+                c = c(mesh.bc_to_point(self.bcs))
+
+        if (optype == 'convection') and (c is None):
+            raise ValueError("the convection operator needs a velocity `c`!")
+
+        self.c = c
+        self.isDDof = isDDof
+        self.cellblock = space.integralalg.cellblock
+
+    def dirichlet(self, isDDof):
+        """
+
+        Notes
+        -----
+        返回处理了 Dirichlet 边界条件的算子, 和 DirichletBC 中的 T@A@T + Tbd 相同。
+        """
+        A = copy(self)
+        A.isDDof = isDDof
+        return A
+
+    def cell_blocks(self):
+        NC = self.space.mesh.number_of_cells()
+        B = self.cellblock
+        for start in range(0, NC, B):
+            yield np.s_[start:start+B]
+
+    def coefficient(self, index):
+        """
+
+        Notes
+        -----
+        取出单元 index 上的系数。
+        """
+        c = self.c
+        GD = self.space.GD
+        if isinstance(c, np.ndarray) and (c.shape not in {(GD, GD), (GD, )}):
+            return c[:, index]
+        return c
+
+    def apply_coefficient(self, val, c, transpose=False):
+        """
+
+        Parameters
+        ----------
+        val: 积分点处的函数值 (NQ, NC) 或梯度 (NQ, NC, GD)
+        c: 单元上的系数
+
+        Notes
+        -----
+        计算 c*val, 对矩阵系数, transpose 为 False 时乘 c 的转置。
+        """
+        if self.optype == 'convection':
+            if transpose: # (c\cdot\nabla u)
+                return np.einsum('...m, ...m->...', c, val)
+            else:
+                return c*val[..., None]
+
+        if c is None:
+            return val
+        elif isinstance(c, (int, float)):
+            return c*val
+
+        GD = self.space.GD
+        if self.optype == 'stiff' and (c.shape[-2:] == (GD, GD)):
+            if transpose:
+                return np.einsum('...mn, ...n->...m', c, val)
+            else:
+                return np.einsum('...nm, ...n->...m', c, val)
+        elif self.optype == 'stiff':
+            return c[..., None]*val
+        else:
+            return c*val
+
+    def value(self, u, cell2dof, index, kind):
+        """
+
+        Notes
+        -----
+        计算函数在单元 index 的积分点处的值 (kind == 'value') 或者梯度
+        (kind == 'grad')。
+        """
+        space = self.space
+        uc = u[cell2dof] # (NC, ldof)
+        if kind == 'value':
+            phi = space.basis_table(self.bcs) # (NQ, ldof)
+            return np.einsum('ci, qi->qc', uc, phi)
+        else:
+            R = space.grad_basis_table(self.bcs) # (NQ, ldof, TD+1)
+            Dlambda = space.mesh.grad_lambda()[index]
+            val = np.einsum('ci, qij->qcj', uc, R)
+            return np.einsum('qcj, cjm->qcm', val, Dlambda)
+
+    def test(self, val, index, kind):
+        """
+
+        Notes
+        -----
+        用基函数 (kind == 'value') 或者基函数的梯度 (kind == 'grad') 测试 val,
+        返回单元 index 上的向量 (NC, ldof)。
+        """
+        space = self.space
+        if kind == 'value':
+            phi = space.basis_table(self.bcs)
+            return np.einsum('qc, qi->ci', val, phi)
+        else:
+            R = space.grad_basis_table(self.bcs)
+            Dlambda = space.mesh.grad_lambda()[index]
+            val = np.einsum('qcm, cjm->qcj', val, Dlambda)
+            return np.einsum('qcj, qij->ci', val, R)
+
+    def kinds(self):
+        """
+
+        Notes
+        -----
+        矩阵行和列对应的基函数, 与 serial_construct_matrix 中的 b0 和 b1 一致。
+        """
+        if self.optype == 'stiff':
+            return 'grad', 'grad'
+        elif self.optype == 'mass':
+            return 'value', 'value'
+        else:
+            return 'grad', 'value'
+
+    def apply(self, x, transpose=False):
+        space = self.space
+        cell2dof = space.cell_to_dof()
+        cellmeasure = space.cellmeasure
+        gdof = space.number_of_global_dofs()
+
+        x = x.reshape(-1)
+        if self.isDDof is not None:
+            x0 = x[self.isDDof]
+            x = x.copy()
+            x[self.isDDof] = 0
+
+        k0, k1 = self.kinds()
+        if transpose:
+            k0, k1 = k1, k0
+
+        r = np.zeros(cell2dof.shape, dtype=np.result_type(x, self.dtype))
+        for index in self.cell_blocks():
+            val = self.value(x, cell2dof[index], index, k1)
+            val = self.apply_coefficient(val, self.coefficient(index), transpose)
+            w = self.ws[:, None]*cellmeasure[None, index]
+            if val.ndim == 3:
+                w = w[..., None]
+            r[index] = self.test(w*val, index, k0)
+
+        if np.iscomplexobj(r):
+            y = np.bincount(cell2dof.flat, weights=r.real.flat, minlength=gdof) \
+                    + 1j*np.bincount(cell2dof.flat, weights=r.imag.flat, minlength=gdof)
+        else:
+            y = np.bincount(cell2dof.flat, weights=r.flat, minlength=gdof)
+
+        if self.isDDof is not None:
+            y[self.isDDof] = x0
+        return y
+
+    def _matvec(self, x):
+        return self.apply(x)
+
+    def _rmatvec(self, x):
+        return self.apply(x, transpose=True)
+
+    def diagonal(self):
+        """
+
+        Notes
+        -----
+        矩阵的对角元。
+        """
+        space = self.space
+        cell2dof = space.cell_to_dof()
+        cellmeasure = space.cellmeasure
+        gdof = space.number_of_global_dofs()
+
+        k0, k1 = self.kinds()
+        phi = space.basis_table(self.bcs) # (NQ, ldof)
+        R = space.grad_basis_table(self.bcs) # (NQ, ldof, TD+1)
+        Dlambda = space.mesh.grad_lambda()
+
+        d = np.zeros(cell2dof.shape, dtype=self.dtype)
+        for index in self.cell_blocks():
+            c = self.coefficient(index)
+            w = self.ws[:, None]*cellmeasure[None, index]
+            if k0 == 'grad':
+                gphi = np.einsum('qij, cjm->qcim', R, Dlambda[index])
+            if self.optype == 'stiff':
+                # (ldof, NQ, NC, GD), 和系数的形状对齐
+                cgphi = self.apply_coefficient(gphi.transpose(2, 0, 1, 3), c,
+                        transpose=True)
+                d[index] = np.einsum('qc, iqcm, qcim->ci', w, cgphi, gphi)
+            elif self.optype == 'mass':
+                cw = w if c is None else self.apply_coefficient(w, c)
+                d[index] = np.einsum('qc, qi, qi->ci', cw, phi, phi)
+            else:
+                cgphi = np.einsum('qcm, qcim->qci', np.broadcast_to(
+                    c, w.shape + c.shape[-1:]), gphi)
+                d[index] = np.einsum('qc, qci, qi->ci', w, cgphi, phi)
+
+        d = np.bincount(cell2dof.flat, weights=d.flat, minlength=gdof)
+        if self.isDDof is not None:
+            d[self.isDDof] = 1
+        return d
@@ -4,6 +4,7 @@ from .Function import Function
 from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
+from ..common import scatter_add
 
 
 class MDof2d():
@@ -287,8 +288,8 @@ class MonomialSpace2d():
 
         ldof = self.number_of_local_dofs()
         H = np.zeros((NC, ldof, ldof), dtype=np.float)
-        np.add.at(H, edge2cell[:, 0], H0)
-        np.add.at(H, edge2cell[isInEdge, 1], H1)
+        scatter_add(H, edge2cell[:, 0], H0)
+        scatter_add(H, edge2cell[isInEdge, 1], H1)
 
         multiIndex = self.dof.multiIndex
         q = np.sum(multiIndex, axis=1)
@@ -6,6 +6,8 @@ from .Function import Function
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from ..common import scatter_add
+from ..common import einsum
 
 class NCVEMDof2d():
     """
@@ -336,8 +338,8 @@ class NonConformingVirtualElementSpace2d():
 
         ldof = self.smspace.number_of_local_dofs()
         H = np.zeros((NC, ldof, ldof), dtype=np.float)
-        np.add.at(H, edge2cell[:, 0], H0)
-        np.add.at(H, edge2cell[isInEdge, 1], H1)
+        scatter_add(H, edge2cell[:, 0], H0)
+        scatter_add(H, edge2cell[isInEdge, 1], H1)
 
         multiIndex = self.smspace.dof.multiIndex
         q = np.sum(multiIndex, axis=1)
@@ -417,14 +419,13 @@ class NonConformingVirtualElementSpace2d():
         # m: the scaled basis number,
         # j: the edge number,
         # i: the virtual element basis number
-        val = np.einsum('i, ijmk, jk->mji', ws, gphi0, nm, optimize=True)
+        val = einsum('i, ijmk, jk->mji', ws, gphi0, nm)
         idx = (cell2dofLocation[edge2cell[:, 0]]
                 + edge2cell[:, 2]*p).reshape(-1, 1) + np.arange(p)
         B[:, idx] += val
         B[0, idx] = h.reshape(-1, 1)*ws
 
-        val = np.einsum('i, ijmk, jk->mji', ws, gphi1, -nm[isInEdge],
-                optimize=True)
+        val = einsum('i, ijmk, jk->mji', ws, gphi1, -nm[isInEdge])
         idx = ( cell2dofLocation[edge2cell[isInEdge, 1]]
                 + edge2cell[isInEdge, 3]*p).reshape(-1, 1) + np.arange(p)
         B[:, idx] += val
@@ -443,7 +444,7 @@ class NonConformingVirtualElementSpace2d():
     def matrix_G_test(self, integralalg):
         def u(x, index=None):
             gphi = self.smspace.grad_basis(x, index=index)
-            return np.einsum('ijkm, ijpm->ijkp', gphi, gphi, optimize=True)
+            return einsum('ijkm, ijpm->ijkp', gphi, gphi)
 
         G = integralalg.integral(u, celltype=True)
         return G
@@ -7,6 +7,7 @@ from .Function import Function
 
 from ..quadrature import FEMeshIntegralAlg
 from ..decorator import timer
+from ..common import scatter_add
 
 
 class ParametricLagrangeFiniteElementSpace:
@@ -338,7 +339,7 @@ class ParametricLagrangeFiniteElementSpace:
         cell2dof = self.cell_to_dof()
         gdof = self.number_of_global_dofs()
         F = np.zeros(gdof, dtype=self.ftype)
-        np.add.at(F, cell2dof, bb)
+        scatter_add(F, cell2dof, bb)
         return F 
 
     def function(self, dim=None, array=None):
@@ -368,7 +369,7 @@ class ParametricLagrangeFiniteElementSpace:
         cc = np.einsum('q, qci, qc->ci', ws*rm, phi, d)
         gdof = self.number_of_global_dofs()
         c = np.zeros(gdof, dtype=self.ftype)
-        np.add.at(c, cell2dof, cc)
+        scatter_add(c, cell2dof, cc)
         return c
 
     def interpolation(self, u, dim=None):
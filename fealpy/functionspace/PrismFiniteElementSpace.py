@@ -5,6 +5,7 @@ from .Function import Function
 from ..quadrature import FEMeshIntegralAlg
 from timeit import default_timer as timer
 from .femdof import CPPFEMDof3d
+from ..common import einsum
 
 class PrismFiniteElementSpace():
 
@@ -195,9 +196,8 @@ class PrismFiniteElementSpace():
         gphi = self.grad_basis(bcs) #(NQ0, NQ1, NC, ldof0*ldof1, GD)
         print(gphi.shape)
 
-        A = np.einsum('..., ...jkm, ...jpm, j->jkp',
-                ws, gphi, gphi, self.cellmeasure,
-                optimize=True)
+        A = einsum('..., ...jkm, ...jpm, j->jkp',
+                ws, gphi, gphi, self.cellmeasure)
         cell2dof = self.cell_to_dof()
         ldof = self.number_of_local_dofs()
         I = np.einsum('k, ij->ijk', np.ones(ldof), cell2dof)
@@ -216,7 +216,7 @@ class PrismFiniteElementSpace():
         bcs, ws = self.integrator.get_quadrature_points_and_weights()
         phi = self.basis(bcs)
 
-        M = np.einsum( 'm, mj, mk, i->ijk', ws, dphi, phi, cellmeasure, optimize=True)
+        M = einsum( 'm, mj, mk, i->ijk', ws, dphi, phi, cellmeasure)
 
         cell2dof = self.cell_to_dof()
         ldof = self.number_of_local_dofs()
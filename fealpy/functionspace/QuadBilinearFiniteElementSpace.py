@@ -2,6 +2,7 @@ import numpy as np
 from scipy.sparse import coo_matrix, csr_matrix, spdiags
 from .Function import Function
 from ..quadrature.FEMeshIntegralAlg import FEMeshIntegralAlg
+from ..common import einsum
 
 class QuadBilinearFiniteElementSpace():
 
@@ -271,7 +272,7 @@ class QuadBilinearFiniteElementSpace():
         gphi = self.grad_basis(bcs)
 
         # Compute the element sitffness matrix
-        A = np.einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, self.cellmeasure, optimize=True)
+        A = einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, self.cellmeasure)
         cell2dof = self.cell_to_dof()
         ldof = self.number_of_local_dofs()
         I = np.einsum('k, ij->ijk', np.ones(ldof), cell2dof)
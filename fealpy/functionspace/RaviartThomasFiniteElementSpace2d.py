@@ -7,6 +7,9 @@ from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
 
 # 导入默认的坐标类型, 这个空间基函数的相关计算，输入参数是重心坐标 
 from ..decorator import barycentric 
+from ..quadrature import FaceIntegralAlg
+from ..common import scatter_add
+from ..common import einsum
 
 class RTDof2d:
     def __init__(self, mesh, p):
@@ -572,14 +575,12 @@ class RaviartThomasFiniteElementSpace2d:
         # (NQ, NE, ldof1)
         phi2 = np.einsum('...jln, jn->...jl', phi2, en)
 
-        E0 = np.einsum(
+        E0 = einsum(
                 'i, ij..., ijm, ijn, j->jmn', 
-                ws, val0, phi0, phi2, measure,
-                optimize=True)
-        E1 = np.einsum(
+                ws, val0, phi0, phi2, measure)
+        E1 = einsum(
                 'i, ij..., ijm, ijn, j->jmn', 
-                ws, val1, phi1, phi2, measure,
-                optimize=True)
+                ws, val1, phi1, phi2, measure)
 
         gdof0 = self.smspace.number_of_global_dofs()
         gdof1 = self.number_of_global_dofs()
@@ -642,18 +643,20 @@ class RaviartThomasFiniteElementSpace2d:
 
         F = np.einsum('i, ijm, ijkm, j->jk', ws, val, gphi, measure)
 
-        # 边界积分
-        qf = self.integralalg.edgeintegrator if q is None else mesh.integrator(q, 'edge')
-        bcs, ws = qf.get_quadrature_points_and_weights()
+        # 边界积分, 边上的积分点, 法线和 ch 的基函数在边两侧的迹在时间步之间共用
+        facealg = self.smspace.facealg if q is None else FaceIntegralAlg(mesh, q)
+        bcs, ws = facealg.get_quadrature_points_and_weights()
 
         # 边的定向法线，它是左边单元的外法线， 右边单元内法线。
-        en = mesh.edge_unit_normal() 
-        measure = self.integralalg.edgemeasure # 边界长度
+        en = facealg.unit_normal() 
+        measure = facealg.face_measure() # 边界长度
         val0 = np.einsum('ijm, jm->ij', vh.edge_value(bcs), en) # 速度和法线的内积
 
-        ps = mesh.bc_to_point(bcs, etype='edge')
-        val1 = ch(ps, index=edge2cell[:, 0]) # 边的左边单元在这条边上的浓度值
-        val2 = ch(ps, index=edge2cell[:, 1]) # 边的右边单元在这条边上的浓度值 
+        ps = facealg.quadrature_points()
+        phi0, phi1 = facealg.traces(ch.space.basis)
+        cell2dof = ch.space.cell_to_dof()
+        val1 = np.einsum('ijk, jk->ij', phi0, ch[cell2dof[edge2cell[:, 0]]]) # 边的左边单元在这条边上的浓度值
+        val2 = np.einsum('ijk, jk->ij', phi1, ch[cell2dof[edge2cell[:, 1]]]) # 边的右边单元在这条边上的浓度值 
 
         # 边界条件处理
         val2[:, isBdEdge] = 0.0 # 首先把边界的贡献都设为 0 
@@ -676,14 +679,12 @@ class RaviartThomasFiniteElementSpace2d:
         val[~flag] = val0[~flag]*val2[~flag]
 
 
-        phi = ch.space.basis(ps, index=edge2cell[:, 0])
-        b = np.einsum('i, ij, ijk, j->jk', ws, val, phi, measure)
-        np.subtract.at(F, (edge2cell[:, 0], np.s_[:]), b)  
+        b = np.einsum('i, ij, ijk, j->jk', ws, val, phi0, measure)
+        scatter_add(F, (edge2cell[:, 0], np.s_[:]), -b)  
 
-        phi = ch.space.basis(ps, index=edge2cell[:, 1])
-        b = np.einsum('i, ij, ijk, j->jk', ws, val, phi, measure)
+        b = np.einsum('i, ij, ijk, j->jk', ws, val, phi1, measure)
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1]) # 只处理内部边
-        np.add.at(F, (edge2cell[isInEdge, 1], np.s_[:]), b[isInEdge])  
+        scatter_add(F, (edge2cell[isInEdge, 1], np.s_[:]), b[isInEdge])  
 
         return F
 
@@ -726,8 +727,8 @@ class RaviartThomasFiniteElementSpace2d:
 
         gdof = self.number_of_global_dofs()
         F = np.zeros(gdof, dtype=self.ftype)
-        bb = np.einsum('i, ij, ijmk, jk, j->jm', ws, val, phi, en, measure, optimize=True)
-        np.add.at(F, edge2dof[index], bb)
+        bb = einsum('i, ij, ijmk, jk, j->jm', ws, val, phi, en, measure)
+        scatter_add(F, edge2dof[index], bb)
         return F 
 
     def set_dirichlet_bc(self, uh, g, threshold=None, q=None):
@@ -762,7 +763,7 @@ class RaviartThomasFiniteElementSpace2d:
 
         measure = self.integralalg.edgemeasure[index]
         gdof = self.number_of_global_dofs()
-        uh[edge2dof[index]] = np.einsum('i, ij, ijm, j->jm', ws, val, phi, measure, optimize=True)
+        uh[edge2dof[index]] = einsum('i, ij, ijm, j->jm', ws, val, phi, measure)
         isDDof = np.zeros(gdof, dtype=np.bool_) 
         isDDof[edge2dof[index]] = True
         return isDDof
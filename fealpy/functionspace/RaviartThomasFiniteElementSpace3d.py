@@ -5,6 +5,8 @@ from .Function import Function
 from .ScaledMonomialSpace3d import ScaledMonomialSpace3d
 
 from ..decorator import barycentric # 导入默认的坐标类型, 这个空间是重心坐标
+from ..common import scatter_add
+from ..common import einsum
 
 class RTDof3d:
     def __init__(self, mesh, p):
@@ -501,8 +503,8 @@ class RaviartThomasFiniteElementSpace3d:
 
         gdof = self.number_of_global_dofs()
         F = np.zeros(gdof, dtype=self.ftype)
-        bb = np.einsum('i, ij, ijmk, jk, j->jm', ws, val, phi, fn, measure, optimize=True)
-        np.add.at(F, face2dof[index], bb)
+        bb = einsum('i, ij, ijmk, jk, j->jm', ws, val, phi, fn, measure)
+        scatter_add(F, face2dof[index], bb)
         return F 
 
     def set_dirichlet_bc(self, uh, g, threshold=None, q=None):
@@ -537,8 +539,8 @@ class RaviartThomasFiniteElementSpace3d:
 
         measure = self.integralalg.facemeasure[index]
         gdof = self.number_of_global_dofs()
-        uh[face2dof[index]] = np.einsum('i, ij, ijm, j->jm', ws, val, phi,
-                measure, optimize=True)
+        uh[face2dof[index]] = einsum('i, ij, ijm, j->jm', ws, val, phi,
+                measure)
         isDDof = np.zeros(gdof, dtype=np.bool_) 
         isDDof[face2dof[index]] = True
         return isDDof
@@ -618,7 +620,7 @@ class RaviartThomasFiniteElementSpace3d:
         phi = ch.space.basis(ps, index=face2cell[:, 1])
         b = np.einsum('i, ij, ijk, j->jk', ws, val, phi, measure)
         isInFace = (face2cell[:, 0] != face2cell[:, 1]) # 只处理内部面
-        np.add.at(F, (face2cell[isInFace, 1], np.s_[:]), b[isInFace])  
+        scatter_add(F, (face2cell[isInFace, 1], np.s_[:]), b[isInFace])  
 
         return F
 
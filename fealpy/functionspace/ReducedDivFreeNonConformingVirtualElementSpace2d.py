@@ -9,6 +9,7 @@ from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from ..common import ranges
 from ..common import block, block_diag
+from ..common import scatter_add
 
 class RDFNCVEMDof2d():
     """
@@ -198,9 +199,9 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
 
         edge2dof = self.dof.edge_to_dof()
         val = np.einsum('jmn, jn, j->jm', F, uh[edge2dof], n[:, 0])
-        np.add.at(cuh, c2d[edge2cell[:, 0], :idof0], val)
+        scatter_add(cuh, c2d[edge2cell[:, 0], :idof0], val)
         val = np.einsum('jmn, jn, j->jm', F, uh[NE*p:][edge2dof], n[:, 1])
-        np.add.at(cuh, c2d[edge2cell[:, 0], :idof0], val)
+        scatter_add(cuh, c2d[edge2cell[:, 0], :idof0], val)
 
         # right element
         phi0 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1)[..., 1:idof0+1]
@@ -453,14 +454,14 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
 
         idx0 = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
         val = np.einsum('jm, jn, j->mjn', Q0[edge2cell[:, 0]], F0[:, 0, :], n[:, 0]) 
-        np.add.at(T00, (np.s_[:], idx0), val)
+        scatter_add(T00, (np.s_[:], idx0), val)
         val = np.einsum('jm, jn, j->mjn', Q0[edge2cell[:, 0]], F0[:, 1, :], n[:, 0]) 
-        np.add.at(T10, (np.s_[:], idx0), val)
+        scatter_add(T10, (np.s_[:], idx0), val)
 
         val = np.einsum('jm, jn, j->mjn', Q0[edge2cell[:, 0]], F0[:, 0, :], n[:, 1]) 
-        np.add.at(T01, (np.s_[:], idx0), val)
+        scatter_add(T01, (np.s_[:], idx0), val)
         val = np.einsum('jm, jn, j->mjn', Q0[edge2cell[:, 0]], F0[:, 1, :], n[:, 1]) 
-        np.add.at(T11, (np.s_[:], idx0), val)
+        scatter_add(T11, (np.s_[:], idx0), val)
 
         if isInEdge.sum() > 0:
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=1)
@@ -530,12 +531,12 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
         y = idx['y']
         idx0 = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
         val = np.einsum('jmn, j->mjn', F0, n[:, 0]) 
-        np.add.at(E00, (np.s_[:], idx0), val[x[0]]/c[:, None, None])
-        np.add.at(E10, (np.s_[:], idx0), val[y[0]]/c[:, None, None])
+        scatter_add(E00, (np.s_[:], idx0), val[x[0]]/c[:, None, None])
+        scatter_add(E10, (np.s_[:], idx0), val[y[0]]/c[:, None, None])
 
         val = np.einsum('jmn, j->mjn', F0, n[:, 1])
-        np.add.at(E01, (np.s_[:], idx0), val[x[0]]/c[:, None, None])
-        np.add.at(E11, (np.s_[:], idx0), val[y[0]]/c[:, None, None])
+        scatter_add(E01, (np.s_[:], idx0), val[x[0]]/c[:, None, None])
+        scatter_add(E11, (np.s_[:], idx0), val[y[0]]/c[:, None, None])
 
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1)
@@ -675,19 +676,19 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
         # val: (ndof, NE, p)
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, n[:, 0])
         # x[0]: (ndof, 1, 1)  idx0: (NE, p) --> x[0] and idx0: (ndof, NE, p)
-        np.add.at(R00, (x[0][:, None, None], idx0), val)
+        scatter_add(R00, (x[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, 0.5*n[:, 1])
-        np.add.at(R00, (y[0][:, None, None], idx0), val)
+        scatter_add(R00, (y[0][:, None, None], idx0), val)
 
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, 0.5*n[:, 0])
-        np.add.at(R11, (x[0][:, None, None], idx0), val)
+        scatter_add(R11, (x[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, n[:, 1])
-        np.add.at(R11, (y[0][:, None, None], idx0), val)
+        scatter_add(R11, (y[0][:, None, None], idx0), val)
 
         val = np.einsum('jm, jmn, j-> mjn', h3, F0, 0.5*n[:, 0])
-        np.add.at(R01, (y[0][:, None, None], idx0), val)
+        scatter_add(R01, (y[0][:, None, None], idx0), val)
         val = np.einsum('jm, jmn, j-> mjn', h2, F0, 0.5*n[:, 1])
-        np.add.at(R10, (x[0][:, None, None], idx0), val)
+        scatter_add(R10, (x[0][:, None, None], idx0), val)
 
         a2 = area**2
         start = cell2dofLocation[edge2cell[:, 0]] + edge2cell[:, 2]*p
@@ -695,7 +696,7 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
         val = np.einsum('jm, jm, j, j->mj',
             h3, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 1])
         # y[0]: (ndof, 1)  start: (NE, ) -->  y[0] and start : (ndof, NE)
-        np.add.at(R00, (y[0][:, None], start), val)
+        scatter_add(R00, (y[0][:, None], start), val)
 
         val = np.einsum('jm, jm, j, j->mj',
             h3, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 0])
@@ -707,7 +708,7 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
 
         val = np.einsum('jm, jm, j, j->mj',
             h2, CM[edge2cell[:, 0], 0:ndof, 0], eh/a2[edge2cell[:, 0]], n[:, 0])
-        np.add.at(R11, (x[0][:, None], start), val)
+        scatter_add(R11, (x[0][:, None], start), val)
 
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1)
@@ -739,11 +740,11 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
 
             val = np.einsum('jm, jm, j, j->mj',
                 h3, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 0])
-            np.add.at(R01, (y[0][:, None], start[isInEdge]), val[:, isInEdge])
+            scatter_add(R01, (y[0][:, None], start[isInEdge]), val[:, isInEdge])
 
             val = np.einsum('jm, jm, j, j->mj',
                 h2, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 1])
-            np.add.at(R10, (x[0][:, None], start[isInEdge]), val[:, isInEdge])
+            scatter_add(R10, (x[0][:, None], start[isInEdge]), val[:, isInEdge])
 
             val = np.einsum('jm, jm, j, j->mj',
                 h2, CM[edge2cell[:, 1], 0:ndof, 0], eh/a2[edge2cell[:, 1]], n[:, 0])
@@ -765,10 +766,10 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
         start = cell2dofLocation[edge2cell[:, 0]] + edge2cell[:, 2]*p
 
         val = np.einsum('jm, j, j->mj', Q0[edge2cell[:, 0]], eh, n[:, 0])
-        np.add.at(J0, (np.s_[:], start), val)
+        scatter_add(J0, (np.s_[:], start), val)
 
         val = np.einsum('jm, j, j->mj', Q0[edge2cell[:, 0]], eh, n[:, 1])
-        np.add.at(J1, (np.s_[:], start), val)
+        scatter_add(J1, (np.s_[:], start), val)
 
         if np.any(isInEdge):
             start = cell2dofLocation[edge2cell[:, 1]] + edge2cell[:, 3]*p
@@ -816,14 +817,14 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
         phi = self.smspace.edge_basis(ps, p=p-1)
         F0 = np.einsum('i, ijm, ijn->jmn', ws, phi, phi0)
         idx = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
-        np.add.at(D0, (idx, np.s_[:]), F0)
+        scatter_add(D0, (idx, np.s_[:]), F0)
 
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p)
             F1 = np.einsum('i, ijm, ijn->jmn', ws, phi, phi1)
             idx = cell2dofLocation[edge2cell[:, [1]]] + edge2cell[:, [3]]*p + np.arange(p)
-            np.add.at(D0, (idx[isInEdge], np.s_[:]), F1[isInEdge])
+            scatter_add(D0, (idx[isInEdge], np.s_[:]), F1[isInEdge])
 
         if p > 2:
             idx = self.smspace.index1(p=p-2) # 一次求导后的非零基函数编号及求导系数
@@ -902,11 +903,11 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
 
         idx = cell2dofLocation[edge2cell[:, [0]]] + edge2cell[:, [2]]*p + np.arange(p)
         val = np.einsum('jmn, j-> mjn', F0, n[:, 0])
-        np.add.at(U00, (np.s_[:], idx), val)
-        np.add.at(U11, (np.s_[:], idx), val)
+        scatter_add(U00, (np.s_[:], idx), val)
+        scatter_add(U11, (np.s_[:], idx), val)
         val = np.einsum('jmn, j-> mjn', F0, n[:, 1])
-        np.add.at(U10, (np.s_[:], idx), val)
-        np.add.at(U21, (np.s_[:], idx), val)
+        scatter_add(U10, (np.s_[:], idx), val)
+        scatter_add(U21, (np.s_[:], idx), val)
         if np.any(isInEdge):
             phi1 = self.smspace.basis(ps, index=edge2cell[:, 1], p=p-1) 
             F1 = np.einsum('i, ijm, ijn, j, j->jmn', ws, phi1, phi, eh, eh)
@@ -1049,8 +1050,8 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
             list(map(u1, range(NC)))
             gdof = self.number_of_global_dofs()
             b = np.zeros((gdof, ), dtype=self.ftype)
-            np.add.at(b, cell2dof, eb[0])
-            np.add.at(b[NE*p:], cell2dof, eb[1])
+            scatter_add(b, cell2dof, eb[0])
+            scatter_add(b[NE*p:], cell2dof, eb[1])
             return b
         else:
             ndof = self.smspace.number_of_local_dofs(p=p-2)
@@ -1076,8 +1077,8 @@ class ReducedDivFreeNonConformingVirtualElementSpace2d:
             gdof = self.number_of_global_dofs()
             b = np.zeros((gdof, ), dtype=self.ftype)
 
-            np.add.at(b, cell2dof, eb[0])
-            np.add.at(b[NE*p:], cell2dof, eb[1])
+            scatter_add(b, cell2dof, eb[0])
+            scatter_add(b[NE*p:], cell2dof, eb[1])
             c2d = self.cell_to_dof('cell')
             b[c2d] += np.sum(bb[:, :, [0]]*self.E[0][2], axis=1)
             b[c2d] += np.sum(bb[:, :, [1]]*self.E[1][2], axis=1)
@@ -7,10 +7,12 @@ from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from ..quadrature import FEMeshIntegralAlg
+from ..quadrature import FaceIntegralAlg
 from ..common import ranges
 
 from .femdof import multi_index_matrix2d, multi_index_matrix1d
 from .LagrangeFiniteElementSpace import LagrangeFiniteElementSpace
+from ..common import scatter_add
 
 class SMDof2d():
     """
@@ -96,6 +98,10 @@ class ScaledMonomialSpace2d():
 
         self.integrator = self.integralalg.integrator
 
+        # 边上的积分点, 法向和基函数在边两侧的迹, 罚矩阵和边上的质量矩阵共用
+        self.facealg = FaceIntegralAlg(self.mesh, q)
+        self.facealgs = {} # 更高阶的, 见 face_integral_alg
+
         self.itype = self.mesh.itype
         self.ftype = self.mesh.ftype
 
@@ -381,36 +387,42 @@ class ScaledMonomialSpace2d():
         H[:, flag] /=2**(Q[flag]-1)
         return H
 
+    def face_integral_alg(self, p):
+        """
+
+        Notes
+        -----
+        边上次数为 p 的质量矩阵需要 p+3 阶的积分公式。self.facealg 的阶数
+        不够时, 用一个 p+3 阶的 FaceIntegralAlg (按阶数缓存)。
+        """
+        q = p + 3
+        if self.facealg.q >= q:
+            return self.facealg
+        if q not in self.facealgs:
+            self.facealgs[q] = FaceIntegralAlg(self.mesh, q)
+        return self.facealgs[q]
+
     def edge_mass_matrix_1(self, p=None):
         p = self.p if p is None else p
-        mesh = self.mesh
-        edge = mesh.entity('edge')
-        measure = mesh.entity_measure('edge')
-        qf = GaussLegendreQuadrature(p + 3)
-        bcs, ws = qf.quadpts, qf.weights
-        ps = self.mesh.edge_bc_to_point(bcs)
-        phi = self.edge_basis(ps, p=p)
-        H = np.einsum('i, ijk, ijm, j->jkm', ws, phi, phi, measure, optimize=True)
+        facealg = self.face_integral_alg(p)
+        phi = facealg.face_values(lambda x: self.edge_basis(x, p=p),
+                key=('edge_basis', p))
+        H = facealg.face_matrix(phi)
         return H
 
     def edge_cell_mass_matrix(self, p=None): 
         p = self.p if p is None else p
-        mesh = self.mesh
-
-        edge = mesh.entity('edge')
-        measure = mesh.entity_measure('edge')
-
-        edge2cell = mesh.ds.edge_to_cell()
-
-        qf = GaussLegendreQuadrature(p + 3)
-        bcs, ws = qf.quadpts, qf.weights
-        ps = self.mesh.edge_bc_to_point(bcs)
-
-        phi0 = self.edge_basis(ps, p=p)
-        phi1 = self.basis(ps, index=edge2cell[:, 0], p=p+1)
-        phi2 = self.basis(ps, index=edge2cell[:, 1], p=p+1)
-        LM = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1, measure, optimize=True)
-        RM = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi2, measure, optimize=True)
+        facealg = self.face_integral_alg(p)
+        phi0 = facealg.face_values(lambda x: self.edge_basis(x, p=p),
+                key=('edge_basis', p))
+        phi1, phi2 = facealg.traces(
+                lambda x, index: self.basis(x, index=index, p=p+1),
+                key=('basis', p+1))
+        # 边界边上右边单元和左边单元相同
+        isInEdge = facealg.is_interior_face()
+        phi2 = np.where(isInEdge[:, None], phi2, phi1)
+        LM = facealg.face_matrix(phi0, phi1)
+        RM = facealg.face_matrix(phi0, phi2)
         return LM, RM 
 
     def stiff_matrix(self, p=None):
@@ -440,24 +452,20 @@ class ScaledMonomialSpace2d():
         M = csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof, gdof))
         return M 
 
-    def penalty_matrix(self, p=None):
-        p = p or self.p
-        mesh = self.mesh
-        edge = mesh.entity('edge')
-        edge2cell = mesh.ds.edge_to_cell()
-        isInEdge = edge2cell[:, 0] != edge2cell[:, 1]
-        eh = mesh.entity_measure('edge')
-        qf = GaussLegendreQuadrature(p + 3)
-        bcs, ws = qf.quadpts, qf.weights
-        ps = self.mesh.edge_bc_to_point(bcs)
-
-        ldof = self.number_of_local_dofs(doftype='cell')
-        shape = ps.shape[:-1] + (2*ldof, )
-        phi = np.zeros(shape, dtype=self.ftype)
-        phi[:, :, :ldof] = self.basis(ps, index=edge2cell[:, 0]) # (NQ, NE, ldof)
-        phi[:, isInEdge, ldof:] = -self.basis(ps, index=edge2cell[isInEdge, 1]) # (NQ, NE, ldof)
-        H = np.einsum('i, ijk, ijm, j->jkm', ws, phi, phi, eh, optimize=True)
-        cell2dof = self.cell_to_dof()
+    def penalty_matrix(self, p=None, c=None):
+        """
+
+        Notes
+        -----
+        罚矩阵 \\sum_e \\int_e c [u][v] ds, 边界边上的跳量取为单元上的迹。
+        """
+        p = self.p if p is None else p
+        cell2dof = self.cell_to_dof(p=p)
+        gdof = self.number_of_global_dofs(p=p)
+        P = self.facealg.jump_matrix(
+                lambda x, index: self.basis(x, index=index, p=p),
+                cell2dof, gdof, c=c, key=('basis', p))
+        return P
 
     def source_vector(self, f, celltype=False, q=None):
         """
@@ -498,8 +506,8 @@ class ScaledMonomialSpace2d():
 
         ldof = self.number_of_local_dofs(p=p, doftype='cell')
         H = np.zeros((NC, ldof, ldof), dtype=np.float)
-        np.add.at(H, edge2cell[:, 0], H0)
-        np.add.at(H, edge2cell[isInEdge, 1], H1)
+        scatter_add(H, edge2cell[:, 0], H0)
+        scatter_add(H, edge2cell[isInEdge, 1], H1)
 
         multiIndex = self.dof.multi_index_matrix(p=p)
         q = np.sum(multiIndex, axis=1)
@@ -569,7 +577,7 @@ class ScaledMonomialSpace2d():
         d = sh1.reshape(-1, ldofs)
 
         num = np.zeros(NC, dtype=self.itype)
-        np.add.at(num, HB[:, 0], 1)
+        scatter_add(num, HB[:, 0], 1)
 
         m = HB.shape[0]
         td = np.zeros((m, ldofs), dtype=self.ftype)
@@ -586,7 +594,7 @@ class ScaledMonomialSpace2d():
             td[:, 4] = c[HB[:, 1], 4]*h**2
             td[:, 5] = c[HB[:, 1], 5]*h**2
 
-        np.add.at(d, (HB[:, 0], np.s_[:]), td)
+        scatter_add(d, (HB[:, 0], np.s_[:]), td)
         d /= num.reshape(-1, 1)
         return sh1
 
@@ -615,9 +623,9 @@ class ScaledMonomialSpace2d():
         gdof = space.number_of_global_dofs()
         cell2dof = space.cell_to_dof()
         deg = np.zeros(gdof, dtype=space.itype)
-        np.add.at(deg, cell2dof, 1)
+        scatter_add(deg, cell2dof, 1)
         ruh = space.function()
-        np.add.at(ruh, cell2dof, val.T)
+        scatter_add(ruh, cell2dof, val.T)
         ruh /= deg
         return ruh
 
@@ -5,6 +5,8 @@ from ..quadrature import PolyhedronMeshIntegralAlg
 from ..quadrature import FEMeshIntegralAlg
 from .LagrangeFiniteElementSpace import LagrangeFiniteElementSpace
 from .femdof import multi_index_matrix2d, multi_index_matrix3d
+from ..common import scatter_add
+from ..common import einsum
 
 
 class SMDof3d():
@@ -449,8 +451,8 @@ class ScaledMonomialSpace3d():
         phi1 = self.basis(ps, index=face2cell[:, 0], p=p+1)
         phi2 = self.basis(ps, index=face2cell[:, 1], p=p+1)
 
-        LM = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1, measure, optimize=True)
-        RM = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi2, measure, optimize=True)
+        LM = einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1, measure)
+        RM = einsum('i, ijk, ijm, j->jkm', ws, phi0, phi2, measure)
         return LM, RM 
 
     @cartesian
@@ -478,9 +480,9 @@ class ScaledMonomialSpace3d():
         gdof = space.number_of_global_dofs()
         cell2dof = space.cell_to_dof()
         deg = np.zeros(gdof, dtype=space.itype)
-        np.add.at(deg, cell2dof, 1)
+        scatter_add(deg, cell2dof, 1)
         ruh = space.function()
-        np.add.at(ruh, cell2dof, val.T)
+        scatter_add(ruh, cell2dof, val.T)
         ruh /= deg
         return ruh
 
@@ -7,6 +7,8 @@ from ..quadrature.FEMeshIntegralAlg import FEMeshIntegralAlg
 
 from .femdof import CPLFEMDof2d, DPLFEMDof2d
 from .Function import Function
+from ..common import scatter_add
+from ..common import einsum
 
 
 class SurfaceLagrangeFiniteElementSpace:
@@ -83,7 +85,7 @@ class SurfaceLagrangeFiniteElementSpace:
             ws = np.einsum('i, j->ij', measure, np.ones(ldof))
             deg = np.bincount(cell2dof.flat, weights = ws.flat, minlength=gdof)
             guh = np.einsum('ij..., i->ij...', guh, measure)
-            np.add.at(rguh, (cell2dof, np.s_[:]), guh)
+            scatter_add(rguh, (cell2dof, np.s_[:]), guh)
             rguh /= deg.reshape(-1, 1)
         else:
             rguh = None
@@ -97,7 +99,7 @@ class SurfaceLagrangeFiniteElementSpace:
         gphi = self.grad_basis(bcs)
 
         # Compute the element sitffness matrix
-        A = np.einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, self.cellmeasure, optimize=True)
+        A = einsum('i, ijkm, ijpm, j->jkp', ws, gphi, gphi, self.cellmeasure)
         cell2dof = self.cell_to_dof()
         ldof = self.number_of_local_dofs()
         I = np.einsum('k, ij->ijk', np.ones(ldof), cell2dof)
@@ -114,7 +116,7 @@ class SurfaceLagrangeFiniteElementSpace:
 
         bcs, ws = self.integrator.get_quadrature_points_and_weights()
         phi = self.basis(bcs)
-        M = np.einsum('m, mij, mik, i->ijk', ws, phi, phi, self.cellmeasure, optimize=True)
+        M = einsum('m, mij, mik, i->ijk', ws, phi, phi, self.cellmeasure)
         cell2dof = self.cell_to_dof()
         ldof = self.number_of_local_dofs()
         I = np.einsum('k, ij->ijk', np.ones(ldof), cell2dof)
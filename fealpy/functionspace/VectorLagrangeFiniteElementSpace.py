@@ -1,8 +1,9 @@
 import numpy as np
-from scipy.sparse import coo_matrix, csr_matrix, spdiags, bmat
+from scipy.sparse import coo_matrix, csr_matrix, spdiags, bmat, bsr_matrix
 from scipy.sparse.linalg import spsolve
 
-from .function import Function
+from .Function import Function
+from .LagrangeFiniteElementSpace import LagrangeFiniteElementSpace
 from .femdof import CPLFEMDof1d, CPLFEMDof2d, CPLFEMDof3d
 from .femdof import DPLFEMDof1d, DPLFEMDof2d, DPLFEMDof3d
 
@@ -107,31 +108,38 @@ class VectorLagrangeFiniteElementSpace():
         uI[cell2dof] = u(p)
         return uI
 
-    def stiff_matrix(self, qf, measure):
-        p = self.p
-        mesh = self.mesh
-        GD = self.GD
-        S = self.scalarspace.stiff_matrix(qf, measure)
-
-        I, J = np.nonzero(S)
-        gdof = self.number_of_global_dofs()
-        A = coo_matrix(gdof, gdof)
-        for i in range(self.GD):
-            A += coo_matrix((S.data, (GD*I + i, GD*J + i)), shape=(gdof, gdof), dtype=mesh.ftype)
-        return A.tocsr() 
+    def block_diag_matrix(self, S):
+        """
 
-    def mass_matrix(self, qf, measure, cfun=None, barycenter=True):
-        p = self.p
-        mesh = self.mesh
+        Notes
+        -----
+        把标量空间上的矩阵 S 扩展为向量空间上的 BSR 矩阵, 每个块为 S[i, j]*I,
+        自由度按结点交错排列, 和 `cell_to_dof` 一致。
+        """
         GD = self.GD
-
-        M = self.scalarspace.mass_matrix(qf, measure, cfun=cfun, barycenter=barycenter)
-        I, J = np.nonzero(M)
-        gdof = self.number_of_global_dofs()
-        A = coo_matrix(gdof, gdof)
-        for i in range(self.GD):
-            A += coo_matrix((M.data, (GD*I + i, GD*J + i)), shape=(gdof, gdof), dtype=mesh.ftype)
-        return A.tocsr() 
+        S = S.tocsr()
+        data = S.data[:, None, None]*np.eye(GD)
+        shape = (GD*S.shape[0], GD*S.shape[1])
+        return bsr_matrix((data, S.indices, S.indptr), shape=shape)
+
+    def stiff_matrix(self, c=None, q=None):
+        S = self.scalarspace.stiff_matrix(c=c, q=q)
+        return self.block_diag_matrix(S)
+
+    def mass_matrix(self, c=None, q=None):
+        M = self.scalarspace.mass_matrix(c=c, q=q)
+        return self.block_diag_matrix(M)
+
+    def linear_elasticity_matrix(self, lam, mu, q=None):
+        """
+
+        Notes
+        -----
+        按结点交错排列的线弹性矩阵, 块大小为 (GD, GD), 见
+        `LagrangeFiniteElementSpace.linear_elasticity_matrix` 。
+        """
+        return self.scalarspace.linear_elasticity_matrix(lam, mu, format='bsr',
+                q=q)
 
     def source_vector(self, f, qf, measure, surface=None):
         p = self.p
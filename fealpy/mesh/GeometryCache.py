@@ -0,0 +1,65 @@
+import numpy as np
+
+from ..common import cache_state, same_cache_state
+
+
+class GeometryCache():
+    """
+
+    Notes
+    -----
+    网格几何量的缓存, 如单元的测度, 重心, Jacobi 矩阵和重心坐标的梯度等。
+
+    缓存的数据只和网格的 `node` 和 `ds.cell` 有关, 每次取数据时检查它们是否被替换
+    过 (加密, 二分或移动网格节点时都会生成新的数组), 如果被替换了就清空缓存。
+    拓扑数据结构重新生成 (ds.construct) 时也会清空缓存。
+
+    `node` 中的坐标可能被原地修改 (如 `mesh.node *= scale`), 所以还要比较
+    `node` 的指纹 (见 `cache_state`, 代价和网格规模无关)。只原地修改
+    少数几个节点, 或者原地修改 `ds.cell` 中的编号时, 需要手动调用 `clear()`。
+
+    缓存的数组都是只读的。
+    """
+    def __init__(self, mesh, maxsize=4):
+        self.mesh = mesh
+        self.maxsize = maxsize # 带参数的数据 (如 bc_to_point) 最多缓存的个数
+        self.clear()
+
+    def clear(self):
+        self.data = {}
+        self.state = None
+
+    def is_valid(self):
+        mesh = self.mesh
+        state = cache_state(mesh.node, mesh.ds.cell,
+                getattr(mesh.ds, 'edge', None))
+        if same_cache_state(self.state, state):
+            return True
+        self.data = {}
+        self.state = state
+        return False
+
+    def get(self, key, fun, *args):
+        """
+
+        Parameters
+        ----------
+        key : 字符串, 或者 (name, ...) 形式的带参数的元组
+        fun : 缓存中没有数据时, 用 fun(*args) 计算
+
+        Notes
+        -----
+        带参数的数据最多保留 maxsize 个, 超过时扔掉最早的。
+        """
+        self.is_valid()
+        val = self.data.get(key)
+        if val is None:
+            if isinstance(key, tuple):
+                keys = [k for k in self.data if isinstance(k, tuple)]
+                if len(keys) >= self.maxsize:
+                    self.data.pop(keys[0])
+            val = fun(*args)
+            val.setflags(write=False)
+            self.data[key] = val
+        return val
+
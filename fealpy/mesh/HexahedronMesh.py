@@ -3,6 +3,7 @@ from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril,
 from scipy.sparse import triu, tril, find, hstack
 from .mesh_tools import unique_row
 from .Mesh3d import Mesh3d, Mesh3dDataStructure 
+from .PointLocator import PointLocator
 
 class HexahedronMeshDataStructure(Mesh3dDataStructure):
 
@@ -50,6 +51,19 @@ class HexahedronMesh(Mesh3d):
         self.itype = cell.dtype
         self.ftype = node.dtype
 
+        self.locator = PointLocator(self)
+
+    def location(self, points, return_bc=False):
+        """
+        Notes
+        -----
+        给定一组点 p ， 找到这些点所在的单元, 网格外的点对应的单元编号为 -1 。
+
+        return_bc 为真时同时返回点在参考单元 [0, 1]^3 上的坐标, 即三线性变换
+        x(xi) = p 的解, 节点的编号顺序和 `MeshFactory.boxmesh3d` 一致。
+        """
+        return self.locator.find_cell(points, return_bc=return_bc)
+
     def volume(self):
         pass
 
@@ -0,0 +1,576 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .PolygonMesh import PolygonMesh
+from .QuadrangleMesh import QuadrangleMesh
+from .HexahedronMesh import HexahedronMesh
+
+
+def _uint64(a):
+    return np.asarray(a).astype(np.uint64)
+
+
+# 把整数的各位分散开 (中间留出 GD-1 个空位) 的移位和掩码, 见 spread_bits
+_SPREAD = {
+    2: [(16, 0x0000ffff0000ffff), (8, 0x00ff00ff00ff00ff),
+        (4, 0x0f0f0f0f0f0f0f0f), (2, 0x3333333333333333),
+        (1, 0x5555555555555555)],
+    3: [(32, 0x001f00000000ffff), (16, 0x001f0000ff0000ff),
+        (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3),
+        (2, 0x1249249249249249)],
+    }
+_NBITS = {2: 32, 3: 21}
+
+
+def spread_bits(x, GD):
+    """
+
+    Notes
+    -----
+    把 x 的第 b 位移到第 GD*b 位, 二维时 x 最多 32 位, 三维时最多 21 位。
+    """
+    x = _uint64(x) & np.uint64((1 << _NBITS[GD]) - 1)
+    for s, m in _SPREAD[GD]:
+        x = (x | (x << np.uint64(s))) & np.uint64(m)
+    return x
+
+
+def compact_bits(x, GD):
+    """
+
+    Notes
+    -----
+    spread_bits 的逆, 取出 x 的第 0, GD, 2*GD, ... 位。
+    """
+    x = _uint64(x) & np.uint64(_SPREAD[GD][-1][1])
+    for (s, _), (_, m) in zip(_SPREAD[GD][::-1],
+            _SPREAD[GD][-2::-1] + [(0, (1 << _NBITS[GD]) - 1)]):
+        x = (x | (x >> np.uint64(s))) & np.uint64(m)
+    return x
+
+
+class LinearTree():
+    """
+
+    Notes
+    -----
+    线性四叉树 (GD=2) 和八叉树 (GD=3): 只存叶子, 每个叶子用一个 uint64 的键
+    和一个 uint8 的层数表示, 键按从小到大的顺序排列。
+
+    区域是 box, 每个方向分成 n[i] 个根单元, 每个根单元是一棵树, 编号为
+    t = i0 + n0*(i1 + n1*i2) 。叶子的锚点 (坐标最小的顶点) 在最细一层
+    (maxdepth) 的整数坐标为 X, 键为
+
+        key = t << GD*maxdepth | morton(X % 2**maxdepth)
+
+    其中 Morton 编码按位交错各个坐标, x 在最低位 (和 OctreeForest 中
+    c_zc_yc_x 的顺序一致)。所以键的顺序是先按树, 树内按 Morton 序, 一个叶子的
+    后代在有序数组中是连续的一段, 兄弟叶子也排在一起。
+
+    * 加密把叶子原地换成它的 2**GD 个孩子, 不需要重新排序; 粗化把连续的一组
+      兄弟换成它们的父亲。
+    * 包含最细一层某个整数点的叶子是键不超过该点的键的最后一个叶子, 用
+      searchsorted 成批查找 (见 locate), 邻居和悬挂点都由此得到, 不需要
+      parent, child 数组和网格的拓扑。
+    * 只在需要时 (to_*_mesh, node_and_cell, hanging_node) 生成节点和单元。
+
+    每个叶子只占 9 个字节, 上千万个叶子的自适应八叉树也放得下。
+    """
+    def __init__(self, box, n, maxdepth=None):
+        GD = len(n)
+        if GD not in {2, 3}:
+            raise ValueError("only 2d and 3d linear trees are supported")
+        self.GD = GD
+        self.box = np.array(box, dtype=np.float64).reshape(GD, 2)
+        self.n = np.array(n, dtype=np.int64)
+        NT = int(np.prod(self.n))
+
+        # 键中放得下树的编号和 GD*maxdepth 位的 Morton 编码, 节点的键 (见
+        # node_key) 也不能溢出
+        treebits = int(NT - 1).bit_length()
+        L = min(_NBITS[GD] - 1, (63 - treebits)//GD)
+        while np.prod([float(k*2**L + 1) for k in self.n]) >= 2.0**63:
+            L -= 1
+        if maxdepth is None:
+            maxdepth = L
+        elif maxdepth > L:
+            raise ValueError("maxdepth {} is too large, the max depth of "
+                    "this tree is {}".format(maxdepth, L))
+        self.maxdepth = maxdepth
+        self.shift = np.uint64(GD*maxdepth)
+
+        self.key = np.arange(NT, dtype=np.uint64) << self.shift
+        self.level = np.zeros(NT, dtype=np.uint8)
+
+    def number_of_leaves(self):
+        return len(self.key)
+
+    def number_of_trees(self):
+        return int(np.prod(self.n))
+
+    def leaf_anchor(self, index=np.s_[:]):
+        """
+
+        Returns
+        -------
+        X: (NL, GD), 叶子的锚点在最细一层的整数坐标
+        """
+        key = self.key[index]
+        t = key >> self.shift
+        m = key & ((np.uint64(1) << self.shift) - np.uint64(1))
+        root = np.unravel_index(t.astype(np.int64), self.n, order='F')
+        X = np.zeros((len(key), self.GD), dtype=np.int64)
+        for i in range(self.GD):
+            X[:, i] = (root[i] << self.maxdepth) + \
+                    compact_bits(m >> np.uint64(i), self.GD).astype(np.int64)
+        return X
+
+    def leaf_size(self, index=np.s_[:]):
+        """
+
+        Returns
+        -------
+        h: (NL, ), 叶子在最细一层的整数坐标下的边长
+        """
+        return np.int64(1) << (self.maxdepth - self.level[index].astype(np.int64))
+
+    def point_key(self, X):
+        """
+
+        Notes
+        -----
+        最细一层的整数点 X (N, GD) 所在的最细的单元的键。
+        """
+        L = self.maxdepth
+        t = np.ravel_multi_index(tuple((X >> L).T), self.n, order='F')
+        key = _uint64(t) << self.shift
+        for i in range(self.GD):
+            key |= spread_bits(X[:, i] & ((1 << L) - 1), self.GD) << np.uint64(i)
+        return key
+
+    def is_inside(self, X):
+        return np.all((X >= 0) & (X < (self.n << self.maxdepth)), axis=-1)
+
+    def locate_integer_point(self, X):
+        """
+
+        Returns
+        -------
+        index: (N, ), 包含最细一层的整数点 X (N, GD) 的叶子, 区域外的为 -1
+        """
+        index = -np.ones(len(X), dtype=np.int64)
+        flag = self.is_inside(X)
+        key = self.point_key(X[flag])
+        index[flag] = np.searchsorted(self.key, key, side='right') - 1
+        return index
+
+    def integer_coordinates(self, points):
+        h = (self.box[:, 1] - self.box[:, 0])/(self.n << self.maxdepth)
+        return np.floor((points - self.box[:, 0])/h).astype(np.int64)
+
+    def locate(self, points):
+        """
+
+        Returns
+        -------
+        index: (N, ), 包含点 points (N, GD) 的叶子, 区域外的为 -1
+
+        Notes
+        -----
+        区域是闭的, 上边界上的点属于和它相邻的叶子。
+        """
+        X = self.integer_coordinates(points)
+        M = self.n << self.maxdepth
+        X = np.where(X == M, M - 1, X)
+        return self.locate_integer_point(X)
+
+    def leaf_barycenter(self, index=np.s_[:]):
+        X = self.leaf_anchor(index) + 0.5*self.leaf_size(index)[:, None]
+        h = (self.box[:, 1] - self.box[:, 0])/(self.n << self.maxdepth)
+        return self.box[:, 0] + X*h
+
+    def leaf_measure(self, index=np.s_[:]):
+        h = (self.box[:, 1] - self.box[:, 0])/(self.n << self.maxdepth)
+        return np.prod(h)*self.leaf_size(index).astype(np.float64)**self.GD
+
+    def child_index(self, index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        叶子是它父亲的第几个孩子 (c_zc_yc_x), 根为 0 。
+        """
+        level = self.level[index].astype(np.int64)
+        s = _uint64(self.GD*(self.maxdepth - level))
+        c = (self.key[index] >> s) & np.uint64(2**self.GD - 1)
+        c[level == 0] = 0
+        return c.astype(np.int64)
+
+    def refine(self, isMarkedLeaf=None, data=None):
+        """
+
+        Parameters
+        ----------
+        isMarkedLeaf: (NL, ) 布尔数组, 默认加密所有的叶子
+        data: 字典, 其中 (NL, ...) 的叶子数据复制到孩子上
+
+        Returns
+        -------
+        parent: (NL1, ), 新的每个叶子在加密前的编号
+        """
+        NL = self.number_of_leaves()
+        if isMarkedLeaf is None:
+            isMarkedLeaf = np.ones(NL, dtype=np.bool_)
+        flag = isMarkedLeaf & (self.level < self.maxdepth)
+
+        nchild = 2**self.GD
+        counts = np.where(flag, nchild, 1)
+        parent = np.repeat(np.arange(NL), counts)
+        c = np.arange(len(parent)) - np.repeat(np.cumsum(counts) - counts, counts)
+        isChild = flag[parent]
+        level = self.level[parent] + isChild.astype(np.uint8)
+
+        # 孩子的键: 在父亲的键中把下一层的 GD 位设为孩子的编号
+        key = self.key[parent]
+        s = _uint64(self.GD*(self.maxdepth - level[isChild].astype(np.int64)))
+        key[isChild] |= _uint64(c[isChild]) << s
+
+        self.key = key
+        self.level = level
+        if data is not None:
+            for k, v in data.items():
+                data[k] = np.asarray(v)[parent]
+        return parent
+
+    def uniform_refine(self, n=1):
+        for i in range(n):
+            self.refine()
+
+    def coarsen(self, isMarkedLeaf, data=None):
+        """
+
+        Parameters
+        ----------
+        isMarkedLeaf: (NL, ) 布尔数组
+        data: 字典, 其中 (NL, ...) 的叶子数据在粗化后取孩子的平均值
+
+        Returns
+        -------
+        child: (NL1, ), 新的每个叶子在粗化前的编号 (粗化得到的叶子为它的第
+            0 个孩子)
+
+        Notes
+        -----
+        一组 2**GD 个兄弟都是叶子并且都被标记时, 换成它们的父亲。粗化后可能
+        不再满足 2:1 平衡, 需要时再调用 balance 。
+        """
+        NL = self.number_of_leaves()
+        nchild = 2**self.GD
+        idx, = np.nonzero((self.child_index() == 0) & (self.level > 0))
+        idx = idx[idx + nchild - 1 < NL]
+
+        # 连续 2**GD 个叶子层数相同并且最后一个是第 2**GD - 1 个孩子, 它们就是
+        # 一组兄弟
+        last = idx + nchild - 1
+        isFamily = (self.level[last] == self.level[idx]) & \
+                (self.child_index(last) == nchild - 1)
+        m = np.r_[0, np.cumsum(isMarkedLeaf)]
+        isFamily &= (m[last + 1] - m[idx]) == nchild
+        idx = idx[isFamily]
+
+        isRemain = np.ones(NL, dtype=np.bool_)
+        isRemain[(idx[:, None] + np.arange(1, nchild)).reshape(-1)] = False
+        child, = np.nonzero(isRemain)
+
+        self.level[idx] -= np.uint8(1)
+        self.key = self.key[isRemain]
+        self.level = self.level[isRemain]
+        if data is not None:
+            for k, v in data.items():
+                v = np.array(v)
+                group = v[(idx[:, None] + np.arange(nchild)).reshape(-1)]
+                v[idx] = np.mean(group.reshape((len(idx), nchild) + v.shape[1:]), axis=1)
+                data[k] = v[isRemain]
+        return child
+
+    def directions(self, connect='face'):
+        """
+
+        Notes
+        -----
+        相邻的方向: 'face' 只有面 (二维为边) 相邻, 'corner' 包括所有共顶点的
+        方向。
+        """
+        d = np.array(np.meshgrid(*([[-1, 0, 1]]*self.GD), indexing='ij'))
+        d = d.reshape(self.GD, -1).T
+        n = np.sum(np.abs(d), axis=-1)
+        if connect == 'face':
+            return d[n == 1]
+        elif connect == 'corner':
+            return d[n > 0]
+        else:
+            raise ValueError("unknown connection: {}".format(connect))
+
+    def neighbor(self, direction, index=np.s_[:]):
+        """
+
+        Parameters
+        ----------
+        direction: (GD, ), 每个分量为 -1, 0 或 1
+
+        Returns
+        -------
+        nb: (NL, ), 沿 direction 和叶子相邻的同样大小的区域的锚点所在的叶子,
+            在区域外为 -1 。邻居更粗时就是这个邻居, 更细时是贴着该锚点的那个。
+        """
+        X = self.leaf_anchor(index)
+        h = self.leaf_size(index)
+        return self.locate_integer_point(X + np.asarray(direction)*h[:, None])
+
+    def unbalanced_leaf(self, index=None, connect='face', returnsource=False):
+        """
+
+        Notes
+        -----
+        index 中的叶子的邻居里比它粗两层以上的叶子。returnsource 为 True 时
+        还返回 index 中有这样的邻居的叶子。
+        """
+        if index is None:
+            index, = np.nonzero(self.level > 1)
+        X = self.leaf_anchor(index)
+        h = self.leaf_size(index)
+        level = self.level[index]
+        isMarked = np.zeros(self.number_of_leaves(), dtype=np.bool_)
+        isSource = np.zeros(len(index), dtype=np.bool_)
+        for d in self.directions(connect):
+            nb = self.locate_integer_point(X + d*h[:, None])
+            flag = nb >= 0
+            flag[flag] = self.level[nb[flag]] + 1 < level[flag]
+            isMarked[nb[flag]] = True
+            isSource |= flag
+        if returnsource:
+            return isMarked, index[isSource]
+        else:
+            return isMarked
+
+    def is_balanced(self, connect='face'):
+        return not np.any(self.unbalanced_leaf(connect=connect))
+
+    def balance(self, connect='face', data=None):
+        """
+
+        Notes
+        -----
+        加密叶子直到相邻 (见 directions) 的叶子层数最多差一 (2:1 平衡)。
+
+        每一轮把比邻居细两层以上的叶子的邻居加密一层。只有新产生的叶子和
+        这一轮的邻居还不够细的叶子可能仍不平衡, 所以下一轮只检查它们。
+        """
+        index = None
+        while True:
+            isMarked, source = self.unbalanced_leaf(index=index,
+                    connect=connect, returnsource=True)
+            if not np.any(isMarked):
+                break
+            isChecked = isMarked.copy()
+            isChecked[source] = True
+            parent = self.refine(isMarked, data=data)
+            index, = np.nonzero(isChecked[parent])
+
+    def corner(self):
+        """
+
+        Returns
+        -------
+        c: (2**GD, GD), 叶子的顶点相对锚点的位置 (c_zc_yc_x 的顺序)
+        """
+        c = np.arange(2**self.GD)
+        return np.stack([(c >> i) & 1 for i in range(self.GD)], axis=1)
+
+    def node_key(self, X):
+        """
+
+        Notes
+        -----
+        最细一层的整数点 X (N, GD) 的键, 按字典序压缩成一个 uint64 。
+        """
+        M = _uint64((self.n << self.maxdepth) + 1)
+        key = _uint64(X[:, 0])
+        for i in range(1, self.GD):
+            key = key*M[i] + _uint64(X[:, i])
+        return key
+
+    def node_and_cell(self):
+        """
+
+        Returns
+        -------
+        node: (NN, GD), 所有叶子的顶点
+        cell: (NL, 2**GD), 每个叶子的顶点编号 (c_zc_yc_x 的顺序)
+        """
+        NL = self.number_of_leaves()
+        X = self.leaf_anchor()
+        h = self.leaf_size()
+        V = (X[:, None, :] + self.corner()*h[:, None, None]).reshape(-1, self.GD)
+        key, i0, j = np.unique(self.node_key(V), return_index=True,
+                return_inverse=True)
+        h = (self.box[:, 1] - self.box[:, 0])/(self.n << self.maxdepth)
+        node = self.box[:, 0] + V[i0]*h
+        self.nodekey = key
+        return node, j.reshape(NL, -1)
+
+    def hanging_node(self):
+        """
+
+        Returns
+        -------
+        hnode: (NH, ), 悬挂点在 node_and_cell 的节点中的编号
+        H: (NH, NN) 的 csr 矩阵, 悬挂点上的值由它所在的粗叶子的边 (面) 的顶点
+           插值得到, 第 i 行是 hnode[i] 的插值系数
+
+        Notes
+        -----
+        节点是悬挂点当且仅当它周围的某个叶子不以它为顶点。在这个叶子中它的每个
+        分量的相对位置 t 在 (0, 1) 中时, 对应的两个顶点的权重为 1-t 和 t 。
+        2:1 平衡时 t 都是 1/2, 悬挂点是粗叶子的边 (或面) 的中点, 否则插值的
+        顶点可能也是悬挂点, 需要递归地约束。
+        """
+        node, cell = self.node_and_cell()
+        key = self.nodekey
+        NN = len(node)
+
+        # 由节点的键反算整数坐标
+        M = _uint64((self.n << self.maxdepth) + 1)
+        V = np.zeros((NN, self.GD), dtype=np.int64)
+        k = key.copy()
+        for i in range(self.GD-1, -1, -1):
+            V[:, i] = (k % M[i]).astype(np.int64)
+            k //= M[i]
+
+        isHangingNode = np.zeros(NN, dtype=np.bool_)
+        leaf = -np.ones(NN, dtype=np.int64)
+        for s in self.corner():
+            idx = self.locate_integer_point(V - s)
+            i, = np.nonzero(idx >= 0)
+            idx = idx[i]
+            h = self.leaf_size(idx)
+            r = V[i] - self.leaf_anchor(idx)
+            isCorner = np.all((r == 0) | (r == h[:, None]), axis=-1)
+            flag = ~isCorner & ~isHangingNode[i]
+            isHangingNode[i[flag]] = True
+            leaf[i[flag]] = idx[flag]
+
+        hnode, = np.nonzero(isHangingNode)
+        NH = len(hnode)
+        A = self.leaf_anchor(leaf[hnode])
+        h = self.leaf_size(leaf[hnode])
+        t = (V[hnode] - A)/h[:, None]
+
+        # 悬挂点所在的叶子的每个顶点的权重, 为 0 的舍去
+        c = self.corner()
+        w = np.prod(np.where(c == 1, t[:, None, :], 1 - t[:, None, :]), axis=-1)
+        P = A[:, None, :] + c*h[:, None, None]
+        J = np.searchsorted(key, self.node_key(P.reshape(-1, self.GD)))
+        I = np.repeat(np.arange(NH), len(c))
+        flag = w.reshape(-1) > 0
+        H = csr_matrix((w.reshape(-1)[flag], (I[flag], J[flag])), shape=(NH, NN))
+        return hnode, H
+
+
+class LinearQuadtree(LinearTree):
+    """
+
+    Notes
+    -----
+    线性四叉树, 见 LinearTree 。
+
+    Examples
+    --------
+    >>> tree = LinearQuadtree([0, 1, 0, 1], nx=2, ny=2)
+    >>> tree.uniform_refine(2)
+    >>> bc = tree.leaf_barycenter()
+    >>> tree.refine(np.linalg.norm(bc - 0.5, axis=-1) < 0.1)
+    >>> tree.balance()
+    >>> mesh = tree.to_polygon_mesh()
+    """
+    def __init__(self, box, nx=1, ny=1, maxdepth=None):
+        super(LinearQuadtree, self).__init__(box, (nx, ny), maxdepth=maxdepth)
+
+    def to_quadrangle_mesh(self):
+        """
+
+        Notes
+        -----
+        每个叶子是一个四边形单元 (逆时针), 有悬挂点时网格是非协调的, 见
+        hanging_node 。
+        """
+        node, cell = self.node_and_cell()
+        return QuadrangleMesh(node, cell[:, [0, 1, 3, 2]])
+
+    def to_polygon_mesh(self):
+        """
+
+        Notes
+        -----
+        每个叶子是一个多边形单元, 边上有悬挂点时把它作为多边形的顶点, 得到
+        协调的多边形网格。要求树是 2:1 平衡的 (见 balance), 这时每条边上最多
+        有一个悬挂点 (边的中点)。
+        """
+        if not self.is_balanced():
+            raise ValueError("the quadtree should be 2:1 balanced, "
+                    "call balance() first")
+        node, cell = self.node_and_cell()
+        NL = self.number_of_leaves()
+        X = self.leaf_anchor()
+        h = self.leaf_size()
+
+        # 逆时针的四个顶点和四条边的中点
+        corner = np.array([0, 1, 3, 2])
+        mid = np.array([(1, 0), (2, 1), (1, 2), (0, 1)])
+        P = (2*X[:, None, :] + mid*h[:, None, None])//2
+        key = self.node_key(P.reshape(-1, 2))
+        J = np.searchsorted(self.nodekey, key)
+        J[J == len(self.nodekey)] = 0
+        isMidNode = (self.nodekey[J] == key).reshape(NL, 4)
+        isMidNode &= (h[:, None] > 1) # 最细一层的叶子的边上没有中点
+
+        pcell = np.zeros((NL, 8), dtype=cell.dtype)
+        pcell[:, 0::2] = cell[:, corner]
+        pcell[:, 1::2] = J.reshape(NL, 4)
+        flag = np.ones((NL, 8), dtype=np.bool_)
+        flag[:, 1::2] = isMidNode
+        pcellLocation = np.zeros(NL+1, dtype=np.int_)
+        pcellLocation[1:] = np.cumsum(flag.sum(axis=-1))
+        return PolygonMesh(node, pcell[flag], pcellLocation)
+
+
+class LinearOctree(LinearTree):
+    """
+
+    Notes
+    -----
+    线性八叉树, 见 LinearTree 。
+
+    Examples
+    --------
+    >>> tree = LinearOctree([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=1)
+    >>> tree.uniform_refine(3)
+    >>> bc = tree.leaf_barycenter()
+    >>> tree.refine(np.linalg.norm(bc - 0.5, axis=-1) < 0.1)
+    >>> tree.balance(connect='corner')
+    >>> mesh = tree.to_hexahedron_mesh()
+    >>> hnode, H = tree.hanging_node()
+    """
+    def __init__(self, box, nx=1, ny=1, nz=1, maxdepth=None):
+        super(LinearOctree, self).__init__(box, (nx, ny, nz), maxdepth=maxdepth)
+
+    def to_hexahedron_mesh(self):
+        """
+
+        Notes
+        -----
+        每个叶子是一个六面体单元, 有悬挂点时网格是非协调的, 悬挂点的约束见
+        hanging_node 。
+        """
+        node, cell = self.node_and_cell()
+        return HexahedronMesh(node, cell[:, [0, 1, 3, 2, 4, 5, 7, 6]])
@@ -1,13 +1,18 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from .mesh_tools import unique_row, find_node, find_entity, show_mesh_2d
-from ..common import ranges
+from ..common import ranges, index_type
+from .TopologyCache import TopologyCache, topology_cache
+from .reorder import mesh_reorder
+from .core import unique_entity
 from types import ModuleType
 
 class Mesh2d(object):
     """ The base class of TriangleMesh and QuadrangleMesh
         The class is just a abstract class, and you can not use it directly.
     """
+    autoreorder = None # 加密后自动重排编号的方法, 见 reorder
+
     def number_of_nodes(self):
         return self.ds.NN
 
@@ -154,6 +159,19 @@ class Mesh2d(object):
         v = node[edge[index, 1],:] - node[edge[index, 0],:]
         return v
 
+    def reorder(self, method='hilbert', data=None):
+        """
+
+        Notes
+        -----
+        重新给节点和单元编号, 提高数据的局部性 ('hilbert', 'morton') 或者减小
+        带宽 ('rcm'), 节点和单元上的数据以及 data 中的数据一起重排, 见
+        `mesh_reorder` 。
+
+        `autoreorder` 不是 None 时, 每次加密后都会按这个方法自动重排。
+        """
+        return mesh_reorder(self, method=method, data=data)
+
     def add_plot(
             self, plot,
             nodecolor='w', edgecolor='k',
@@ -222,23 +240,43 @@ class Mesh2dDataStructure():
     """ The topology data structure of mesh 2d
         This is just a abstract class, and you can not use it directly.
     """
+    topocache = None # 导出的邻接关系的缓存, 见 TopologyCache
+    nthreads = 1 # 构造边时排序的线程数, 见 unique_entity
 
     def __init__(self, NN, cell):
+        self.topocache = TopologyCache(self)
         self.NN = NN
         self.NC = cell.shape[0]
         self.cell = cell
         self.itype = cell.dtype
         self.construct()
 
-    def reinit(self, NN, cell):
+    def reinit(self, NN, cell, edge=None, edge2cell=None):
+        """
+
+        Notes
+        -----
+        同时给出 edge 和 edge2cell 时 (如 TriangleMesh.bisect 中局部更新得到
+        的边) 直接使用它们, 否则由 cell 重新生成。
+        """
         self.NN = NN
         self.NC = cell.shape[0]
         self.cell = cell
-        self.construct()
+        self.itype = cell.dtype
+        if (edge is None) or (edge2cell is None):
+            self.construct()
+        else:
+            if self.topocache is not None:
+                self.topocache.clear()
+            self.NE = edge.shape[0]
+            self.edge = edge
+            self.edge2cell = edge2cell
 
     def clear(self):
         self.edge = None
         self.edge2cell = None
+        if self.topocache is not None:
+            self.topocache.clear()
 
     def number_of_nodes_of_cells(self):
         return self.V
@@ -267,22 +305,20 @@ class Mesh2dDataStructure():
     def construct(self):
         """ Construct edge and edge2cell from cell
         """
+        if self.topocache is not None:
+            self.topocache.clear()
         NC = self.NC
         E = self.E
 
         totalEdge = self.total_edge()
-        _, i0, j = np.unique(np.sort(totalEdge, axis=-1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, i1, _ = unique_entity(totalEdge, nthreads=self.nthreads)
         NE = i0.shape[0]
         self.NE = NE
 
+        # 边的个数可能超出单元数组整数类型的范围
+        self.itype = index_type(max(NE, NC), self.itype)
         self.edge2cell = np.zeros((NE, 4), dtype=self.itype)
 
-        i1 = np.zeros(NE, dtype=self.itype)
-        i1[j] = np.arange(E*NC, dtype=self.itype)
-
         self.edge2cell[:, 0] = i0//E
         self.edge2cell[:, 1] = i1//E
         self.edge2cell[:, 2] = i0%E
@@ -290,6 +326,7 @@ class Mesh2dDataStructure():
 
         self.edge = totalEdge[i0, :]
 
+    @topology_cache
     def cell_to_node(self):
         """ 
         """
@@ -304,6 +341,7 @@ class Mesh2dDataStructure():
         cell2node = csr_matrix((val, (I, cell.flatten())), shape=(NC, NN), dtype=np.bool)
         return cell2node
 
+    @topology_cache
     def cell_to_edge(self, sparse=False):
         """ The neighbor information of cell to edge
         """
@@ -327,6 +365,7 @@ class Mesh2dDataStructure():
                     shape=(NC, NE), dtype=np.bool)
             return cell2edge 
 
+    @topology_cache
     def cell_to_edge_sign(self, return_sparse=False):
         NC = self.NC
         E = self.E
@@ -342,6 +381,7 @@ class Mesh2dDataStructure():
                     shape=(NC, NE), dtype=np.bool)
         return cell2edgeSign
 
+    @topology_cache
     def cell_to_face(self, return_sparse=False):
         """ The neighbor information of cell to edge
         """
@@ -366,6 +406,7 @@ class Mesh2dDataStructure():
             return cell2edge 
 
 
+    @topology_cache
     def cell_to_cell(self, return_sparse=False, return_boundary=True, return_array=False):
         """ Consctruct the neighbor information of cells
         """
@@ -460,6 +501,7 @@ class Mesh2dDataStructure():
             face2cell = csr_matrix((val, (I, J)), shape=(NE, NC), dtype=np.bool)
             return face2cell 
 
+    @topology_cache
     def node_to_node(self, return_array=False):
         """ The neighbor information of nodes
         """
@@ -486,6 +528,7 @@ class Mesh2dDataStructure():
         node2node = csr_matrix((val, (I, J)), shape=(NN, NN), dtype=np.bool)
         return node2node
 
+    @topology_cache
     def node_to_edge(self):
         NN = self.NN
         NE = self.NE
@@ -497,6 +540,7 @@ class Mesh2dDataStructure():
         node2edge = csr_matrix((val, (I, J)), shape=(NN, NE), dtype=np.bool)
         return node2edge
 
+    @topology_cache
     def node_to_cell(self, localidx=False):
         """
         """
@@ -517,6 +561,7 @@ class Mesh2dDataStructure():
             node2cell = csr_matrix((val, (I, J)), shape=(NN, NC), dtype=np.bool)
         return node2cell
 
+    @topology_cache
     def boundary_edge_to_edge(self):
         NN = self.NN
         edge = self.edge
@@ -530,6 +575,7 @@ class Mesh2dDataStructure():
         _, nex = (m1*m0.T).nonzero()
         return index[pre], index[nex]
 
+    @topology_cache
     def boundary_node_flag(self):
         NN = self.NN
         edge = self.edge
@@ -538,6 +584,7 @@ class Mesh2dDataStructure():
         isBdPoint[edge[isBdEdge,:]] = True
         return isBdPoint
 
+    @topology_cache
     def boundary_edge_flag(self):
         edge2cell = self.edge2cell
         return edge2cell[:, 0] == edge2cell[:, 1]
@@ -546,6 +593,7 @@ class Mesh2dDataStructure():
         edge = self.edge
         return edge[self.boundary_edge_index()]
 
+    @topology_cache
     def boundary_face_flag(self):
         edge2cell = self.edge2cell
         return edge2cell[:, 0] == edge2cell[:, 1]
@@ -554,6 +602,7 @@ class Mesh2dDataStructure():
         edge = self.edge
         return edge[self.boundary_edge_index()]
 
+    @topology_cache
     def boundary_cell_flag(self):
         NC = self.NC
         edge2cell = self.edge2cell
@@ -562,21 +611,25 @@ class Mesh2dDataStructure():
         isBdCell[edge2cell[isBdEdge,0]] = True
         return isBdCell 
 
+    @topology_cache
     def boundary_node_index(self):
         isBdPoint = self.boundary_node_flag()
         idx, = np.nonzero(isBdPoint)
         return idx 
 
+    @topology_cache
     def boundary_edge_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx 
 
+    @topology_cache
     def boundary_face_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx 
 
+    @topology_cache
     def boundary_cell_index(self):
         isBdCell = self.boundary_cell_flag()
         idx, = np.nonzero(isBdCell)
@@ -3,10 +3,15 @@ import numpy as np
 from types import ModuleType
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from .mesh_tools import unique_row, find_entity, show_mesh_3d, find_node
-from ..common import ranges
+from ..common import ranges, index_type
+from .TopologyCache import TopologyCache, topology_cache
+from .reorder import mesh_reorder
+from .core import unique_entity
 
 
 class Mesh3d():
+    autoreorder = None # 加密后自动重排编号的方法, 见 reorder
+
     def __init__(self):
         pass
 
@@ -104,6 +109,19 @@ class Mesh3d():
         length = np.sqrt(np.square(v).sum(axis=1))
         return v/length.reshape(-1, 1)
 
+    def reorder(self, method='hilbert', data=None):
+        """
+
+        Notes
+        -----
+        重新给节点和单元编号, 提高数据的局部性 ('hilbert', 'morton') 或者减小
+        带宽 ('rcm'), 节点和单元上的数据以及 data 中的数据一起重排, 见
+        `mesh_reorder` 。
+
+        `autoreorder` 不是 None 时, 每次加密后都会按这个方法自动重排。
+        """
+        return mesh_reorder(self, method=method, data=data)
+
     def add_plot(
             self, plot,
             nodecolor='k', edgecolor='k', facecolor='w', cellcolor='w',
@@ -185,7 +203,11 @@ class Mesh3d():
 
 
 class Mesh3dDataStructure():
+    topocache = None # 导出的邻接关系的缓存, 见 TopologyCache
+    nthreads = 1 # 构造边和面时排序的线程数, 见 unique_entity
+
     def __init__(self, NN, cell):
+        self.topocache = TopologyCache(self)
         self.itype = cell.dtype
         self.NN = NN
         self.NC = cell.shape[0]
@@ -196,6 +218,7 @@ class Mesh3dDataStructure():
         self.NN = NN
         self.NC = cell.shape[0]
         self.cell = cell
+        self.itype = cell.dtype
         self.construct()
 
     def clear(self):
@@ -203,6 +226,8 @@ class Mesh3dDataStructure():
         self.edge = None
         self.face2cell = None
         self.cell2edge = None
+        if self.topocache is not None:
+            self.topocache.clear()
 
     def number_of_nodes_of_cells(self):
         return self.V
@@ -226,42 +251,38 @@ class Mesh3dDataStructure():
         return totalFace
 
     def construct(self):
+        if self.topocache is not None:
+            self.topocache.clear()
+
         NC = self.NC
 
         totalFace = self.total_face()
-
-        _, i0, j = np.unique(
-                np.sort(totalFace, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, i1, _ = unique_entity(totalFace, nthreads=self.nthreads)
 
         self.face = totalFace[i0]
 
         NF = i0.shape[0]
         self.NF = NF
 
+        # 面和边的个数可能超出单元数组整数类型的范围
+        self.itype = index_type(max(NF, NC), self.itype)
         self.face2cell = np.zeros((NF, 4), dtype=self.itype)
 
-        i1 = np.zeros(NF, dtype=self.itype)
         F = self.F
-        i1[j] = np.arange(F*NC)
-
         self.face2cell[:, 0] = i0 // F
         self.face2cell[:, 1] = i1 // F
         self.face2cell[:, 2] = i0 % F
         self.face2cell[:, 3] = i1 % F
 
         totalEdge = self.total_edge()
-        self.edge, i2, j = np.unique(
-                np.sort(totalEdge, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i2, _, j = unique_entity(totalEdge, nthreads=self.nthreads)
+        self.edge = np.sort(totalEdge[i2], axis=1)
         E = self.E
-        self.cell2edge = np.reshape(j, (NC, E))
         self.NE = self.edge.shape[0]
+        self.itype = index_type(self.NE, self.itype)
+        self.cell2edge = np.reshape(j, (NC, E)).astype(self.itype)
 
+    @topology_cache
     def cell_to_node(self, return_sparse=True):
         """
         """
@@ -309,6 +330,7 @@ class Mesh3dDataStructure():
             cell2edgeSign[:, i] = cell[:, j] < cell[:, k]
         return cell2edgeSign
 
+    @topology_cache
     def cell_to_face(self, return_sparse=False):
         NC = self.NC
         NF = self.NF
@@ -330,6 +352,7 @@ class Mesh3dDataStructure():
                     ), shape=(NC, NF), dtype=np.bool)
             return cell2face
 
+    @topology_cache
     def cell_to_cell(
             self, return_sparse=False,
             return_boundary=True, return_array=False):
@@ -400,6 +423,7 @@ class Mesh3dDataStructure():
                     ), shape=(NF, NN), dtype=np.bool)
             return face2node
 
+    @topology_cache
     def face_to_edge(self, return_sparse=False):
         cell2edge = self.cell2edge
         face2cell = self.face2cell
@@ -466,6 +490,7 @@ class Mesh3dDataStructure():
         edge2node = self.edge_to_node()
         return edge2node*edge2node.transpose()
 
+    @topology_cache
     def edge_to_face(self):
         NF = self.NF
         NE = self.NE
@@ -481,6 +506,7 @@ class Mesh3dDataStructure():
                 ), shape=(NE, NF), dtype=np.bool)
         return edge2face
 
+    @topology_cache
     def edge_to_cell(self, localidx=False):
         NC = self.NC
         NE = self.NE
@@ -496,6 +522,7 @@ class Mesh3dDataStructure():
                 ), shape=(NE, NC), dtype=np.bool)
         return edge2cell
 
+    @topology_cache
     def node_to_node(self):
         """ The neighbor information of nodes
         """
@@ -512,6 +539,7 @@ class Mesh3dDataStructure():
                 ), shape=(NN, NN), dtype=np.bool)
         return node2node
 
+    @topology_cache
     def node_to_edge(self):
         NN = self.NN
         NE = self.NE
@@ -526,6 +554,7 @@ class Mesh3dDataStructure():
                 ), shape=(NE, NN), dtype=np.bool)
         return node2edge
 
+    @topology_cache
     def node_to_face(self):
         NN = self.NN
         NF = self.NF
@@ -542,6 +571,7 @@ class Mesh3dDataStructure():
                 ), shape=(NF, NN), dtype=np.bool)
         return node2face
 
+    @topology_cache
     def node_to_cell(self, return_local_index=False):
         """
         """
@@ -571,6 +601,7 @@ class Mesh3dDataStructure():
                     ), shape=(NN, NC), dtype=np.bool)
         return node2cell
 
+    @topology_cache
     def boundary_node_flag(self):
         NN = self.NN
         face = self.face
@@ -579,6 +610,7 @@ class Mesh3dDataStructure():
         isBdPoint[face[isBdFace, :]] = True
         return isBdPoint
 
+    @topology_cache
     def boundary_edge_flag(self):
         NE = self.NE
         face2edge = self.face_to_edge()
@@ -587,10 +619,12 @@ class Mesh3dDataStructure():
         isBdEdge[face2edge[isBdFace, :]] = True
         return isBdEdge
 
+    @topology_cache
     def boundary_face_flag(self):
         face2cell = self.face_to_cell()
         return face2cell[:, 0] == face2cell[:, 1]
 
+    @topology_cache
     def boundary_cell_flag(self):
         NC = self.NC
         face2cell = self.face_to_cell()
@@ -599,21 +633,25 @@ class Mesh3dDataStructure():
         isBdCell[face2cell[isBdFace, 0]] = True
         return isBdCell
 
+    @topology_cache
     def boundary_node_index(self):
         isBdNode = self.boundary_node_flag()
         idx, = np.nonzero(isBdNode)
         return idx
 
+    @topology_cache
     def boundary_edge_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx
 
+    @topology_cache
     def boundary_face_index(self):
         isBdFace = self.boundary_face_flag()
         idx, = np.nonzero(isBdFace)
         return idx
 
+    @topology_cache
     def boundary_cell_index(self):
         isBdCell = self.boundary_cell_flag()
         idx, = np.nonzero(isBdCell)
@@ -10,6 +10,7 @@ from ..geometry import dcircle, drectangle
 from ..geometry import ddiff
 from ..geometry import huniform
 from ..decorator import timer
+from ..common import index_type
 
 from .TriangleMesh import TriangleMesh, TriangleMeshWithInfinityNode
 from .QuadrangleMesh import QuadrangleMesh
@@ -53,7 +54,7 @@ class MeshFactory():
         return node, cell
 
     @classmethod
-    def one_triangle_mesh(self, meshtype='iso'):
+    def one_triangle_mesh(self, meshtype='iso', itype=np.int_):
         if meshtype == 'equ':
             node = np.array([
                 [0.0, 0.0],
@@ -64,11 +65,11 @@ class MeshFactory():
                 [0.0, 0.0],
                 [1.0, 0.0],
                 [0.0, 1.0]], dtype=np.float64)
-        cell = np.array([[0, 1, 2]], dtype=np.int_)
+        cell = np.array([[0, 1, 2]], dtype=itype)
         return TriangleMesh(node, cell)
 
     @classmethod
-    def one_quad_mesh(self, meshtype='square'):
+    def one_quad_mesh(self, meshtype='square', itype=np.int_):
         if meshtype in {'square', 'zhengfangxing'}:
             node = np.array([
                 [0.0, 0.0],
@@ -87,11 +88,11 @@ class MeshFactory():
                 [1.0, 0.0],
                 [1.5, np.sqrt(3)/2],
                 [0.5, np.sqrt(3)/2]], dtype=np.float64)
-        cell = np.array([[0, 1, 2, 3]], dtype=np.int_)
+        cell = np.array([[0, 1, 2, 3]], dtype=itype)
         return QuadrangleMesh(node, cell)
 
     @classmethod
-    def one_tetrahedron_mesh(self, meshtype='equ'):
+    def one_tetrahedron_mesh(self, meshtype='equ', itype=np.int_):
         if meshtype == 'equ':
             node = np.array([
                 [0.0, 0.0, 0.0],
@@ -104,20 +105,23 @@ class MeshFactory():
                 [1.0, 0.0, 0.0],
                 [0.0, 1.0, 0.0],
                 [0.0, 0.0, 1.0]], dtype=np.float64)
-        cell = np.array([[0, 1, 2, 3]], dtype=np.int_)
+        cell = np.array([[0, 1, 2, 3]], dtype=itype)
         return TetrahedronMesh(node, cell)
 
 
     @classmethod
     @timer
     def boxmesh2d(self, box, nx=10, ny=10, meshtype='tri', threshold=None,
-            returnnc=False, p=None):
+            returnnc=False, p=None, itype=np.int_):
         """
 
         Notes
         -----
         生成二维矩形区域上的网格，包括结构的三角形、四边形和三角形对偶的多边形网
         格. 
+
+        itype 为单元数组的整数类型, 取 np.int32 时网格及其上的自由度数组都用 32
+        位整数存储, 加密后实体个数超出范围时会自动提升为 int64 。
         """
         N = (nx+1)*(ny+1)
         NC = nx*ny
@@ -129,7 +133,7 @@ class MeshFactory():
 
         idx = np.arange(N).reshape(nx+1, ny+1)
         if meshtype in {'tri', 'triangle'}:
-            cell = np.zeros((2*NC, 3), dtype=np.int)
+            cell = np.zeros((2*NC, 3), dtype=index_type(N, itype))
             cell[:NC, 0] = idx[1:,0:-1].flatten(order='F')
             cell[:NC, 1] = idx[1:,1:].flatten(order='F')
             cell[:NC, 2] = idx[0:-1, 0:-1].flatten(order='F')
@@ -147,7 +151,7 @@ class MeshFactory():
             else:
                 return LagrangeTriangleMesh(node, cell, p=p)
         elif meshtype == 'quad':
-            cell = np.zeros((NC,4), dtype=np.int_)
+            cell = np.zeros((NC,4), dtype=index_type(N, itype))
             cell[:,0] = idx[0:-1, 0:-1].flatten()
             cell[:,1] = idx[1:, 0:-1].flatten()
             cell[:,2] = idx[1:, 1:].flatten()
@@ -178,11 +182,13 @@ class MeshFactory():
 
     @classmethod
     @timer
-    def boxmesh3d(self, box, nx=10, ny=10, nz=10, meshtype='hex', threshold=None):
+    def boxmesh3d(self, box, nx=10, ny=10, nz=10, meshtype='hex', threshold=None,
+            itype=np.int_):
         """
         Notes
         -----
-        生成长方体区域上的六面体或四面体网格。
+        生成长方体区域上的六面体或四面体网格。itype 为单元数组的整数类型, 见
+        boxmesh2d 。
         """
         N = (nx+1)*(ny+1)*(nz+1)
         NC = nx*ny*nz
@@ -199,7 +205,7 @@ class MeshFactory():
         idx = np.arange(N).reshape(nx+1, ny+1, nz+1)
         c = idx[:-1, :-1, :-1]
 
-        cell = np.zeros((NC, 8), dtype=np.int_)
+        cell = np.zeros((NC, 8), dtype=index_type(N, itype))
         nyz = (ny + 1)*(nz + 1)
         cell[:, 0] = c.flatten()
         cell[:, 1] = cell[:, 0] + nyz
@@ -0,0 +1,429 @@
+import numpy as np
+
+from ..common import ranges, cache_state, same_cache_state
+
+
+class PointLocator():
+    """
+
+    Notes
+    -----
+    网格的点定位索引, 给定一组点, 找到它们所在的单元和在单元中的局部坐标。
+
+    把网格的包围盒划分成均匀的桶, 每个桶中记下和它相交的单元 (按单元的包围盒),
+    查询时只需在点所在的桶中逐个检查候选单元。不需要区域是凸的或者没有洞, 网格
+    外的点返回的单元编号为 -1 。
+
+    索引在第一次查询时生成, 之后一直重用, 直到网格的 `node` 或 `cell` 被替换
+    (加密, 粗化或者移动网格节点都会生成新的数组), 或者 `node` 被原地修改, 和
+    GeometryCache 的规则一样 (见 `cache_state`)。只原地修改少数几个节点时需要
+    手动调用 `clear()` 。
+
+    支持 GD == TD 的以下几类网格, 不同的单元返回不同的局部坐标:
+
+    * 单纯形 (三角形, 四面体): 重心坐标, 形状为 (GD+1, )
+    * 四边形和六面体: 参考单元 [0, 1]^GD 上的坐标, 形状为 (GD, ), 由多线性变换
+      的 Newton 迭代求得, 节点的编号顺序和 `MeshFactory.boxmesh2d/3d` 一致
+    * 多面体: 没有参考单元, 局部坐标就是点的笛卡尔坐标, 点是否在单元中用单元边
+      界的环绕数 (winding number) 判断, 不要求单元是凸的
+    """
+    def __init__(self, mesh, tol=1e-12, chunksize=100000, maxit=20):
+        self.mesh = mesh
+        self.tol = tol # 局部坐标的容差, 单元边界上的点也算在单元内
+        self.chunksize = chunksize # 每次同时处理的点数
+        self.maxit = maxit # 四边形和六面体上 Newton 迭代的最大步数
+        self.clear()
+
+    def clear(self):
+        self.state = None
+        self.data = None
+
+    def is_valid(self):
+        mesh = self.mesh
+        if mesh.meshtype == 'polyhedron':
+            state = cache_state(mesh.node, mesh.ds.face, mesh.ds.face2cell)
+        else:
+            state = cache_state(mesh.entity('node'), mesh.entity('cell'))
+        if same_cache_state(self.state, state):
+            return True
+        self.state = state
+        self.data = None
+        return False
+
+    def cell_type(self):
+        mesh = self.mesh
+        if mesh.meshtype == 'polyhedron':
+            return 'polyhedron'
+        GD = mesh.geo_dimension()
+        NV = mesh.entity('cell').shape[1]
+        if NV == GD + 1:
+            return 'simplex'
+        elif (NV == 2**GD) and (mesh.meshtype in {'quad', 'hex'}):
+            return 'multilinear'
+        else:
+            raise ValueError("PointLocator does not support {} meshes with {} "
+                    "vertices per cell in {}d".format(mesh.meshtype, NV, GD))
+
+    def cell_bounding_box(self):
+        """
+
+        Notes
+        -----
+        每个单元的包围盒 (pmin, pmax), 形状都是 (NC, GD) 。
+        """
+        mesh = self.mesh
+        if mesh.meshtype != 'polyhedron':
+            p = mesh.entity('node')[mesh.entity('cell')]
+            return np.min(p, axis=1), np.max(p, axis=1)
+
+        # 多面体单元的包围盒由它所有面上的节点给出
+        node = mesh.node
+        face = mesh.ds.face
+        face2cell = mesh.ds.face2cell
+        NV = mesh.ds.number_of_vertices_of_faces()
+        fidx = np.repeat(np.arange(len(NV)), NV)
+        cidx = np.r_[face2cell[fidx, 0], face2cell[fidx, 1]]
+        nidx = np.r_[face, face]
+        order = np.argsort(cidx, kind='stable')
+        ptr = np.r_[0, np.cumsum(np.bincount(cidx, minlength=mesh.ds.NC))[:-1]]
+        p = node[nidx[order]]
+        return np.minimum.reduceat(p, ptr, axis=0), np.maximum.reduceat(p, ptr, axis=0)
+
+    def index(self):
+        """
+
+        Notes
+        -----
+        生成 (或者直接返回已有的) 桶索引, 包括:
+
+        * origin, h, shape: 桶网格的起点, 桶的边长和各个方向的桶数
+        * bucket2cell, location: CSR 形式存储的每个桶中的候选单元
+        * pmin, pmax: 单元的包围盒, 用于快速排除候选单元
+        * A: 单纯形单元上仿射变换的逆, 用于计算重心坐标
+        * C: 四边形和六面体单元上多线性变换的单项式系数, 用于计算参考坐标
+        * tri, cell2tri: 多面体单元边界的三角形剖分 (CSR 形式), 用于计算环绕数
+        """
+        if self.is_valid() and (self.data is not None):
+            return self.data
+
+        mesh = self.mesh
+        celltype = self.cell_type()
+        pmin, pmax = self.cell_bounding_box()
+        NC, GD = pmin.shape
+
+        # 桶的边长取为单元包围盒平均大小的一半, 这时每个桶中平均只有几个候选单
+        # 元, 但桶的个数不超过单元个数的 4 倍
+        origin = np.min(pmin, axis=0)
+        L = np.max(pmax, axis=0) - origin
+        L[L == 0.0] = 1.0
+        h = max(0.5*np.mean(np.max(pmax - pmin, axis=1)), (np.prod(L)/NC/4)**(1/GD))
+        shape = np.maximum(np.ceil(L/h).astype(np.int_), 1)
+
+        lo = np.clip(np.floor((pmin - origin)/h).astype(np.int_), 0, shape-1)
+        hi = np.clip(np.floor((pmax - origin)/h).astype(np.int_), 0, shape-1)
+
+        # 每个单元和它覆盖的所有桶
+        ext = hi - lo + 1
+        num = np.prod(ext, axis=1)
+        cellidx = np.repeat(np.arange(NC), num)
+        k = ranges(num)
+        bidx = np.zeros(len(k), dtype=np.int_)
+        for d in range(GD):
+            stride = np.prod(ext[:, d+1:], axis=1)[cellidx]
+            i = lo[cellidx, d] + (k//stride)%ext[cellidx, d]
+            bidx = bidx*shape[d] + i
+
+        NB = np.prod(shape)
+        order = np.argsort(bidx, kind='stable')
+        location = np.zeros(NB+1, dtype=np.int_)
+        np.cumsum(np.bincount(bidx, minlength=NB), out=location[1:])
+
+        self.data = {
+                'celltype': celltype,
+                'origin': origin, 'h': h, 'shape': shape, 'top': origin + L,
+                'bucket2cell': cellidx[order], 'location': location,
+                'pmin': pmin, 'pmax': pmax}
+
+        if celltype == 'simplex':
+            # 仿射变换 x = x0 + B lambda[1:] 的逆,
+            # lambda[i+1] = A[i, :GD, c]@x + A[i, GD, c]
+            node = mesh.entity('node')
+            p = node[mesh.entity('cell')]
+            x0 = p[:, 0]
+            B = (p[:, 1:] - x0[:, None, :]).swapaxes(-1, -2)
+            A = np.zeros((GD, GD+1, NC), dtype=node.dtype)
+            invB = np.linalg.inv(B)
+            A[:, :GD] = invB.transpose(1, 2, 0)
+            A[:, GD] = -np.einsum('cij, cj->ic', invB, x0)
+            self.data['A'] = A
+        elif celltype == 'multilinear':
+            # 参考单元的顶点, 节点编号顺序和 boxmesh2d/3d 一致
+            ref = np.array([(0, 0), (1, 0), (1, 1), (0, 1)])
+            if GD == 3:
+                ref = np.r_[np.c_[ref, np.zeros(4, dtype=np.int_)],
+                        np.c_[ref, np.ones(4, dtype=np.int_)]]
+
+            # 把多线性变换写成单项式 m_s(xi) = prod_{s 的第 d 位为 1} xi_d 的
+            # 组合 x(xi) = sum_s C[s, :, c]*m_s(xi)
+            NS = 2**GD
+            bit = (np.arange(NS)[:, None] >> np.arange(GD)) & 1
+            V = np.prod(np.where(bit[None, :, :] == 1, ref[:, None, :], 1), axis=-1)
+            node = mesh.entity('node')
+            X = node[mesh.entity('cell')]
+            self.data['C'] = np.einsum('sv, nvd->sdn', np.linalg.inv(V), X)
+        elif celltype == 'polyhedron':
+            # 每个面剖分成以第 0 个顶点为中心的扇形三角形, 面的法向指向
+            # face2cell[:, 0] 的外部, 作为 face2cell[:, 1] 的面时反向
+            face = mesh.ds.face
+            faceLocation = mesh.ds.faceLocation
+            face2cell = mesh.ds.face2cell
+            NV = mesh.ds.number_of_vertices_of_faces()
+            fidx = np.repeat(np.arange(len(NV)), NV - 2)
+            i = faceLocation[fidx] + ranges(NV - 2) + 1
+            tri = np.c_[face[faceLocation[fidx]], face[i], face[i+1]]
+            isIntFace = face2cell[fidx, 0] != face2cell[fidx, 1]
+            tcell = np.r_[face2cell[fidx, 0], face2cell[fidx[isIntFace], 1]]
+            tri = np.r_[tri, tri[isIntFace][:, ::-1]]
+            order = np.argsort(tcell, kind='stable')
+            cell2tri = np.zeros(NC+1, dtype=np.int_)
+            np.cumsum(np.bincount(tcell, minlength=NC), out=cell2tri[1:])
+            self.data['tri'] = tri[order]
+            self.data['cell2tri'] = cell2tri
+        return self.data
+
+    def barycentric(self, points, index):
+        """
+
+        Notes
+        -----
+        点 points (n, GD) 在单纯形单元 index (n, ) 中的重心坐标 (n, GD+1)。
+
+        返回的是 (GD+1, n) 数组的转置, 每个重心坐标分量在内存中是连续的。
+        """
+        data = self.index()
+        GD = points.shape[1]
+        A = np.take(data['A'], index, axis=-1) # (GD, GD+1, n)
+        bc = np.empty((GD+1, len(index)), dtype=points.dtype)
+        bc[1:] = A[:, GD]
+        for j in range(GD):
+            bc[1:] += A[:, j]*points[:, j]
+        bc[0] = 1.0
+        for j in range(GD):
+            bc[0] -= bc[j+1]
+        return bc.T
+
+    def reference_coordinates(self, points, index):
+        """
+
+        Notes
+        -----
+        点 points (n, GD) 在四边形或六面体单元 index (n, ) 的参考单元 [0, 1]^GD
+        上的坐标 (n, GD), 也就是多线性变换 x(xi) = points 的解。
+
+        从参考单元的中心出发做 Newton 迭代, 单元中的点通常几步就收敛了。不收敛
+        (点离单元很远, 多线性变换在那里可能退化) 的点返回 nan 。
+        """
+        data = self.index()
+        GD = points.shape[1]
+        NS = 2**GD
+        bit = (np.arange(NS)[:, None] >> np.arange(GD)) & 1 # (NS, GD)
+        C = np.take(data['C'], index, axis=-1) # (NS, GD, n)
+        h = np.max(data['pmax'][index] - data['pmin'][index], axis=-1)
+        xi = np.full((len(index), GD), np.nan, dtype=points.dtype)
+
+        # 只在还没有收敛的 (点, 单元) 对上迭代, 迭代值明显跑到参考单元之外的
+        # 点不在这个单元中, 直接放弃
+        act = np.arange(len(index))
+        x = np.full((GD, len(index)), 0.5, dtype=points.dtype)
+        p = points.T
+        for it in range(self.maxit):
+            m = np.ones((NS, len(act)), dtype=points.dtype)
+            for s in range(1, NS):
+                d = (s & -s).bit_length() - 1
+                m[s] = m[s ^ (1 << d)]*x[d]
+            r = np.einsum('sdn, sn->dn', C, m) - p[:, act]
+            J = np.zeros((GD, GD, len(act)), dtype=points.dtype)
+            for e in range(GD):
+                for s in np.nonzero(bit[:, e])[0]:
+                    J[:, e] += C[s]*m[s ^ (1 << e)]
+
+            # Cramer 法则求 Newton 方向
+            if GD == 2:
+                det = J[0, 0]*J[1, 1] - J[0, 1]*J[1, 0]
+                dx = np.array([J[1, 1]*r[0] - J[0, 1]*r[1],
+                    J[0, 0]*r[1] - J[1, 0]*r[0]])
+            else:
+                a = np.cross(J[1], J[2], axis=0)
+                det = np.sum(J[0]*a, axis=0)
+                dx = a*r[0] + np.cross(J[2], J[0], axis=0)*r[1] + \
+                        np.cross(J[0], J[1], axis=0)*r[2]
+            flag = np.abs(det) > 1e-14*h[act]**GD
+            dx[:, flag] /= det[flag]
+            x -= dx
+
+            # Newton 迭代二次收敛, 步长小于 1e-8 时更新后的误差已在舍入误差量
+            # 级, 不必再算一次残量
+            isConverged = flag & (np.max(np.abs(dx), axis=0) <= 1e-8)
+            xi[act[isConverged]] = x[:, isConverged].T
+            flag &= ~isConverged
+            flag &= np.min(np.minimum(x, 1 - x), axis=0) > -0.5
+            act, x, C = act[flag], x[:, flag], C[..., flag]
+            if len(act) == 0:
+                break
+        return xi
+
+    def winding_number(self, points, index):
+        """
+
+        Notes
+        -----
+        多面体单元 index (n, ) 的边界关于点 points (n, 3) 的环绕数, 点在单元内
+        部时绝对值为 1, 在单元外部时为 0, 在单元边界上时介于两者之间。
+
+        每个三角形所张的立体角用 Van Oosterom-Strackee 公式计算。
+        """
+        data = self.index()
+        node = self.mesh.node
+        tri, cell2tri = data['tri'], data['cell2tri']
+        num = cell2tri[index+1] - cell2tri[index]
+        T = tri[np.repeat(cell2tri[index], num) + ranges(num)]
+        p = np.repeat(points, num, axis=0)
+        a = node[T[:, 0]] - p
+        b = node[T[:, 1]] - p
+        c = node[T[:, 2]] - p
+        la = np.sqrt(np.sum(a**2, axis=-1))
+        lb = np.sqrt(np.sum(b**2, axis=-1))
+        lc = np.sqrt(np.sum(c**2, axis=-1))
+        n = np.sum(a*np.cross(b, c), axis=-1)
+        d = la*lb*lc + np.sum(a*b, axis=-1)*lc + np.sum(a*c, axis=-1)*lb \
+                + np.sum(b*c, axis=-1)*la
+        omega = 2*np.arctan2(n, d)
+        ptr = np.zeros(len(num), dtype=np.int_)
+        np.cumsum(num[:-1], out=ptr[1:])
+        return np.add.reduceat(omega, ptr)/(4*np.pi)
+
+    def local_coordinates(self, points, index):
+        """
+
+        Notes
+        -----
+        点 points (n, GD) 在单元 index (n, ) 中的局部坐标 lc 和得分 m (n, ),
+        m >= -tol 表示点在单元中 (包括边界), 点落在多个单元的公共边界上时取得
+        分最大的单元。
+
+        * 单纯形: 重心坐标, m 是重心坐标的最小分量
+        * 四边形和六面体: 参考坐标, m 是到参考单元边界的最小 (带符号) 距离
+        * 多面体: 笛卡尔坐标, m 是环绕数的绝对值, 不在单元闭包中时为 -1
+        """
+        celltype = self.index()['celltype']
+        if celltype == 'simplex':
+            lc = self.barycentric(points, index)
+            m = lc[:, 0].copy()
+            for j in range(1, lc.shape[1]):
+                np.minimum(m, lc[:, j], out=m)
+        elif celltype == 'multilinear':
+            lc = self.reference_coordinates(points, index)
+            m = np.min(np.minimum(lc, 1 - lc), axis=-1)
+            m[np.isnan(m)] = -np.inf
+        else:
+            lc = points
+            w = np.abs(self.winding_number(points, index))
+            m = np.where(w > 1e-8, w, -1.0)
+        return lc, m
+
+    def bucket_index(self, points):
+        """
+
+        Notes
+        -----
+        点所在的桶的编号, 在桶网格外的点为 -1 。
+        """
+        data = self.index()
+        origin, h, shape = data['origin'], data['h'], data['shape']
+        eps = self.tol*h
+        isIn = np.all((points >= origin - eps) & (points <= data['top'] + eps),
+                axis=-1)
+        i = np.clip(np.floor((points - origin)/h).astype(np.int_), 0, shape-1)
+        bidx = np.ravel_multi_index(tuple(i.T), shape)
+        bidx[~isIn] = -1
+        return bidx
+
+    def find_cell(self, points, return_bc=False):
+        """
+
+        Parameters
+        ----------
+        points: (NP, GD) 的点
+        return_bc: 是否同时返回局部坐标
+
+        Returns
+        -------
+        cellidx: (NP, ), 点所在的单元编号, 网格外的点为 -1
+        bc: (NP, GD+1), 点在所在单元中的重心坐标 (单纯形网格), 四边形和六面体
+            网格为 (NP, GD) 的参考坐标, 多面体网格为 (NP, GD) 的笛卡尔坐标, 网
+            格外的点为 nan
+
+        Notes
+        -----
+        点在多个单元的公共边界上时, 取得分 (见 `local_coordinates`) 最大的那个
+        单元。
+        """
+        data = self.index()
+        bucket2cell, location = data['bucket2cell'], data['location']
+        pmin, pmax = data['pmin'], data['pmax']
+        eps = self.tol*data['h']
+        celltype = data['celltype']
+
+        mesh = self.mesh
+        points = np.asarray(points, dtype=mesh.node.dtype)
+        shape = points.shape[:-1]
+        points = points.reshape(-1, points.shape[-1])
+        NP, GD = points.shape
+
+        # 多面体的每个候选单元要处理所有边界三角形, 相应地减少每次处理的点数
+        chunksize = self.chunksize
+        if celltype == 'polyhedron':
+            chunksize = max(chunksize//16, 1)
+
+        ldim = GD + 1 if celltype == 'simplex' else GD
+        cellidx = -np.ones(NP, dtype=np.int_)
+        bc = np.full((NP, ldim), np.nan, dtype=points.dtype)
+        for start in range(0, NP, chunksize):
+            pp = points[start:start+chunksize]
+            bidx = self.bucket_index(pp)
+            pidx, = np.nonzero(bidx >= 0)
+            num = location[bidx[pidx]+1] - location[bidx[pidx]]
+            flag = num > 0
+            pidx, num = pidx[flag], num[flag]
+            if len(pidx) == 0:
+                continue
+
+            # 所有的 (点, 候选单元) 对
+            J = np.repeat(location[bidx[pidx]], num) + ranges(num)
+            I = np.repeat(pidx, num)
+            J = bucket2cell[J]
+
+            # 非单纯形单元上局部坐标的计算代价较高, 先用单元的包围盒排除大部
+            # 分候选单元
+            if celltype != 'simplex':
+                flag = np.all((pp[I] >= pmin[J] - eps) & (pp[I] <= pmax[J] + eps),
+                        axis=-1)
+                I, J = I[flag], J[flag]
+                if len(I) == 0:
+                    continue
+            val, m = self.local_coordinates(pp[I], J)
+
+            # 候选单元按点排在一起, 每个点取得分最大的单元
+            ptr, = np.nonzero(np.r_[True, I[1:] != I[:-1]])
+            num = np.diff(np.r_[ptr, len(I)])
+            mm = np.repeat(np.maximum.reduceat(m, ptr), num)
+            isBest = (m == mm) & (mm >= -self.tol)
+            k, = np.nonzero(isBest)
+            k = k[np.r_[True, I[k[1:]] != I[k[:-1]]]] if len(k) > 0 else k
+            cellidx[start + I[k]] = J[k]
+            bc[start + I[k]] = val[k]
+
+        cellidx = cellidx.reshape(shape)
+        if return_bc:
+            return cellidx, bc.reshape(shape + (ldim, ))
+        return cellidx
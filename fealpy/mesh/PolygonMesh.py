@@ -2,6 +2,7 @@ import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from ..common import ranges
 from .mesh_tools import unique_row, find_entity, show_mesh_2d
+from .core import unique_entity
 from ..quadrature import TriangleQuadrature
 from .Mesh2d import Mesh2d
 
@@ -321,17 +322,11 @@ class PolygonMeshDataStructure():
         NV = self.number_of_vertices_of_cells()
 
         totalEdge = self.total_edge()
-        _, i0, j = np.unique(np.sort(totalEdge, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, i1, _ = unique_entity(totalEdge)
         NE = i0.shape[0]
         self.NE = NE
         self.edge2cell = np.zeros((NE, 4), dtype=np.int)
 
-        i1 = np.zeros(NE, dtype=np.int)
-        i1[j] = np.arange(len(cell))
-
         self.edge = totalEdge[i0]
 
         cellIdx = np.repeat(range(NC), NV)
@@ -2,6 +2,8 @@ import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from scipy.sparse import triu, tril, find, hstack
 from .mesh_tools import unique_row
+from .PointLocator import PointLocator
+from .core import unique_entity
 
 
 class PolyhedronMesh():
@@ -10,6 +12,7 @@ class PolyhedronMesh():
         self.ds = PolyhedronMeshDataStructure(node.shape[0], face, faceLocation, face2cell, NC=NC)
         self.meshtype = 'polyhedron'
         self.dtype= dtype 
+        self.locator = PointLocator(self)
 
     def to_vtk(self):
         NF = self.number_of_faces()
@@ -84,6 +87,18 @@ class PolyhedronMesh():
         x = np.arccos(np.sum(a*b, axis=1)/np.sqrt(la*lb))
         return np.degrees(x)
 
+    def location(self, points, return_bc=False):
+        """
+        Notes
+        -----
+        给定一组点 p ， 找到这些点所在的单元, 网格外的点对应的单元编号为 -1 。
+
+        多面体没有参考单元, return_bc 为真时返回的局部坐标就是点的笛卡尔坐标
+        (网格外的点为 nan), 点是否在单元中用单元边界的环绕数判断, 单元可以是
+        非凸的。
+        """
+        return self.locator.find_cell(points, return_bc=return_bc)
+
     def volume(self):
         pass
 
@@ -150,7 +165,7 @@ class PolyhedronMeshDataStructure():
     def construct(self):
 
         totalEdge = self.total_edge()
-        _, i0, j = unique_row(np.sort(totalEdge, axis=1))
+        i0, _, j = unique_entity(totalEdge)
 
         self.NE = len(i0) 
 
@@ -1,7 +1,7 @@
 import numpy as np
 from .Mesh2d import Mesh2d, Mesh2dDataStructure
 from ..quadrature import QuadrangleQuadrature
-from ..common import hash2map
+from ..common import hash2map, index_type
 
 
 class QuadrangleMeshDataStructure(Mesh2dDataStructure):
@@ -81,14 +81,15 @@ class QuadrangleMesh(Mesh2d):
             edgeCenter = self.entity_barycenter('edge')
             cellCenter = self.entity_barycenter('cell')
 
-            edge2center = np.arange(N, N+NE)
+            self.itype = index_type(max(N+NE+NC, 4*NC), self.itype)
+            edge2center = np.arange(N, N+NE, dtype=self.itype)
 
             cell = self.ds.cell
             cp = [cell[:, i].reshape(-1, 1) for i in range(4)]
             ep = [edge2center[cell2edge[:, i]].reshape(-1, 1) for i in range(4)]
-            cc = np.arange(N + NE, N + NE + NC).reshape(-1, 1)
+            cc = np.arange(N + NE, N + NE + NC, dtype=self.itype).reshape(-1, 1)
  
-            cell = np.zeros((4*NC, 4), dtype=np.int)
+            cell = np.zeros((4*NC, 4), dtype=self.itype)
             cell[0::4, :] = np.r_['1', cp[0], ep[0], cc, ep[3]] 
             cell[1::4, :] = np.r_['1', ep[0], cp[1], ep[1], cc]
             cell[2::4, :] = np.r_['1', cc, ep[1], cp[2], ep[2]]
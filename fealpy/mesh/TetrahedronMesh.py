@@ -3,8 +3,12 @@ from scipy.sparse import coo_matrix, csc_matrix, csr_matrix
 from scipy.sparse import spdiags, eye, tril, triu, bmat
 from .mesh_tools import unique_row
 from .Mesh3d import Mesh3d, Mesh3dDataStructure
+from .core import EdgeMidpointTable, edge_key
+from .GeometryCache import GeometryCache
+from .PointLocator import PointLocator
 from ..quadrature import TetrahedronQuadrature, TriangleQuadrature, GaussLegendreQuadrature
 from ..decorator import timer
+from ..common import index_type, DynamicArray
 
 class TetrahedronMeshDataStructure(Mesh3dDataStructure):
     localFace = np.array([(1, 2, 3),  (0, 3, 2), (0, 1, 3), (0, 2, 1)])
@@ -54,6 +58,9 @@ class TetrahedronMesh(Mesh3d):
         self.nodedata = {}
         self.meshdata = {}
 
+        self.geocache = GeometryCache(self)
+        self.locator = PointLocator(self)
+
         nsize = self.node.size*self.node.itemsize/2**30
         csize = self.ds.cell.size*self.ds.cell.itemsize/2**30
         fsize = self.ds.face.size*self.ds.face.itemsize/2**30
@@ -150,14 +157,42 @@ class TetrahedronMesh(Mesh3d):
         return nv/length.reshape(-1, 1)
 
     def cell_volume(self, index=np.s_[:]):
+        volume = self.geocache.get('cell_volume', self._cell_volume)
+        return volume[index]
+
+    def _cell_volume(self):
         cell = self.ds.cell
         node = self.node
-        v01 = node[cell[index, 1]] - node[cell[index, 0]]
-        v02 = node[cell[index, 2]] - node[cell[index, 0]]
-        v03 = node[cell[index, 3]] - node[cell[index, 0]]
+        v01 = node[cell[:, 1]] - node[cell[:, 0]]
+        v02 = node[cell[:, 2]] - node[cell[:, 0]]
+        v03 = node[cell[:, 3]] - node[cell[:, 0]]
         volume = np.sum(v03*np.cross(v01, v02), axis=1)/6.0
         return volume
 
+    def jacobi_matrix(self, index=np.s_[:]):
+        """
+        Return
+        ------
+        J : numpy.ndarray
+            `J` is the transpose o  jacobi matrix of each cell.
+            The shape of `J` is  `(NC, 3, 3)`
+        """
+        J = self.geocache.get('jacobi_matrix', self._jacobi_matrix)
+        return J[index]
+
+    def _jacobi_matrix(self):
+        node = self.node
+        cell = self.ds.cell
+        J = node[cell[:, [1, 2, 3]]] - node[cell[:, [0]]]
+        return J
+
+    def entity_barycenter(self, etype='cell', index=np.s_[:]):
+        if etype in {'cell', 3}:
+            bc = self.geocache.get('cell_barycenter',
+                    super().entity_barycenter, 'cell')
+            return bc[index]
+        return super().entity_barycenter(etype=etype, index=index)
+
     def face_area(self, index=np.s_[:]):
         face = self.ds.face
         node = self.node
@@ -189,13 +224,39 @@ class TetrahedronMesh(Mesh3d):
 
 
     def bc_to_point(self, bc, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        在所有单元上计算积分点时, 结果缓存在 geocache 中
+        """
+        TD = bc.shape[-1] - 1 #
+        if TD == 3 and bc.ndim <= 2 and \
+                isinstance(index, slice) and index == slice(None):
+            key = ('bc_to_point', bc.shape, bc.tobytes())
+            return self.geocache.get(key, self._bc_to_point, bc)
+        return self._bc_to_point(bc, index=index)
 
+    def _bc_to_point(self, bc, index=np.s_[:]):
         TD = bc.shape[-1] - 1 #
         node = self.node
         entity = self.entity(etype=TD)
         p = np.einsum('...j, ijk->...ik', bc, node[entity[index]])
         return p
 
+    def location(self, points, return_bc=False):
+        """
+        Notes
+        -----
+        给定一组点 p ， 找到这些点所在的单元, 网格外的点对应的单元编号为 -1 。
+
+        return_bc 为真时同时返回点在所在单元中的重心坐标。
+
+        点定位的桶索引 (见 PointLocator) 在第一次调用时生成, 网格不变时一直重
+        用。区域可以是非凸的, 也可以有洞。
+        """
+        return self.locator.find_cell(points, return_bc=return_bc)
+
     def circumcenter(self):
         node = self.node
         cell = self.ds.cell
@@ -273,6 +334,9 @@ class TetrahedronMesh(Mesh3d):
         return grad/wgt.reshape(-1, 1)
 
     def grad_lambda(self):
+        return self.geocache.get('grad_lambda', self._grad_lambda)
+
+    def _grad_lambda(self):
         localFace = self.ds.localFace
         node = self.node
         cell = self.ds.cell
@@ -321,23 +385,23 @@ class TetrahedronMesh(Mesh3d):
         lidx = np.argmax(cellEdgeLength, axis=-1)
 
         flag = (lidx == 1)
-        if  sum(flag) > 0:
+        if np.any(flag):
             cell[cellidx[flag], :] = cell[cellidx[flag]][:, [2, 0, 1, 3]]
 
         flag = (lidx == 2)
-        if sum(flag) > 0:
+        if np.any(flag):
             cell[cellidx[flag], :] = cell[cellidx[flag]][:, [0, 3, 1, 2]]
 
         flag = (lidx == 3)
-        if sum(flag) > 0:
+        if np.any(flag):
             cell[cellidx[flag], :] = cell[cellidx[flag]][:, [1, 2, 0, 3]]
 
         flag = (lidx == 4)
-        if sum(flag) > 0:
+        if np.any(flag):
             cell[cellidx[flag], :] = cell[cellidx[flag]][:, [1, 3, 2, 0]]
 
         flag = (lidx == 5)
-        if sum(flag) > 0:
+        if np.any(flag):
             cell[cellidx[flag], :] = cell[cellidx[flag]][:, [3, 2, 1, 0]]
 
         if rflag == True:
@@ -349,6 +413,17 @@ class TetrahedronMesh(Mesh3d):
             self.bisect()
 
     def bisect(self, isMarkedCell=None, data=None, returnim=False):
+        """
+
+        Notes
+        -----
+        最长边二分加密标记的单元, 再继续二分非协调的单元直到网格协调。
+
+        被二分的边和它们的中点存在 EdgeMidpointTable 中, 单元的加密边是否已经
+        有中点, 以及哪些单元中还有被二分过的边 (非协调单元), 都用排好序的边的
+        键成批查找。节点和单元存在 DynamicArray 中, 按需要成倍增长, 不再按
+        9*NN, 8*NN 预先分配内存。
+        """
 
         NN = self.number_of_nodes()
         NC = self.number_of_cells()
@@ -358,25 +433,21 @@ class TetrahedronMesh(Mesh3d):
         else:
             markedCell, = np.nonzero(isMarkedCell)
 
-        # allocate new memory for node and cell
-        node = np.zeros((9*NN, 3), dtype=self.ftype)
-        cell = np.zeros((4*NC, 4), dtype=self.itype)
-
-        node[:NN] = self.entity('node')
-        cell[:NC] = self.entity('cell')
-        # 用于存储网格节点的代数，初始所有节点都为第 0 代
-        generation = np.zeros(NN + 6*NC, dtype=np.uint8)
-
-        # 用于记录被二分的边及其中点编号
-        cutEdge = np.zeros((8*NN, 3), dtype=self.itype)
-
-        # 当前的二分边的数目
-        nCut = 0
+        self.itype = index_type(max(9*NN, 4*NC), self.itype)
+        nodes = DynamicArray(self.entity('node'), dtype=self.ftype,
+                capacity=NN + 2*len(markedCell))
+        cells = DynamicArray(self.entity('cell'), dtype=self.itype,
+                capacity=NC + 2*len(markedCell))
+        localEdge = self.ds.localEdge
 
-        # 非协调边的标记数组 
-        nonConforming = np.ones(8*NN, dtype=np.bool)
+        # 被二分的边到中点的查找表, 以及还可能非协调的边的端点
+        table = EdgeMidpointTable(dtype=self.itype)
+        checkNode = np.zeros(0, dtype=self.itype)
         IM = eye(NN)
         while len(markedCell) != 0:
+            node = nodes.data[:NN]
+            cell = cells.data[:NC]
+
             # 标记最长边
             self.label(node, cell, markedCell)
 
@@ -386,78 +457,38 @@ class TetrahedronMesh(Mesh3d):
             p2 = cell[markedCell, 2]
             p3 = cell[markedCell, 3]
 
-            # 找到新的二分边和新的中点 
+            # 已经有中点的加密边
             nMarked = len(markedCell)
-            p4 = np.zeros(nMarked, dtype=self.itype)
-
-            if nCut == 0: # 如果是第一次循环 
-                idx = np.arange(nMarked) # cells introduce new cut edges
-            else:
-                # all non-conforming edges
-                ncEdge = np.nonzero(nonConforming[:nCut])
-                NE = len(ncEdge)
-                I = cutEdge[ncEdge][:, [2, 2]].reshape(-1)
-                J = cutEdge[ncEdge][:, [0, 1]].reshape(-1)
-                val = np.ones(len(I), dtype=np.bool)
-                nv2v = csr_matrix(
-                        (val, (I, J)),
-                        shape=(NN, NN))
-                i, j =  np.nonzero(nv2v[:, p0].multiply(nv2v[:, p1]))
-                p4[j] = i
-                idx, = np.nonzero(p4 == 0)
+            cellCutEdge = np.stack((p0, p1), axis=1)
+            p4 = table.find(cellCutEdge)
+            idx, = np.nonzero(p4 < 0)
 
             if len(idx) != 0:
-                # 把需要二分的边唯一化 
-                NE = len(idx)
-                cellCutEdge = np.array([p0[idx], p1[idx]])
-                cellCutEdge.sort(axis=0)
-                s = csr_matrix(
-                    (
-                        np.ones(NE, dtype=np.bool),
-                        (
-                            cellCutEdge[0, ...],
-                            cellCutEdge[1, ...]
-                        )
-                    ), shape=(NN, NN), dtype=np.bool)
-                # 获得唯一的边 
-                i, j = s.nonzero()
-                nNew = len(i)
-                newCutEdge = np.arange(nCut, nCut+nNew)
-                cutEdge[newCutEdge, 0] = i
-                cutEdge[newCutEdge, 1] = j
-                cutEdge[newCutEdge, 2] = range(NN, NN+nNew)
-                node[NN:NN+nNew, :] = (node[i, :] + node[j, :])/2.0
+                # 把需要二分的边唯一化
+                _, i0, j = np.unique(edge_key(cellCutEdge[idx]),
+                        return_index=True, return_inverse=True)
+                newCutEdge = cellCutEdge[idx[i0]]
+                nNew = len(newCutEdge)
+                i = newCutEdge[:, 0]
+                j = j.astype(self.itype)
+                nodes.increase_size(nNew)[:] = (node[i] + node[newCutEdge[:, 1]])/2.0
+                p4[idx] = NN + j
+                table.insert(newCutEdge, np.arange(NN, NN+nNew))
+                checkNode = np.r_[checkNode, newCutEdge.flat]
                 if returnim is True:
                     val = np.full(nNew, 0.5)
                     I = coo_matrix(
                             (val, (range(nNew), i)), shape=(nNew, NN),
                             dtype=self.ftype)
                     I += coo_matrix(
-                            (val, (range(nNew), j)), shape=(nNew, NN),
-                            dtype=self.ftype)
+                            (val, (range(nNew), newCutEdge[:, 1])),
+                            shape=(nNew, NN), dtype=self.ftype)
                     I = bmat([[eye(NN)], [I]], format='csr')
                     IM = I@IM
-
-                nCut += nNew
                 NN += nNew
 
-                # 新点和旧点的邻接矩阵 
-                I = cutEdge[newCutEdge][:, [2, 2]].reshape(-1)
-                J = cutEdge[newCutEdge][:, [0, 1]].reshape(-1)
-                val = np.ones(len(I), dtype=np.bool)
-                nv2v = csr_matrix(
-                        (val, (I, J)),
-                        shape=(NN, NN))
-                i, j =  np.nonzero(nv2v[:, p0].multiply(nv2v[:, p1]))
-                p4[j] = i
-
-            # 如果新点的代数仍然为 0
-            idx = (generation[p4] == 0)
-            cellGeneration = np.max(
-                    generation[cell[markedCell[idx]]],
-                    axis=-1)
-            # 第几代点 
-            generation[p4[idx]] = cellGeneration + 1
+            cells.increase_size(nMarked)
+            cell = cells.data[:NC+nMarked]
             cell[markedCell, 0] = p3
             cell[markedCell, 1] = p0
             cell[markedCell, 2] = p2
@@ -467,34 +498,28 @@ class TetrahedronMesh(Mesh3d):
             cell[NC:NC+nMarked, 2] = p3
             cell[NC:NC+nMarked, 3] = p4
             NC = NC + nMarked
-            del cellGeneration, p0, p1, p2, p3, p4
+            del p0, p1, p2, p3, p4
 
-            # 找到非协调的单元 
-            checkEdge, = np.nonzero(nonConforming[:nCut])
+            # 找到非协调的单元: 只有含非协调边端点的单元才可能有被二分过的边
             isCheckNode = np.zeros(NN, dtype=np.bool)
-            isCheckNode[cutEdge[checkEdge]] = True
-            isCheckCell = np.sum(
-                    isCheckNode[cell[:NC]],
-                    axis= -1) > 0
-            # 找到所有包含检查节点的单元编号 
-            checkCell, = np.nonzero(isCheckCell)
-            I = np.repeat(checkCell, 4)
-            J = cell[checkCell].reshape(-1)
-            val = np.ones(len(I), dtype=np.bool)
-            cell2node = csr_matrix((val, (I, J)), shape=(NC, NN))
-            i, j = np.nonzero(
-                    cell2node[:, cutEdge[checkEdge, 0]].multiply(
-                        cell2node[:, cutEdge[checkEdge, 1]]
-                        ))
-            markedCell = np.unique(i)
-            nonConforming[checkEdge] = False
-            nonConforming[checkEdge[j]] = True;
-
-
-        self.node = node[:NN]
-        cell = cell[:NC]
+            isCheckNode[checkNode] = True
+            checkCell, = np.nonzero(np.any(isCheckNode[cell], axis=-1))
+            checkEdge = cell[checkCell][:, localEdge]
+            isNonConforming = table.find(checkEdge.reshape(-1, 2)) >= 0
+            isNonConforming = isNonConforming.reshape(-1, 6)
+            markedCell = checkCell[np.any(isNonConforming, axis=-1)]
+            checkNode = checkEdge[isNonConforming].reshape(-1)
+
+        # 复制出来, 不保留 DynamicArray 中多余的容量
+        self.node = nodes.data[:NN].copy()
+        cell = cells.data[:NC].copy()
         self.ds.reinit(NN, cell)
 
+        if self.autoreorder is not None:
+            nodeperm, _ = self.reorder(self.autoreorder)
+            if returnim is True:
+                IM = IM.tocsr()[nodeperm]
+
         if returnim is True:
             return IM
 
@@ -510,7 +535,8 @@ class TetrahedronMesh(Mesh3d):
             cell = self.ds.cell
             cell2edge = self.ds.cell_to_edge()
 
-            edge2newNode = np.arange(N, N+NE)
+            self.itype = index_type(max(N+NE, 8*NC), self.itype)
+            edge2newNode = np.arange(N, N+NE, dtype=self.itype)
             newNode = (node[edge[:,0],:]+node[edge[:,1],:])/2.0
 
             self.node = np.concatenate((node, newNode), axis=0)
@@ -561,6 +587,9 @@ class TetrahedronMesh(Mesh3d):
             N = self.number_of_nodes()
             self.ds.reinit(N, newCell)
 
+        if self.autoreorder is not None:
+            self.reorder(self.autoreorder)
+
     def is_valid(self):
         vol = self.volume()
         return np.all(vol > 1e-15)
@@ -0,0 +1,107 @@
+import inspect
+from functools import wraps
+
+import numpy as np
+from scipy.sparse import spmatrix
+
+
+class TopologyCache():
+    """
+
+    Notes
+    -----
+    网格拓扑数据结构中导出的邻接关系的缓存, 如 `cell_to_cell`, `cell_to_edge`,
+    `node_to_node`, `node_to_cell` 和 `boundary_*_flag` 等。
+
+    这些关系都由 `cell`, `edge`, `edge2cell` (三维为 `face`, `face2cell`) 生成,
+    每次取数据时检查它们是否被替换过 (`reinit`, `construct` 都会生成新的数组),
+    如果被替换了就清空缓存。`reinit`, `construct` 和 `clear` 也会直接清空缓存。
+
+    稠密和稀疏的形式按调用参数分别缓存。缓存的数组 (包括稀疏矩阵的 data,
+    indices 和 indptr) 都是只读的。
+
+    如果原地修改了 `cell` 中的编号, 需要手动调用 `clear()` 。
+    """
+    def __init__(self, ds):
+        self.ds = ds
+        self.nhit = 0
+        self.nmiss = 0
+        self.clear()
+
+    def clear(self):
+        self.data = {}
+        self.state = None
+
+    def is_valid(self):
+        ds = self.ds
+        state = (ds.cell, getattr(ds, 'edge', None),
+                getattr(ds, 'edge2cell', None), getattr(ds, 'face2cell', None),
+                ds.NN)
+        if self.state is not None and \
+                all(a is b for a, b in zip(state[:-1], self.state[:-1])) and \
+                state[-1] == self.state[-1]:
+            return True
+        self.data = {}
+        self.state = state
+        return False
+
+    def get(self, key, fun, *args):
+        self.is_valid()
+        val = self.data.get(key)
+        if val is None:
+            self.nmiss += 1
+            val = fun(*args)
+            if isinstance(val, tuple):
+                for v in val:
+                    set_readonly(v)
+            else:
+                set_readonly(val)
+            self.data[key] = val
+        else:
+            self.nhit += 1
+        return val
+
+    def statistics(self):
+        """
+
+        Notes
+        -----
+        缓存的命中次数, 未命中次数和当前缓存的关系个数。
+        """
+        return {'hit': self.nhit, 'miss': self.nmiss, 'size': len(self.data)}
+
+
+def set_readonly(val):
+    if isinstance(val, np.ndarray):
+        val.setflags(write=False)
+    elif isinstance(val, spmatrix):
+        for name in ('data', 'indices', 'indptr', 'row', 'col'):
+            a = getattr(val, name, None)
+            if isinstance(a, np.ndarray):
+                a.setflags(write=False)
+
+
+def topology_cache(fun):
+    """
+
+    Notes
+    -----
+    拓扑数据结构中邻接关系函数的装饰器, 按函数名和 (补全默认值后的) 参数缓存
+    结果, 缓存放在 `ds.topocache` 中。
+    """
+    sig = inspect.signature(fun)
+
+    @wraps(fun)
+    def wrapper(self, *args, **kwargs):
+        cache = self.topocache
+        if cache is None:
+            cache = self.topocache = TopologyCache(self)
+        bound = sig.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (fun.__name__, ) + tuple(bound.arguments.values())[1:]
+        try:
+            hash(key)
+        except TypeError: # 参数不能作为键时不缓存
+            return fun(self, *args, **kwargs)
+        return cache.get(key, lambda: fun(self, *args, **kwargs))
+    return wrapper
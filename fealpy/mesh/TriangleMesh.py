@@ -1,9 +1,11 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, bmat, eye
-from scipy.spatial import KDTree
 from .Mesh2d import Mesh2d, Mesh2dDataStructure
+from .GeometryCache import GeometryCache
+from .PointLocator import PointLocator
 from ..quadrature import TriangleQuadrature
 from ..quadrature import GaussLegendreQuadrature
+from ..common import index_type
 
 class TriangleMeshDataStructure(Mesh2dDataStructure):
     localEdge = np.array([(1, 2), (2, 0), (0, 1)])
@@ -15,6 +17,17 @@ class TriangleMeshDataStructure(Mesh2dDataStructure):
     def __init__(self, NN, cell):
         super(TriangleMeshDataStructure, self).__init__(NN, cell)
 
+def extended_array(a, n, dtype):
+    """
+
+    Notes
+    -----
+    返回在数组 a 的尾部留出 n 行空位的新数组, 前 len(a) 行复制 a 。
+    """
+    b = np.empty((len(a) + n, ) + a.shape[1:], dtype=dtype)
+    b[:len(a)] = a
+    return b
+
 class TriangleMesh(Mesh2d):
     def __init__(self, node, cell):
 
@@ -37,6 +50,9 @@ class TriangleMesh(Mesh2d):
         self.facedata = self.edgedata
         self.meshdata = {}
 
+        self.geocache = GeometryCache(self)
+        self.locator = PointLocator(self)
+
     def number_of_corner_nodes(self):
         return self.ds.NN
 
@@ -244,57 +260,18 @@ class TriangleMesh(Mesh2d):
 
         return isCrossedCell
 
-    def location(self, points):
+    def location(self, points, return_bc=False):
         """
         Notes
         -----
-        给定一组点 p ， 找到这些点所在的单元
+        给定一组点 p ， 找到这些点所在的单元, 网格外的点对应的单元编号为 -1 。
 
-        这里假设：
+        return_bc 为真时同时返回点在所在单元中的重心坐标。
 
-        1. 所有点在网格内部，
-        2. 网格中没有洞
-        3. 区域还要是凸的
+        点定位的桶索引 (见 PointLocator) 在第一次调用时生成, 网格不变时一直重
+        用。区域可以是非凸的, 也可以有洞。
         """
-
-        NN = self.number_of_nodes()
-        NC = self.number_of_cells()
-        NP = points.shape[0]
-        node = self.entity('node')
-        cell = self.entity('cell')
-        cell2cell = self.ds.cell_to_cell()
-
-        start = np.zeros(NN, dtype=self.itype)
-        start[cell[:, 0]] = range(NC)
-        start[cell[:, 1]] = range(NC)
-        start[cell[:, 2]] = range(NC)
-        tree = KDTree(node)
-        _, loc = tree.query(points)
-        start = start[loc] # 设置一个初始单元位置
-
-        isNotOK = np.ones(NP, dtype=np.bool)
-        while np.any(isNotOK):
-            idx = start[isNotOK]
-            pp = points[isNotOK]
-
-            v0 = node[cell[idx, 0]] - pp # 所在单元的三个顶点
-            v1 = node[cell[idx, 1]] - pp 
-            v2 = node[cell[idx, 2]] - pp
-
-            a = np.zeros((len(idx), 3), dtype=self.ftype)
-            a[:, 0] = np.cross(v1, v2)
-            a[:, 1] = np.cross(v2, v0)
-            a[:, 2] = np.cross(v0, v1)
-            lidx = np.argmin(a, axis=-1) 
-
-            # 最小面积小于 0, 说明点在单元外
-            isOutCell = a[range(a.shape[0]), lidx] < 0.0 
-
-            idx0, = np.nonzero(isNotOK)
-            start[idx0[isOutCell]] = cell2cell[idx[isOutCell], lidx[isOutCell]]
-            isNotOK[idx0[~isOutCell]] = False
-
-        return start 
+        return self.locator.find_cell(points, return_bc=return_bc)
 
     def circumcenter(self):
         node = self.node
@@ -394,7 +371,8 @@ class TriangleMesh(Mesh2d):
             edge = self.entity('edge')
             cell = self.entity('cell')
             cell2edge = self.ds.cell_to_edge()
-            edge2newNode = np.arange(NN, NN+NE)
+            self.itype = index_type(max(NN+NE, 4*NC), self.itype)
+            edge2newNode = np.arange(NN, NN+NE, dtype=self.itype)
             newNode = (node[edge[:,0],:] + node[edge[:,1],:])/2.0
 
             if returnim:
@@ -414,6 +392,13 @@ class TriangleMesh(Mesh2d):
             cell = np.r_['0', p[:, [0, 5, 4]], p[:, [5, 1, 3]], p[:, [4, 3, 2]], p[:, [3, 4, 5]]]
             NN = self.node.shape[0]
             self.ds.reinit(NN, cell)
+
+        if self.autoreorder is not None:
+            nodeperm, cellperm = self.reorder(self.autoreorder)
+            if returnim:
+                nodeIMatrix[-1] = nodeIMatrix[-1][nodeperm]
+                cellIMatrix[-1] = cellIMatrix[-1][cellperm]
+
         if returnim:
             return nodeIMatrix, cellIMatrix
 
@@ -421,7 +406,33 @@ class TriangleMesh(Mesh2d):
         for i in range(n):
             self.bisect()
 
-    def bisect(self, isMarkedCell=None, returnim=False, refine=None):
+    def bisect(self, isMarkedCell=None, returnim=False, refine=None, p=1):
+        """
+
+        Parameters
+        ----------
+        isMarkedCell: (NC, ) 的布尔数组, 标记需要加密的单元, 默认加密所有单元
+        returnim: 是否返回插值矩阵
+        p: 插值矩阵对应的 Lagrange 有限元空间的次数
+
+        Returns
+        -------
+        IM: returnim 为 True 时返回 (gdof1, gdof0) 的 csr 矩阵, 把加密前网格上
+            p 次 Lagrange 有限元函数的自由度插值到加密后的网格上
+
+        Notes
+        -----
+        加密后 self.cellmap 记录每个单元在加密前的编号, 新产生的单元为 -1,
+        不在其中的旧单元为被加密掉的单元, 见 CellMatrixCache 。
+
+        加密后节点, 单元, 边和 edge2cell 的个数事先算出, 一次分配新的数组, 新的
+        实体追加在尾部, 只更新被二分单元的边, 不再由 cell 重新生成整个拓扑。
+        旧的数组不会被修改, 所以加密前取出的数组 (以及建立在旧网格上的空间)
+        仍然有效。
+
+        边的编号和由 cell 重新生成的不同: 被二分的边保留原来的编号作为起点一侧
+        的半边, 另一半和单元内新的边追加在尾部。
+        """
 
         NN = self.number_of_nodes()
         NC = self.number_of_cells()
@@ -430,9 +441,6 @@ class TriangleMesh(Mesh2d):
         if isMarkedCell is None:
             isMarkedCell = np.ones(NC, dtype=np.bool)
 
-        cell = self.entity('cell')
-        edge = self.entity('edge')
-
         cell2edge = self.ds.cell_to_edge()
         cell2cell = self.ds.cell_to_cell()
 
@@ -444,66 +452,179 @@ class TriangleMesh(Mesh2d):
             refineNeighbor = cell2cell[markedCell, 0]
             markedCell = refineNeighbor[~isCutEdge[cell2edge[refineNeighbor,0]]]
 
+        cutEdge, = np.nonzero(isCutEdge)
+        nCut = len(cutEdge)
+
+        # 第一轮二分加密边被标记的单元, 第二轮再二分它的两个子单元中加密边被
+        # 标记的, 每次二分增加一个单元和一条边
+        idx, = np.nonzero(isCutEdge[cell2edge[:, 0]])
+        nc = len(idx) + isCutEdge[cell2edge[idx, 1:]].sum()
+        NN1 = NN + nCut
+        NC1 = NC + nc
+        NE1 = NE + nCut + nc
+
+        self.itype = index_type(max(NN1, NC1, NE1), self.itype)
+        if returnim and (p > 1):
+            from ..functionspace.femdof import CPLFEMDof2d
+            cell2dof = CPLFEMDof2d(self, p).cell2dof
+            parent = np.arange(NC1)
+            cellbc = np.zeros((NC1, 3, 3), dtype=self.ftype)
+            cellbc[:NC] = np.eye(3, dtype=self.ftype)
+
+        node = extended_array(self.node, nCut, self.node.dtype)
+        cell = extended_array(self.ds.cell, nc, self.itype)
+        edge = extended_array(self.ds.edge, nCut + nc, self.itype)
+        edge2cell = extended_array(self.ds.edge2cell, nCut + nc, self.itype)
+
+        # 边 e = (a, b) 的中点为 m, 编号 e 留给半边 (a, m), 半边 (m, b) 的编号为
+        # NE + (m - NN), 两个半边的 edge2cell 在两侧的单元二分时填写
         edge2newNode = np.zeros((NE,), dtype=self.itype)
-        edge2newNode[isCutEdge] = np.arange(NN, NN+isCutEdge.sum())
-
-        node = self.node
-        newNode =0.5*(node[edge[isCutEdge,0],:] + node[edge[isCutEdge,1],:])
-        self.node = np.concatenate((node, newNode), axis=0)
-        cell2edge0 = cell2edge[:, 0]
-
-        if returnim:
-            nn = len(newNode)
-            IM = coo_matrix((np.ones(NN), (np.arange(NN), np.arange(NN))),
-                    shape=(NN+nn, NN), dtype=self.ftype)
-            val = np.full(nn, 0.5)
-            IM += coo_matrix(
-                    (
-                        val,
-                        (
-                            NN+np.arange(nn),
-                            edge[isCutEdge, 0]
-                        )
-                    ), shape=(NN+nn, NN), dtype=self.ftype)
-            IM += coo_matrix(
-                    (
-                        val,
-                        (
-                            NN+np.arange(nn),
-                            edge[isCutEdge, 1]
-                        )
-                    ), shape=(NN+nn, NN), dtype=self.ftype)
-
+        edge2newNode[cutEdge] = np.arange(NN, NN1)
+        a = edge[cutEdge, 0].copy()
+        b = edge[cutEdge, 1].copy()
+        node[NN:] = 0.5*(node[a] + node[b])
+        isBdCutEdge = edge2cell[cutEdge, 0] == edge2cell[cutEdge, 1]
+        edge[cutEdge, 1] = edge2newNode[cutEdge]
+        edge[NE:NE+nCut, 0] = edge2newNode[cutEdge]
+        edge[NE:NE+nCut, 1] = b
+        edge2cell[NE:NE+nCut] = -1
+
+        if returnim and (p == 1):
+            I = np.r_[np.arange(NN), NN + np.arange(nCut), NN + np.arange(nCut)]
+            J = np.r_[np.arange(NN), a, b]
+            val = np.r_[np.ones(NN), np.full(2*nCut, 0.5)]
+            IM = csr_matrix((val, (I, J)), shape=(NN1, NN), dtype=self.ftype)
+
+        cellmap = np.full(NC1, -1, dtype=np.int_)
+        cellmap[:NC] = np.arange(NC)
+        c2e = cell2edge[idx]
+        s = NC
         for k in range(2):
-            idx, = np.nonzero(edge2newNode[cell2edge0]>0)
             nc = len(idx)
             if nc == 0:
                 break
             L = idx
-            R = np.arange(NC, NC+nc)
-            p0 = cell[idx,0]
-            p1 = cell[idx,1]
-            p2 = cell[idx,2]
-            p3 = edge2newNode[cell2edge0[idx]]
-            cell = np.concatenate((cell, np.zeros((nc,3), dtype=self.itype)), axis=0)
-            cell[L,0] = p3
-            cell[L,1] = p0
-            cell[L,2] = p1
-            cell[R,0] = p3
-            cell[R,1] = p2
-            cell[R,2] = p0
+            R = np.arange(s, s+nc)
+            p0 = cell[L, 0]
+            p1 = cell[L, 1]
+            p2 = cell[L, 2]
+            e0 = c2e[:, 0]
+            e1 = c2e[:, 1]
+            e2 = c2e[:, 2]
+            p3 = edge2newNode[e0]
+
+            # 左右子单元中由 p1, p2 出发的半边, 以及它们在 edge2cell 中的一侧
+            isStart = (edge[e0, 0] == p1)
+            h1 = np.where(isStart, e0, NE + p3 - NN)
+            h2 = np.where(isStart, NE + p3 - NN, e0)
+            side = np.where(isStart, 0, 1)
+            n = np.arange(NE + nCut + s - NC, NE + nCut + s - NC + nc)
+
+            for i in range(2):
+                flag = (edge2cell[e2, i] == L) & (edge2cell[e2, i+2] == 2)
+                edge2cell[e2[flag], i+2] = 0
+                flag = (edge2cell[e1, i] == L) & (edge2cell[e1, i+2] == 1)
+                edge2cell[e1[flag], i] = R[flag]
+                edge2cell[e1[flag], i+2] = 0
+            edge2cell[h1, side] = L
+            edge2cell[h1, side+2] = 1
+            edge2cell[h2, side] = R
+            edge2cell[h2, side+2] = 2
+            edge[n, 0] = p3
+            edge[n, 1] = p0
+            edge2cell[n, 0] = L
+            edge2cell[n, 1] = R
+            edge2cell[n, 2] = 2
+            edge2cell[n, 3] = 1
+
+            cell[L, 0] = p3
+            cell[L, 1] = p0
+            cell[L, 2] = p1
+            cell[R, 0] = p3
+            cell[R, 1] = p2
+            cell[R, 2] = p0
+            cellmap[L] = -1
+
+            if returnim and (p > 1):
+                parent[R] = parent[L]
+                bc = cellbc[L]
+                m = 0.5*(bc[:, 1] + bc[:, 2])
+                cellbc[R] = np.stack((m, bc[:, 2], bc[:, 0]), axis=1)
+                cellbc[L] = np.stack((m, bc[:, 0], bc[:, 1]), axis=1)
+
+            s += nc
             if k == 0:
-                cell2edge0 = np.zeros((NC+nc,), dtype=self.itype)
-                cell2edge0[0:NC] = cell2edge[:,0]
-                cell2edge0[L] = cell2edge[idx,2]
-                cell2edge0[R] = cell2edge[idx,1]
-            NC = NC+nc
+                # 子单元的边, 第二轮只二分加密边被标记的子单元
+                idx = np.r_[L, R]
+                c2e = np.r_['0', np.c_[e2, h1, n], np.c_[e1, n, h2]]
+                flag = isCutEdge[c2e[:, 0]]
+                idx = idx[flag]
+                c2e = c2e[flag]
+
+        # 边界上的半边两侧是同一个单元
+        e = np.r_[cutEdge[isBdCutEdge], NE + np.nonzero(isBdCutEdge)[0]]
+        edge2cell[e, 1] = edge2cell[e, 0]
+        edge2cell[e, 3] = edge2cell[e, 2]
 
-        NN = self.node.shape[0]
-        self.ds.reinit(NN, cell)
+        self.node = node
+        self.ds.reinit(NN1, cell, edge=edge, edge2cell=edge2cell)
+        self.cellmap = cellmap
+
+        if self.autoreorder is not None:
+            nodeperm, cellperm = self.reorder(self.autoreorder)
+            if returnim and (p == 1):
+                IM = IM[nodeperm]
+            elif returnim:
+                parent = parent[cellperm]
+                cellbc = cellbc[cellperm]
+
+        if returnim and (p > 1):
+            IM = self.bisect_interpolation_matrix(p, cell2dof, parent, cellbc)
 
         if returnim:
-            return IM.tocsr()
+            return IM
+
+    def bisect_interpolation_matrix(self, p, cell2dof, parent, cellbc):
+        """
+
+        Parameters
+        ----------
+        p: Lagrange 有限元空间的次数
+        cell2dof: 加密前网格上的 cell2dof
+        parent: (NC, ), 当前每个单元所在的加密前的单元
+        cellbc: (NC, 3, 3), 当前每个单元的三个顶点在 parent 中的重心坐标
+
+        Returns
+        -------
+        IM: (gdof1, gdof0) 的 csr 矩阵
+
+        Notes
+        -----
+        新的每个自由度取一个包含它的单元, 在它的 parent 单元上计算原来的 p 次
+        基函数在插值点处的值。加密后的空间包含原来的空间, 所以插值是精确的。
+        """
+        from ..functionspace.femdof import CPLFEMDof2d
+        dof = CPLFEMDof2d(self, p)
+        gdof = dof.number_of_global_dofs()
+        NC, ldof = dof.cell2dof.shape
+        index = np.zeros(gdof, dtype=np.int_)
+        index[dof.cell2dof] = np.arange(NC*ldof).reshape(NC, ldof)
+        c, i = np.divmod(index, ldof)
+        bc = np.einsum('ij, ijk->ik', dof.multiIndex[i]/p, cellbc[c])
+
+        # p 次 Lagrange 基函数 prod_i prod_{t < alpha_i} (p*bc_i - t)/(t+1)
+        A = np.ones((gdof, p+1, 3), dtype=self.ftype)
+        A[:, 1:, :] = p*bc[:, None, :] - np.arange(p).reshape(-1, 1)
+        A[:, 1:, :] /= np.arange(1, p+1).reshape(-1, 1)
+        np.cumprod(A, axis=-2, out=A)
+        phi = np.prod(A[:, dof.multiIndex, [0, 1, 2]], axis=-1)
+
+        I = np.broadcast_to(np.arange(gdof)[:, None], phi.shape)
+        J = cell2dof[parent[c]]
+        flag = np.abs(phi) > 1e-12
+        IM = csr_matrix((phi[flag], (I[flag], J[flag])),
+                shape=(gdof, cell2dof.max()+1), dtype=self.ftype)
+        return IM
 
     def label(self, node=None, cell=None, cellidx=None):
         """单元顶点的重新排列，使得cell[:, [1, 2]] 存储了单元的最长边
@@ -835,7 +956,7 @@ class TriangleMesh(Mesh2d):
                 c = c(bc)
         
         if c is not None:
-            area *= c
+            area = area*c
 
         A = gphi@gphi.swapaxes(-1, -2)
         A *= area[:, None, None]
@@ -847,6 +968,9 @@ class TriangleMesh(Mesh2d):
         return A
 
     def grad_lambda(self):
+        return self.geocache.get('grad_lambda', self._grad_lambda)
+
+    def _grad_lambda(self):
         node = self.node
         cell = self.ds.cell
         NC = self.number_of_cells()
@@ -878,9 +1002,13 @@ class TriangleMesh(Mesh2d):
             `J` is the transpose o  jacobi matrix of each cell.
             The shape of `J` is  `(NC, 2, 2)` or `(NC, 2, 3)`
         """
+        J = self.geocache.get('jacobi_matrix', self._jacobi_matrix)
+        return J[index]
+
+    def _jacobi_matrix(self):
         node = self.node
         cell = self.ds.cell
-        J = node[cell[index, [1, 2]]] - node[cell[index, [0]]]
+        J = node[cell[:, [1, 2]]] - node[cell[:, [0]]]
         return J
 
     def rot_lambda(self):
@@ -906,11 +1034,15 @@ class TriangleMesh(Mesh2d):
         return Rlambda
 
     def cell_area(self, index=np.s_[:]):
+        a = self.geocache.get('cell_area', self._cell_area)
+        return a[index]
+
+    def _cell_area(self):
         node = self.node
         cell = self.ds.cell
         GD = self.geo_dimension()
-        v1 = node[cell[index, 1], :] - node[cell[index, 0], :]
-        v2 = node[cell[index, 2], :] - node[cell[index, 0], :]
+        v1 = node[cell[:, 1], :] - node[cell[:, 0], :]
+        v2 = node[cell[:, 2], :] - node[cell[:, 0], :]
         nv = np.cross(v2, -v1)
         if GD == 2:
             a = nv/2.0
@@ -918,6 +1050,13 @@ class TriangleMesh(Mesh2d):
             a = np.sqrt(np.square(nv).sum(axis=1))/2.0
         return a
 
+    def entity_barycenter(self, etype=2, index=np.s_[:]):
+        if etype in {'cell', 2}:
+            bc = self.geocache.get('cell_barycenter',
+                    super().entity_barycenter, 'cell')
+            return bc[index]
+        return super().entity_barycenter(etype=etype, index=index)
+
     def bc_to_point(self, bc, etype='cell', index=np.s_[:]):
         """
 
@@ -925,7 +1064,17 @@ class TriangleMesh(Mesh2d):
         ----
 
         etype 是一个多余的参数， bc 中已经包含这单元类型的信息
+
+        在所有单元上计算积分点时, 结果缓存在 geocache 中
         """
+        TD = bc.shape[-1] - 1 #
+        if TD == 2 and bc.ndim <= 2 and \
+                isinstance(index, slice) and index == slice(None):
+            key = ('bc_to_point', bc.shape, bc.tobytes())
+            return self.geocache.get(key, self._bc_to_point, bc)
+        return self._bc_to_point(bc, index=index)
+
+    def _bc_to_point(self, bc, index=np.s_[:]):
         TD = bc.shape[-1] - 1 #
         node = self.node
         entity = self.entity(etype=TD)[index]
@@ -340,6 +340,8 @@ class Tritree(TriangleMesh):
             self.parent = np.r_['0', self.parent, parent4]
             self.child = np.r_['0', self.child, child4]
             self.ds.reinit(NN + NNN, cell)
+            # 旧单元的编号不变, 新单元为 -1, 见 CellMatrixCache
+            self.cellmap = np.r_[np.arange(NC), -np.ones(4*NCC, dtype=np.int_)]
 
     def coarsen_1(self, isMarkedCell=None, options={'disp': True}):
 
@@ -435,6 +437,8 @@ class Tritree(TriangleMesh):
             cell = nodeIdxMap[cell]
             self.node = node[isRemainNode]
             self.ds.reinit(NN, cell)
+            # 留下的单元在粗化前的编号, 见 CellMatrixCache
+            self.cellmap, = np.nonzero(~isNeedRemovedCell)
 
             if ('numrefine' in options) and (options['numrefine'] is not None):
                 options['numrefine'] = options['numrefine'][~isNeedRemovedCell]
@@ -735,6 +739,8 @@ class Tritree(TriangleMesh):
             self.parent = np.r_['0', self.parent, parent4]
             self.child = np.r_['0', self.child, child4]
             self.ds.reinit(NN + NNN, cell)
+            # 旧单元的编号不变, 新单元为 -1, 见 CellMatrixCache
+            self.cellmap = np.r_[np.arange(NC), -np.ones(4*NCC, dtype=np.int_)]
 
     def adaptive_coarsen(self, estimator, surface=None, data=None):
         if data is not None:
@@ -836,6 +842,8 @@ class Tritree(TriangleMesh):
             cell = nodeIdxMap[cell]
             self.node = node[isRemainNode]
             self.ds.reinit(NN, cell)
+            # 留下的单元在粗化前的编号, 见 CellMatrixCache
+            self.cellmap, = np.nonzero(~isNeedRemovedCell)
             return isRemainNode
         else:
             return 
@@ -33,6 +33,7 @@ from .Quadtree import Quadtree
 from .Octree import Octree
 
 from .QuadtreeForest import QuadtreeMesh, QuadtreeForest
+from .LinearTree import LinearQuadtree, LinearOctree
 
 from .simple_mesh_generator import *
 
@@ -11,6 +11,231 @@ Huayi Wei, weihuayi@xtu.edu.cn
 
 """
 import numpy as np 
+from concurrent.futures import ThreadPoolExecutor
+
+
+def sort_rows(a):
+    """
+
+    Notes
+    -----
+    把每行按升序排列。列数不超过 4 时用排序网络 (逐列的 minimum/maximum),
+    比 np.sort(a, axis=1) 快得多。
+    """
+    M, k = a.shape
+    if k > 4:
+        return np.sort(a, axis=1)
+    cols = [a[:, i].copy() for i in range(k)]
+    network = {
+            1: [],
+            2: [(0, 1)],
+            3: [(0, 1), (1, 2), (0, 1)],
+            4: [(0, 1), (2, 3), (0, 2), (1, 3), (1, 2)]}[k]
+    for i, j in network:
+        t = np.minimum(cols[i], cols[j])
+        np.maximum(cols[i], cols[j], out=cols[j])
+        cols[i] = t
+    return np.stack(cols, axis=1)
+
+
+def pack_rows(a, NN):
+    """
+
+    Notes
+    -----
+    把非负整数数组 a (M, k) 的每行压缩成若干个 uint64 的键, 每个元素占
+    ceil(log2(NN)) 位, 一个键放得下几个元素就放几个, 所以永远不会溢出。键按
+    从高到低的顺序返回, 它们的字典序和 a 的行的字典序一致。
+    """
+    M, k = a.shape
+    bits = max(int(NN - 1).bit_length(), 1)
+    if bits > 64:
+        raise ValueError("can not pack indices with {} bits".format(bits))
+    n = 64//bits # 每个键中放几个元素
+    shift = np.uint64(bits)
+    keys = []
+    for start in range(0, k, n):
+        key = a[:, start].astype(np.uint64)
+        for i in range(start+1, min(start+n, k)):
+            key <<= shift
+            key |= a[:, i].astype(np.uint64)
+        keys.append(key)
+    return keys
+
+
+def _sorted_groups(keys):
+    """
+
+    Notes
+    -----
+    稳定排序后, 每组相同键的起点, 排序的顺序和排好的键。
+    """
+    if len(keys) == 1:
+        order = np.argsort(keys[0], kind='stable')
+    else:
+        order = np.lexsort(keys[::-1])
+    skeys = [key[order] for key in keys]
+    flag = np.zeros(len(order), dtype=np.bool_)
+    if len(order) > 0:
+        flag[0] = True
+        for key in skeys:
+            flag[1:] |= key[1:] != key[:-1]
+    start, = np.nonzero(flag)
+    return start, order, skeys
+
+
+def _unique_chunk(keys, offset):
+    start, order, skeys = _sorted_groups(keys)
+    end = np.r_[start[1:], len(order)]
+    gid = np.zeros(len(order), dtype=np.int_)
+    gid[start[1:]] = 1
+    j = np.zeros(len(order), dtype=np.int_)
+    j[order] = np.cumsum(gid)
+    return ([key[start] for key in skeys], order[start] + offset,
+            order[end - 1] + offset, j)
+
+
+def unique_entity(entity, nthreads=1, chunksize=None, colex=False):
+    """
+
+    Parameters
+    ----------
+    entity: (M, k), 所有单元的局部实体 (如 totalEdge, totalFace)
+    nthreads: 线程个数
+    chunksize: 每个线程一次处理的行数, 默认把所有行均分给各个线程
+    colex: 为 True 时实体按排序后的顶点编号从后往前的字典序 (colex 序)
+        排列, 和 LinearMeshDataStructure 原来的组合数编码的顺序一样
+
+    Returns
+    -------
+    i0: (N, ), 每个实体第一次出现的行
+    i1: (N, ), 每个实体最后一次出现的行
+    j: (M, ), 每行对应的实体编号
+
+    Notes
+    -----
+    找出 entity 中不同的实体 (不计顶点顺序), 实体的编号和
+    `np.unique(np.sort(entity, axis=1), axis=0, return_index=True,
+    return_inverse=True)` 完全一样, 即按排序后的顶点编号的字典序排列。
+
+    每行的顶点编号压缩成 uint64 的键 (见 pack_rows), 一个键放不下时用多个键
+    做 lexsort, 不会溢出, 也避免了 np.unique(..., axis=0) 中很慢的 void 类型
+    排序。
+
+    nthreads > 1 时按行分块, 各块在线程中独立排序去重 (numpy 的排序不占用
+    GIL), 再把各块去重后的结果合并排序一次。内部的实体在块内通常出现两次, 所
+    以合并的规模大约只有原来的一半。
+    """
+    M = entity.shape[0]
+    NN = int(entity.max()) + 1 if M > 0 else 1
+    if chunksize is None:
+        chunksize = -(-M//nthreads) if nthreads > 1 else M
+    chunksize = max(chunksize, 1)
+
+    def task(start):
+        a = sort_rows(entity[start:start+chunksize])
+        if colex:
+            a = a[:, ::-1]
+        return _unique_chunk(pack_rows(a, NN), start)
+
+    starts = range(0, M, chunksize)
+    if (nthreads > 1) and (len(starts) > 1):
+        with ThreadPoolExecutor(nthreads) as pool:
+            chunks = list(pool.map(task, starts))
+    else:
+        chunks = [task(start) for start in starts]
+
+    if len(chunks) == 1:
+        _, i0, i1, j = chunks[0]
+        return i0, i1, j
+
+    # 合并各块: 块按行的顺序排列, 稳定排序保证第一次和最后一次出现的行正确
+    keys = [np.concatenate([c[0][i] for c in chunks]) for i in range(len(chunks[0][0]))]
+    first = np.concatenate([c[1] for c in chunks])
+    last = np.concatenate([c[2] for c in chunks])
+    start, order, _ = _sorted_groups(keys)
+    end = np.r_[start[1:], len(order)]
+    i0 = first[order[start]]
+    i1 = last[order[end - 1]]
+    gid = np.zeros(len(order), dtype=np.int_)
+    gid[start[1:]] = 1
+    gmap = np.zeros(len(order), dtype=np.int_)
+    gmap[order] = np.cumsum(gid)
+
+    j = np.zeros(M, dtype=np.int_)
+    offset = 0
+    for s, c in zip(starts, chunks):
+        j[s:s+len(c[3])] = gmap[offset + c[3]]
+        offset += len(c[1])
+    return i0, i1, j
+
+
+def edge_key(edge):
+    """
+
+    Notes
+    -----
+    把边 edge (M, 2) 的两个端点排序后压缩成一个 uint64 的键, 和端点的顺序
+    无关。端点编号要小于 2**32 。
+    """
+    key, = pack_rows(sort_rows(edge), 2**32)
+    return key
+
+
+class EdgeMidpointTable():
+    """
+
+    Notes
+    -----
+    被二分的边到它的中点编号的查找表。
+
+    表中是排好序的边的键 (见 edge_key) 和对应的中点编号, 用 searchsorted 成批
+    查找。插入时用 np.insert 把新的键归并到原来的有序数组中, 不需要重新排序,
+    占用的内存只和被二分的边数成正比。
+    """
+    def __init__(self, dtype=np.int_):
+        self.key = np.zeros(0, dtype=np.uint64)
+        self.midpoint = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.key)
+
+    def find(self, edge):
+        """
+
+        Parameters
+        ----------
+        edge: (M, 2), 要查找的边
+
+        Returns
+        -------
+        midpoint: (M, ), 边的中点编号, 没有被二分的边为 -1
+        """
+        key = edge_key(edge)
+        midpoint = np.full(len(key), -1, dtype=self.midpoint.dtype)
+        if len(self.key) > 0:
+            idx = np.searchsorted(self.key, key)
+            idx[idx == len(self.key)] = 0
+            flag = self.key[idx] == key
+            midpoint[flag] = self.midpoint[idx[flag]]
+        return midpoint
+
+    def insert(self, edge, midpoint):
+        """
+
+        Notes
+        -----
+        插入不在表中的边 edge (M, 2) 和它们的中点编号 midpoint (M, ), edge 中
+        的边互不相同。
+        """
+        key = edge_key(edge)
+        order = np.argsort(key)
+        key = key[order]
+        idx = np.searchsorted(self.key, key)
+        self.key = np.insert(self.key, idx, key)
+        self.midpoint = np.insert(self.midpoint, idx,
+                midpoint[order].astype(self.midpoint.dtype))
+
 
 class LinearMeshDataStructure():
 
@@ -43,23 +268,13 @@ class LinearMeshDataStructure():
         FV = self.FV
 
         totalFace = self.total_face()
-        index = np.sort(totalFace, axis=-1)
-        I = index[:, 0]
-        I += index[:, 1]*(index[:, 1] + 1)//2
-        I += index[:, 2]*(index[:, 2] + 1)*(index[:, 2] + 2)//6
-        if FV == 4: 
-            I += index[:, 3]*(index[:, 3] + 1)*(index[:, 3] + 2)*(index[:, 3] + 3)//24
-        _, i0, j = np.unique(I, return_index=True, return_inverse=True)
+        i0, i1, _ = unique_entity(totalFace, colex=True)
 
         NF = i0.shape[0]
         self.NF = NF
         self.face = totalFace[i0, :]
 
         self.face2cell = np.zeros((NF, 4), dtype=self.itype)
-
-        i1 = np.zeros(NF, dtype=self.itype)
-        i1[j] = np.arange(F*NC, dtype=self.itype)
-
         self.face2cell[:, 0] = i0//F
         self.face2cell[:, 1] = i1//F
         self.face2cell[:, 2] = i0%F
@@ -78,21 +293,13 @@ class LinearMeshDataStructure():
         EV = self.EV
 
         totalEdge = self.total_edge()
-        index = np.sort(totalEdge, axis=-1)
-        I = index[:, 0] 
-        I += index[:, 1]*(index[:, 1] + 1)//2
-
-        _, i0, j = np.unique(I, return_index=True, return_inverse=True)
+        i0, i1, _ = unique_entity(totalEdge, colex=True)
         NE = i0.shape[0]
         self.NE = NE
         self.edge = totalEdge[i0, :]
 
         if TD == 2:
             self.edge2cell = np.zeros((NE, 4), dtype=self.itype)
-
-            i1 = np.zeros(NE, dtype=self.itype)
-            i1[j] = np.arange(E*NC, dtype=self.itype)
-
             self.edge2cell[:, 0] = i0//E
             self.edge2cell[:, 1] = i1//E
             self.edge2cell[:, 2] = i0%E
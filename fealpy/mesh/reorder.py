@@ -0,0 +1,229 @@
+import numpy as np
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+
+def quantize(p, nbits):
+    """
+
+    Notes
+    -----
+    把点 p (n, GD) 按包围盒缩放到 [0, 2**nbits - 1] 中的整数坐标。
+    """
+    pmin = np.min(p, axis=0)
+    L = np.max(p, axis=0) - pmin
+    L[L == 0.0] = 1.0
+    X = np.floor((p - pmin)/L*(2**nbits - 1) + 0.5)
+    return X.astype(np.uint64)
+
+
+def interleave(X, nbits):
+    """
+
+    Notes
+    -----
+    把整数坐标 X (GD 个 (n, ) 数组) 的各位从高到低交错排成一个 uint64 的键。
+    """
+    GD = len(X)
+    key = np.zeros(len(X[0]), dtype=np.uint64)
+    one = np.uint64(1)
+    for b in range(nbits-1, -1, -1):
+        for i in range(GD):
+            key <<= one
+            key |= (X[i] >> np.uint64(b)) & one
+    return key
+
+
+def default_nbits(n, GD):
+    """
+
+    Notes
+    -----
+    每个方向的位数, 比区分 n 个均匀分布的点所需的多 8 位 (可以容纳局部加密
+    256 倍的网格), 但总位数不超过 63 。
+    """
+    return min(63//GD, int(np.ceil(np.log2(max(n, 2))/GD)) + 8)
+
+
+def morton_code(p, nbits=None):
+    """
+
+    Notes
+    -----
+    点 p (n, GD) 的 Morton (Z 序) 编码, 每个方向取 nbits 位。
+    """
+    n, GD = p.shape
+    nbits = default_nbits(n, GD) if nbits is None else nbits
+    X = quantize(p, nbits)
+    return interleave([X[:, i].copy() for i in range(GD)], nbits)
+
+
+def hilbert_code(p, nbits=None):
+    """
+
+    Notes
+    -----
+    点 p (n, GD) 的 Hilbert 曲线编码, 每个方向取 nbits 位。
+
+    用 Skilling 的方法 (J. Skilling, Programming the Hilbert curve, 2004) 先把
+    坐标变换成 Hilbert 编码的 "转置" 形式, 再交错各位。和 Morton 序相比,
+    Hilbert 序中相邻的点在空间中总是相邻的, 局部性更好。
+    """
+    n, GD = p.shape
+    nbits = default_nbits(n, GD) if nbits is None else nbits
+    X = quantize(p, nbits)
+    X = [X[:, i].copy() for i in range(GD)]
+    zero = np.uint64(0)
+
+    M = np.uint64(1 << (nbits - 1))
+    Q = M
+    while Q > 1:
+        P = Q - np.uint64(1)
+        for i in range(GD):
+            flag = (X[i] & Q) != 0
+            if i == 0:
+                X[0] ^= np.where(flag, P, zero) # 翻转低位
+            else:
+                # 对应位为 1 时翻转 X[0] 的低位, 否则交换 X[0] 和 X[i] 的低位
+                t = np.where(flag, zero, (X[0] ^ X[i]) & P)
+                X[0] ^= np.where(flag, P, t)
+                X[i] ^= t
+        Q >>= np.uint64(1)
+
+    # Gray 编码
+    for i in range(1, GD):
+        X[i] ^= X[i-1]
+    t = np.zeros(n, dtype=np.uint64)
+    Q = M
+    while Q > 1:
+        t ^= np.where((X[GD-1] & Q) != 0, Q - np.uint64(1), zero)
+        Q >>= np.uint64(1)
+    for i in range(GD):
+        X[i] ^= t
+    return interleave(X, nbits)
+
+
+def space_filling_curve_order(p, method='hilbert'):
+    """
+
+    Notes
+    -----
+    按空间填充曲线对点 p (n, GD) 排序, 返回排序后的编号 (n, ) 。
+    """
+    if method == 'hilbert':
+        key = hilbert_code(p)
+    elif method == 'morton':
+        key = morton_code(p)
+    else:
+        raise ValueError("unknown space filling curve: {}".format(method))
+    return np.argsort(key, kind='stable')
+
+
+def mesh_reorder(mesh, method='hilbert', data=None):
+    """
+
+    Parameters
+    ----------
+    mesh: 用 node 和 cell 数组表示的网格 (三角形, 四边形, 四面体, 六面体等)
+    method: 'hilbert', 'morton' 或者 'rcm'
+    data: 字典, 其中的节点数据, 单元数据或者有限元函数会按新的编号重排
+
+    Returns
+    -------
+    nodeperm: (NN, ), 新编号的第 i 个节点是原来的第 nodeperm[i] 个节点
+    cellperm: (NC, ), 新编号的第 i 个单元是原来的第 cellperm[i] 个单元
+
+    Notes
+    -----
+    重新给网格的节点和单元编号, 单元的局部顶点顺序不变。
+
+    * 'hilbert', 'morton': 节点和单元 (按重心) 分别按空间填充曲线排序, 提高
+      `node[cell]` 一类的聚集和 `cell2dof` 散射的缓存局部性
+    * 'rcm': 节点按节点邻接图的逆 Cuthill-McKee 序排列, 单元按它的最小顶点编
+      号排列, 减小节点 (线性元的自由度) 矩阵的带宽
+
+    边和面由新的单元重新生成, Lagrange 空间的自由度按节点, 边, 面, 单元的顺序
+    编号, 所以也随之重排。
+
+    `mesh.nodedata`, `mesh.celldata`, `mesh.edgedata` 和 `mesh.facedata` 中
+    的数组原地更新, `mesh.cellmap` 记录每个单元原来的编号 (见
+    CellMatrixCache)。
+
+    `data` 中形状为 (NN, ...) 和 (NC, ...) 的数组分别按节点和单元重排,
+    `Function` 按它所在空间的 `cell2dof` 重排, 它们都被替换成新的 numpy 数组。
+    和网格加密一样, 原来的空间不再可用, 需要在新网格上重新生成空间, 再用
+    `space.function(array=data[key])` 得到新的有限元函数。
+    """
+    NN = mesh.number_of_nodes()
+    NC = mesh.number_of_cells()
+    TD = mesh.top_dimension()
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+
+    if method in {'hilbert', 'morton'}:
+        nodeperm = space_filling_curve_order(node, method=method)
+        cellperm = space_filling_curve_order(
+                mesh.entity_barycenter('cell'), method=method)
+    elif method == 'rcm':
+        nodeperm = reverse_cuthill_mckee(
+                mesh.ds.node_to_node().tocsr(), symmetric_mode=True)
+        nodeperm = nodeperm.astype(np.int_)
+        inv = np.zeros(NN, dtype=np.int_)
+        inv[nodeperm] = np.arange(NN)
+        cellperm = np.argsort(np.min(inv[cell], axis=-1), kind='stable')
+    else:
+        raise ValueError("unknown reorder method: {}".format(method))
+
+    # 重排前记下边, 面和自由度的编号, 用于重排相应的数据
+    entities = []
+    if len(getattr(mesh, 'edgedata', {})) > 0:
+        entities.append(('edgedata', mesh.ds.cell_to_edge()))
+    if (TD == 3) and (len(getattr(mesh, 'facedata', {})) > 0):
+        entities.append(('facedata', mesh.ds.cell_to_face()))
+    cell2dof = {}
+    if data is not None:
+        for key, value in data.items():
+            space = getattr(value, 'space', None)
+            if space is not None:
+                cell2dof[key] = space.cell_to_dof()
+
+    nodeinv = np.zeros(NN, dtype=cell.dtype)
+    nodeinv[nodeperm] = np.arange(NN, dtype=cell.dtype)
+    mesh.node = node[nodeperm]
+    mesh.ds.reinit(NN, nodeinv[cell[cellperm]])
+
+    cellmap = getattr(mesh, 'cellmap', None)
+    if (cellmap is not None) and (len(cellmap) == NC):
+        mesh.cellmap = cellmap[cellperm]
+    else:
+        mesh.cellmap = cellperm
+
+    for key, value in getattr(mesh, 'nodedata', {}).items():
+        mesh.nodedata[key] = value[nodeperm]
+    for key, value in getattr(mesh, 'celldata', {}).items():
+        mesh.celldata[key] = value[cellperm]
+    for name, c2e in entities:
+        c2e1 = mesh.ds.cell_to_edge() if name == 'edgedata' else mesh.ds.cell_to_face()
+        perm = np.zeros(c2e.max() + 1, dtype=np.int_)
+        perm[c2e1] = c2e[cellperm]
+        edata = getattr(mesh, name)
+        for key, value in edata.items():
+            edata[key] = value[perm]
+
+    if data is not None:
+        for key, value in data.items():
+            if key in cell2dof:
+                space = value.space
+                dof = type(space.dof)(mesh, space.p)
+                c2d = cell2dof[key]
+                perm = np.zeros(c2d.max() + 1, dtype=np.int_)
+                perm[dof.cell2dof] = c2d[cellperm]
+            elif len(value) == NN:
+                perm = nodeperm
+            elif len(value) == NC:
+                perm = cellperm
+            else:
+                raise ValueError("can not reorder data '{}' with shape {}".format(
+                    key, value.shape))
+            data[key] = np.asarray(value)[perm]
+
+    return nodeperm, cellperm
@@ -0,0 +1,268 @@
+import numpy as np
+from scipy.sparse import csr_matrix, bsr_matrix
+
+from ..common.scatter import segment_sum
+from ..common.Tools import index_type
+
+
+class AssemblyPlan():
+    """
+
+    Notes
+    -----
+    有限元矩阵的组装计划。
+
+    给定两个空间的单元自由度映射 `cell2dof0` 和 `cell2dof1`, 预先计算全局矩阵的
+    CSR 稀疏结构 (`indptr`, `indices`), 以及每个单元矩阵元素在 CSR `data` 数组中
+    的位置 `cell2nnz`。
+
+    只要网格和 `cell2dof` 不变, 之后的每次组装只需要计算单元矩阵, 再把它直接累加
+    到 `data` 数组中, 不需要再构造 I, J 数组和做 COO 到 CSR 的转换。
+
+    由同一个计划组装出的矩阵共享 `indptr` 和 `indices` 数组, 不要原地修改它们的
+    稀疏结构。
+    """
+    def __init__(self, cell2dof0, gdof0, cell2dof1=None, gdof1=None):
+        if cell2dof1 is None:
+            cell2dof1 = cell2dof0
+            gdof1 = gdof0
+
+        NC = cell2dof0.shape[0]
+        shape = (NC, cell2dof0.shape[1], cell2dof1.shape[1])
+        I = np.broadcast_to(cell2dof0[:, :, None], shape=shape)
+        J = np.broadcast_to(cell2dof1[:, None, :], shape=shape)
+
+        # 把 (i, j) 编码成一个整数, 排序去重后就是 CSR 的存储顺序
+        key = I.astype(np.int64)*gdof1 + J
+        key, cell2nnz = np.unique(key.flat, return_inverse=True)
+
+        nnz = len(key)
+        itype = index_type(max(nnz, gdof0, gdof1), np.int32)
+
+        self.shape = (gdof0, gdof1)
+        self.cellshape = shape
+        self.cell2nnz = cell2nnz.reshape(shape).astype(itype)
+        self.indices = (key % gdof1).astype(itype)
+        self.indptr = np.zeros(gdof0+1, dtype=itype)
+        np.cumsum(np.bincount(key//gdof1, minlength=gdof0), out=self.indptr[1:])
+
+    def number_of_nonzeros(self):
+        return len(self.indices)
+
+    def is_compatible(self, cell2dof0, cell2dof1=None):
+        """
+
+        Notes
+        -----
+        判断该组装计划是否可以用于给定的 cell2dof。
+        """
+        cell2dof1 = cell2dof0 if cell2dof1 is None else cell2dof1
+        shape = (cell2dof0.shape[0], cell2dof0.shape[1], cell2dof1.shape[1])
+        return shape == self.cellshape
+
+    def is_pattern_of(self, A):
+        """
+
+        Notes
+        -----
+        判断 csr_matrix A 是否具有该计划的稀疏结构。
+        """
+        if (A.shape != self.shape) or (len(A.data) != self.number_of_nonzeros()):
+            return False
+        def same(a, b): # 同一块内存, scipy 可能会用数组的视图
+            return (a.ctypes.data == b.ctypes.data) and (a.dtype == b.dtype) \
+                    and (a.shape == b.shape) and a.flags.c_contiguous
+        if same(A.indptr, self.indptr) and same(A.indices, self.indices):
+            return True
+        return np.array_equal(A.indptr, self.indptr) and \
+                np.array_equal(A.indices, self.indices)
+
+    def assemble_data(self, M, out=None):
+        """
+
+        Notes
+        -----
+        把单元矩阵 M (NC, ldof0, ldof1) 累加为 CSR 的 `data` 数组, 类型和 M
+        相同。
+
+        如果给定 out, 则直接把结果写到 out 中。
+        """
+        assert M.shape == self.cellshape
+        nnz = self.number_of_nonzeros()
+        if np.iscomplexobj(M):
+            data = np.bincount(self.cell2nnz.flat, weights=M.real.flat, minlength=nnz) \
+                    + 1j*np.bincount(self.cell2nnz.flat, weights=M.imag.flat, minlength=nnz)
+        else:
+            data = np.bincount(self.cell2nnz.flat, weights=M.flat, minlength=nnz)
+        # bincount 总是用双精度累加, 结果和 M 的精度保持一致
+        data = data.astype(M.dtype, copy=False)
+
+        if out is None:
+            return data
+        out[:] = data
+        return out
+
+    def add_data(self, M, data, index=np.s_[:]):
+        """
+
+        Parameters
+        ----------
+        M: numpy.ndarray, 单元 index 上的单元矩阵
+        data: CSR 的 data 数组, 结果直接累加到其中
+        index: 单元编号, 默认为所有单元
+
+        Notes
+        -----
+        把部分单元上的单元矩阵累加到 data 中。
+
+        累加严格按单元的顺序进行, 所以按单元编号顺序分块调用该函数, 得到的结果和一
+        次性调用 assemble_data 的结果逐位相同。
+        """
+        cell2nnz = self.cell2nnz[index].reshape(-1)
+        nnz, local = np.unique(cell2nnz, return_inverse=True)
+        n = len(nnz)
+
+        # 把 data 中已有的值放在最前面, bincount 会按顺序依次累加
+        I = np.concatenate((np.arange(n), local))
+        if np.iscomplexobj(data):
+            val = data[nnz]
+            v = np.bincount(I, weights=np.concatenate((val.real, M.real.reshape(-1))), minlength=n) \
+                    + 1j*np.bincount(I, weights=np.concatenate((val.imag, M.imag.reshape(-1))), minlength=n)
+        else:
+            v = np.bincount(I, weights=np.concatenate((data[nnz], M.reshape(-1))), minlength=n)
+        data[nnz] = v
+        return data
+
+    def scatter_map(self):
+        """
+
+        Notes
+        -----
+        返回每个非零元对应的单元矩阵元素, 存储方式和 CSR 类似: 非零元 i 对应的单元
+        矩阵元素为 M.flat[perm[ptr[i]:ptr[i+1]]], 并且按单元编号排序。
+
+        第一次调用时生成, 之后缓存起来。
+        """
+        if not hasattr(self, 'perm'):
+            cell2nnz = self.cell2nnz.reshape(-1)
+            self.perm = np.argsort(cell2nnz, kind='stable')
+            self.ptr = np.zeros(self.number_of_nonzeros()+1,
+                    dtype=index_type(len(cell2nnz), np.int32))
+            np.cumsum(np.bincount(cell2nnz, minlength=len(self.ptr)-1),
+                    out=self.ptr[1:])
+        return self.perm, self.ptr
+
+    def scatter_data(self, M, data, index=np.s_[:]):
+        """
+
+        Parameters
+        ----------
+        M: numpy.ndarray, 所有单元上的单元矩阵 (NC, ldof0, ldof1)
+        data: CSR 的 data 数组
+        index: 非零元编号的切片, 默认为所有非零元
+
+        Notes
+        -----
+        计算 data[index] 。 不同的 index 之间互不影响, 可以并行计算, 结果和
+        assemble_data 的结果逐位相同。
+        """
+        perm, ptr = self.scatter_map()
+        start, stop, _ = index.indices(self.number_of_nonzeros())
+        if start >= stop:
+            return data
+        n = stop - start
+        I = np.repeat(np.arange(n), np.diff(ptr[start:stop+1]))
+        val = M.reshape(-1)[perm[ptr[start]:ptr[stop]]]
+        if np.iscomplexobj(val):
+            data[start:stop] = np.bincount(I, weights=val.real, minlength=n) \
+                    + 1j*np.bincount(I, weights=val.imag, minlength=n)
+        else:
+            data[start:stop] = np.bincount(I, weights=val, minlength=n)
+        return data
+
+    def matrix(self, data):
+        """
+
+        Notes
+        -----
+        用给定的 `data` 数组和该计划的稀疏结构生成 CSR 矩阵, 不做任何复制。
+        """
+        A = csr_matrix((data, self.indices, self.indptr), shape=self.shape,
+                copy=False)
+        A.has_sorted_indices = True
+        A.has_canonical_format = True
+        return A
+
+    def assemble(self, M, out=None):
+        """
+
+        Parameters
+        ----------
+        M: numpy.ndarray, (NC, ldof0, ldof1) 的单元矩阵
+        out: 由该计划组装得到的 csr_matrix, 默认为 None
+
+        Notes
+        -----
+        组装全局 CSR 矩阵。如果给定 out, 就原地更新 out.data 并返回 out。
+        """
+        if out is not None:
+            self.assemble_data(M, out=out.data)
+            return out
+        return self.matrix(self.assemble_data(M))
+
+    def combine(self, matrices, coefs=None, out=None):
+        """
+
+        Parameters
+        ----------
+        matrices: 由该计划组装得到的 csr_matrix 列表
+        coefs: 组合系数, 默认全为 1
+        out: 由该计划组装得到的 csr_matrix, 默认为 None
+
+        Notes
+        -----
+        计算 sum(coefs[i]*matrices[i])。所有矩阵的稀疏结构相同, 只需要把 data
+        数组加起来。如果给定 out, 就原地更新 out.data 并返回 out 。
+        """
+        if coefs is None:
+            coefs = [1]*len(matrices)
+
+        nnz = self.number_of_nonzeros()
+        dtype = np.result_type(*[A.dtype for A in matrices], *coefs)
+        data = np.zeros(nnz, dtype=dtype)
+        for c, A in zip(coefs, matrices):
+            if not self.is_pattern_of(A):
+                raise ValueError("the sparsity pattern of the matrix is not"
+                        " the one of this assembly plan!")
+            data += c*A.data
+
+        if out is not None:
+            out.data[:] = data
+            return out
+        return self.matrix(data)
+
+    def assemble_block(self, M):
+        """
+
+        Parameters
+        ----------
+        M: numpy.ndarray, (NC, ldof0, ldof1, m, n) 的单元块矩阵
+
+        Notes
+        -----
+        组装向量型问题的 BSR 矩阵, 块的大小为 (m, n)。
+
+        M[c, i, j] 是单元 c 上第 i 个和第 j 个基函数之间的 (m, n) 耦合块, 全局自
+        由度按结点交错编号, 即标量自由度 i 的第 k 个分量的编号为 m*i + k 。BSR
+        的块结构和标量问题的 CSR 结构相同, 直接共享该计划的 `indptr` 和
+        `indices`。
+        """
+        m, n = M.shape[-2:]
+        nnz = self.number_of_nonzeros()
+        data = segment_sum(self.cell2nnz.reshape(-1), M.reshape(-1, m*n), nnz)
+        data = data.astype(M.dtype, copy=False).reshape(nnz, m, n)
+        shape = (self.shape[0]*m, self.shape[1]*n)
+        A = bsr_matrix((data, self.indices, self.indptr), shape=shape,
+                copy=False)
+        A.has_sorted_indices = True
+        return A
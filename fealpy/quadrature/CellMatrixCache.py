@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class CellMatrixCache():
+    """
+
+    Notes
+    -----
+    自适应加密过程中单元矩阵的缓存。
+
+    每一步加密或粗化只改变一小部分单元, 没有改变的单元上的单元矩阵不需要重新计
+    算。缓存中记下每个单元矩阵所在单元的顶点坐标, 网格改变后, 先找到新网格中没有
+    改变的单元 (顶点坐标和顶点顺序都相同) 在旧网格中的编号, 直接复制它们的单元矩
+    阵, 只在新单元上计算单元矩阵。全局矩阵再由所有单元矩阵重新组装。
+
+    网格加密时可以把新单元在旧网格中的编号记在 `mesh.cellmap` 中 (没有改变的单
+    元为旧编号, 新单元为 -1), 见 `TriangleMesh.bisect` 。这里会检查它是否和缓存
+    的网格一致, 不一致时 (如中间有多次加密) 按顶点坐标重新匹配。
+
+    缓存的单元矩阵只依赖于单元的几何形状, 所以系数只能是常数或者笛卡尔坐标的函
+    数。
+
+    Examples
+    --------
+    cache = CellMatrixCache()
+    for i in range(maxit):
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix(cache=cache)
+        ...
+        mesh.bisect(isMarkedCell)
+    """
+    def __init__(self):
+        self.data = {}
+        self.nchanged = 0 # 最近一次重新计算单元矩阵的单元个数
+
+    def clear(self):
+        self.data.clear()
+
+    def cell_matrix(self, mesh, key, fun):
+        """
+
+        Parameters
+        ----------
+        mesh: 当前的网格
+        key: 单元矩阵的标识, 如 ('stiff', p, q, c)
+        fun: fun(index) 计算单元 index 上的单元矩阵
+
+        Returns
+        -------
+        M: 所有单元上的单元矩阵 (NC, ...)
+        """
+        point = cell_points(mesh)
+        NC = len(point)
+        if key in self.data:
+            point0, M0 = self.data[key]
+            cellmap = self.cell_map(mesh, point0, point)
+        else:
+            M0 = None
+            cellmap = -np.ones(NC, dtype=np.int_)
+
+        isNewCell = (cellmap < 0)
+        index, = np.nonzero(isNewCell)
+        if len(index) == NC:
+            M = fun(np.s_[:])
+        else:
+            M = np.empty((NC, ) + M0.shape[1:], dtype=M0.dtype)
+            M[~isNewCell] = M0[cellmap[~isNewCell]]
+            if len(index) > 0:
+                M[index] = fun(index)
+
+        self.data[key] = (point, M)
+        self.nchanged = len(index)
+        return M
+
+    def cell_map(self, mesh, point0, point):
+        """
+
+        Notes
+        -----
+        新网格的每个单元在旧网格中的编号, 新单元为 -1 。
+        """
+        NC = len(point)
+        cellmap = getattr(mesh, 'cellmap', None)
+        if (cellmap is not None) and (len(cellmap) == NC):
+            flag = (cellmap >= 0)
+            if np.all(cellmap < len(point0)) and \
+                    np.array_equal(point[flag], point0[cellmap[flag]]):
+                return cellmap
+        return match_cells(point0, point)
+
+
+def cell_points(mesh):
+    """
+
+    Notes
+    -----
+    每个单元按顺序排列的顶点坐标, 形状为 (NC, NV*GD)。
+    """
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+    NC = len(cell)
+    return np.ascontiguousarray(node[cell].reshape(NC, -1))
+
+
+def match_cells(point0, point1):
+    """
+
+    Notes
+    -----
+    按顶点坐标找到 point1 中的单元在 point0 中的编号, 找不到的为 -1 。
+    """
+    n0 = len(point0)
+    if (n0 == 0) or (point0.shape[1:] != point1.shape[1:]):
+        return -np.ones(len(point1), dtype=np.int_)
+
+    # 把每个单元的坐标看成一个整体, 排序后相同的单元排在一起
+    dtype = np.dtype((np.void, point0.dtype.itemsize*point0.shape[1]))
+    key = np.concatenate((point0, point1), axis=0).view(dtype).reshape(-1)
+    _, inverse = np.unique(key, return_inverse=True)
+    lookup = -np.ones(inverse.max()+1, dtype=np.int_)
+    lookup[inverse[:n0]] = np.arange(n0)
+    return lookup[inverse[n0:]]
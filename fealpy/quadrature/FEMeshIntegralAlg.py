@@ -1,14 +1,76 @@
 import numpy as np
 from scipy.sparse import csr_matrix, coo_matrix
 import multiprocessing as mp
-from multiprocessing.pool import ThreadPool as Pool
+from inspect import signature, Parameter
 from ..decorator import timer
 
+from .AssemblyPlan import AssemblyPlan
+from ..common import scatter_add
+from ..common import einsum
+
+# 并行组装时子进程用到的数据, 在创建子进程前设置, 子进程通过 fork 继承
+_context = {}
+
+def shared_array(shape, dtype):
+    """
+
+    Notes
+    -----
+    在共享内存中创建数组, 通过 fork 创建的子进程可以直接写这个数组。
+    """
+    dtype = np.dtype(dtype)
+    n = int(np.prod(shape))
+    buf = mp.RawArray('b', max(n, 1)*dtype.itemsize)
+    return np.frombuffer(buf, dtype=dtype, count=n).reshape(shape)
+
+def _cell_matrix_task(index):
+    ctx = _context
+    alg = ctx['alg']
+    ctx['M'][index] = alg.chunk_cell_matrix(ctx['b0'], ctx['b1'], ctx['c'],
+            ctx['bcs'], ctx['ws'], index)
+
+def _scatter_task(index):
+    ctx = _context
+    ctx['plan'].scatter_data(ctx['M'], ctx['data'], index=index)
+
+def _cell_integral_task(index):
+    ctx = _context
+    ctx['e'][index] = ctx['fun'](ctx['bcs'], ctx['ws'], index)
+
+def accepts_index(f):
+    """
+
+    Notes
+    -----
+    判断函数 f 是否有 index 参数, 如有限元函数和它的导数。
+    """
+    if isinstance(f, np.ndarray): # 有限元函数 Function
+        return True
+    try:
+        parameters = signature(f).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any((p.name == 'index') or (p.kind == Parameter.VAR_KEYWORD)
+            for p in parameters)
 
 
 class FEMeshIntegralAlg():
-    def __init__(self, mesh, q, cellmeasure=None):
+    def __init__(self, mesh, q, cellmeasure=None, memory=None, ftype=None):
+        """
+
+        Parameters
+        ----------
+        memory: 组装矩阵时允许使用的内存大小, 单位为 GB, 默认为 None 。给定时,
+            serial_construct_matrix 会按这个内存大小分块组装矩阵, 见
+            chunked_construct_matrix 。
+        ftype: 单元矩阵和组装出的矩阵的浮点类型, 默认为 mesh.ftype 。可以取为
+            np.float32, 这时积分权重, 单元测度和系数都转成 float32 计算单元矩阵,
+            组装时的累加仍然用 float64 进行。
+        """
         self.mesh = mesh
+        self.memory = memory
+        self.ftype = mesh.ftype if ftype is None else np.dtype(ftype)
+        self.cellblock = 4096 # 计算单元矩阵时每组的单元个数
         self.integrator = mesh.integrator(q, etype='cell')
 
         self.cellintegrator = self.integrator
@@ -30,93 +92,92 @@ class FEMeshIntegralAlg():
             self.faceintegrator = self.edgeintegrator
 
     @timer
-    def parallel_construct_matrix(self, b0, 
-            b1=None, c=None, q=None):
+    def parallel_construct_matrix(self, b0, b1=None, c=None, q=None,
+            plan=None, out=None, nprocs=None, memory=None, chunksize=None):
         """
 
         Parameters
         ----------
         b0: tuple, 
-            b0[0]: basis function
+            b0[0]: basis function, 需要支持 index 参数
             b0[1]: cell2dof
             b0[2]: number of global dofs
         b1: default is None, just like b0
+        c: 系数, 和 serial_construct_matrix 中的一样
+        plan: AssemblyPlan, default is None
+        out: csr_matrix, default is None
+        nprocs: 进程个数, 默认为 cpu 的个数
+        memory: 每个进程允许使用的内存大小, 单位为 GB, 用于确定每块的单元个数
+        chunksize: 每块的单元个数, 给定时忽略 memory
 
         Notes
         -----
-        
-        把网格中的单元分组，再分组组装相应的矩阵。对于三维大规模问题，如果同时计
-        算所有单元的矩阵，占用内存会过多，效率过低。
+        多进程并行组装矩阵, 分两步进行:
 
+        1. 把单元按编号顺序分块, 各个进程计算自己分到的块上的单元矩阵, 写到共享内
+           存中的 COO 值数组 (NC, ldof0, ldof1) 中, 不同的块互不重叠;
+        2. 把 CSR 的非零元按编号平均分给各个进程, 每个进程把自己负责的非零元对应
+           的单元矩阵元素累加到共享内存中的 CSR `data` 数组中。
 
-        TODO
-        -----
-            1. 给定一个计算机内存的大小和 cpu 的个数，动态决定合理的问题分割策略
-            2. 考虑存在系数的情况
-        """
+        两步都没有写冲突, 也不需要在主进程中合并矩阵。组装结果和
+        serial_construct_matrix 的结果逐位相同。
 
+        这里用 fork 的方式创建子进程, 子进程直接继承网格和基函数, 不需要序列化。
+        在不支持 fork 的平台上或者只有一个进程时, 退化为 chunked_construct_matrix 。
+        """
         mesh = self.mesh
         NC = mesh.number_of_cells()
-        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
-        bcs, ws = qf.get_quadrature_points_and_weights()
+        nprocs = nprocs or mp.cpu_count()
 
-        basis0 = b0[0]
-        cell2dof0 = b0[1]
-        gdof0 = b0[2]
-
-        # 对问题进行分割
-        nc = mp.cpu_count()-2
+        cell2dof0, gdof0 = b0[1], b0[2]
+        cell2dof1, gdof1 = (None, None) if b1 is None else (b1[1], b1[2])
+        if plan is None:
+            plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1)
 
-        block = NC//nc
-        r = NC%nc
-        index = np.full(nc+1, block)
-        index[0] = 0
-        index[1:r+1] += 1
-        np.cumsum(index, out=index)
+        if (nprocs == 1) or ('fork' not in mp.get_all_start_methods()):
+            return self.chunked_construct_matrix(b0, b1=b1, c=c, q=q, plan=plan,
+                    out=out, memory=memory or 1.0, chunksize=chunksize)
 
-        if b1 is None:
-            gdof1 = gdof0
-        else:
-            gdof1 = b1[2]
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
 
-        A = csr_matrix((gdof0, gdof1))
-        def f(i):
-            s = slice(index[i], index[i+1])
-            measure = self.cellmeasure[s]
-            c2d0 = cell2dof0[s]
-            if b1 is None:
-                c2d1 = c2d0
+        if chunksize is None:
+            if memory is None: # 每个进程分 4 块, 平衡负载
+                chunksize = -(-NC//(4*nprocs))
             else:
-                c2d1 = b1[1][s]
+                chunksize = self.cell_chunk_size(b0, b1=b1, q=q, memory=memory)
 
-            shape = (len(measure), c2d0.shape[1], c2d1.shape[1])
-            M = np.zeros(shape, measure.dtype)
-            for bc, w in zip(bcs, ws): # 对所有积分点进行循环
-                phi0 = basis0(bc, index=s)
-                if b1 is None:
-                    phi1 = phi0
-                else:
-                    phi1 = b1[0](bc, index=s)
-                M += np.einsum('jkd, jmd, j->jkm', phi0, phi1, w*measure)
+        if callable(c) and (c.coordtype == 'barycentric') and \
+                (not accepts_index(c)):
+            c = c(bcs) # 没有 index 参数时只能在所有单元上求值
 
-            I = np.broadcast_to(c2d0[:, :, None], shape=M.shape)
-            J = np.broadcast_to(c2d1[:, None, :], shape=M.shape)
+        nnz = plan.number_of_nonzeros()
+        perm, ptr = plan.scatter_map() # 在创建子进程之前生成, 子进程直接继承
 
-            Bi = csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof0, gdof1))
-            return Bi 
+        M = shared_array(plan.cellshape, self.ftype)
+        data = shared_array(nnz, self.ftype)
 
-        # 并行组装总矩阵
-        with Pool(nc) as p:
-            B = p.map(f, range(nc))
+        chunks = self.cell_chunks(chunksize)
+        index = np.linspace(0, nnz, nprocs+1).astype(np.int_)
+        slots = [np.s_[index[i]:index[i+1]] for i in range(nprocs)]
 
-        for val in B:
-            A += val
+        _context.update(alg=self, b0=b0, b1=b1, c=c, bcs=bcs, ws=ws, M=M,
+                data=data, plan=plan)
+        try:
+            with mp.get_context('fork').Pool(nprocs) as pool:
+                pool.map(_cell_matrix_task, chunks)
+                pool.map(_scatter_task, slots)
+        finally:
+            _context.clear()
 
-        return A
+        if out is not None:
+            out.data[:] = data
+            return out
+        return plan.matrix(data)
 
     @timer
     def serial_construct_matrix(self, b0, 
-            b1=None, c=None, q=None):
+            b1=None, c=None, q=None, plan=None, out=None):
         """
 
         Parameters
@@ -126,6 +187,10 @@ class FEMeshIntegralAlg():
             b0[1]: cell2dof
             b0[2]: number of global dofs
         b1: default is None, just like b0
+        plan: AssemblyPlan, default is None
+            预先计算好的稀疏结构, 给定时跳过 COO 到 CSR 的转换
+        out: csr_matrix, default is None
+            由 plan 组装得到的矩阵, 给定时原地更新它的 data
 
         Notes
         -----
@@ -135,6 +200,10 @@ class FEMeshIntegralAlg():
         cell2dof0 = b0[1]
         gdof0 = b0[2]
 
+        if (self.memory is not None) and (cell2dof0 is not None):
+            return self.chunked_construct_matrix(b0, b1=b1, c=c, q=q,
+                    plan=plan, out=out, memory=self.memory)
+
         mesh = self.mesh
         qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
         bcs, ws = qf.get_quadrature_points_and_weights()
@@ -145,11 +214,6 @@ class FEMeshIntegralAlg():
         elif basis0.coordtype == 'cartesian':
             phi0 = basis0(ps)
 
-        if len(phi0.shape) == 3:
-            GD = 1
-        else:
-            GD = phi0.shape[3]
-
         if b1 is not None:
             if b1[0].coordtype == 'barycentric':
                 phi1 = b1[0](bcs) # (NQ, NC, ldof, ...)
@@ -158,43 +222,67 @@ class FEMeshIntegralAlg():
         else:
             phi1 = phi0
 
-        if c is None:
-            M = np.einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
-                    self.cellmeasure, optimize=True)
-        else: 
-            if callable(c):
-                if c.coordtype == 'barycentric':
-                    c = c(bcs)
-                elif c.coordtype == 'cartesian':
-                    c = c(ps)
+        if callable(c):
+            if c.coordtype == 'barycentric':
+                c = c(bcs)
+            elif c.coordtype == 'cartesian':
+                c = c(ps)
 
-            if isinstance(c, (int, float)):
-                M = np.einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
-                        self.cellmeasure, optimize=True)
-            elif isinstance(c, np.ndarray): 
-                if c.shape == (GD, GD): # constant diffusion coefficient
-                    phi0 = np.einsum('mn, ijkn->ijkm', c, phi0)
-                    M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif c.shape == (GD, ): # constant convection coefficient
-                    phi0 = np.einsum('m, ijkm->ijk', c, phi0)
-                    M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 2: # (NQ, NC)
-                    M = np.einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 3: # (NQ, NC, GD)
-                    phi0 = np.einsum('ijm, ijkm->ijk', c, phi0)
-                    M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 4: # (NQ, NC, GD, GD)
-                    phi0 = np.einsum('ijmn, ijkn->ijkm', c, phi0)
-                    M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
+        M = self.cell_matrix(ws, phi0, phi1, c, self.cellmeasure)
+        return self.assemble_matrix(M, b0, b1=b1, plan=plan, out=out)
+
+    @timer
+    def incremental_construct_matrix(self, b0, b1=None, c=None, q=None,
+            plan=None, cache=None, key=None):
+        """
+
+        Parameters
+        ----------
+        cache: CellMatrixCache, 缓存上一次组装时的单元矩阵
+        key: 单元矩阵在 cache 中的标识
+
+        Notes
+        -----
+        网格加密或粗化后重新组装矩阵, 只在新单元上计算单元矩阵, 其它参数和
+        serial_construct_matrix 一样。
+
+        系数 c 只能是常数, 常数矩阵或者笛卡尔坐标的函数。
+        """
+        if callable(c) and (c.coordtype == 'barycentric'):
+            raise ValueError("the cached cell matrices can not depend on a"
+                    " barycentric coefficient!")
+        GD = self.mesh.geo_dimension()
+        if isinstance(c, np.ndarray) and (c.shape not in {(GD, GD), (GD, )}):
+            raise ValueError("the cached cell matrices can not depend on a"
+                    " coefficient given on the cells!")
+
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        def fun(index):
+            return self.chunk_cell_matrix(b0, b1, c, bcs, ws, index)
+
+        M = cache.cell_matrix(mesh, key, fun)
+        return self.assemble_matrix(M, b0, b1=b1, plan=plan)
+
+    def assemble_matrix(self, M, b0, b1=None, plan=None, out=None):
+        """
+
+        Notes
+        -----
+        把单元矩阵 M 组装成全局矩阵, 参数和 serial_construct_matrix 一样。
+        b0[1] 为 None 时直接返回单元矩阵。
+        """
+        cell2dof0 = b0[1]
+        gdof0 = b0[2]
 
         if cell2dof0 is None: # 仅组装单元矩阵 
             return M
 
+        if plan is not None:
+            return plan.assemble(M, out=out)
+
         if b1 is None:
             gdof1 = gdof0
             cell2dof1 = cell2dof0
@@ -208,6 +296,312 @@ class FEMeshIntegralAlg():
         M = csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof0, gdof1))
         return M
 
+    def serial_construct_matrices(self, forms, q=None, plan=None):
+        """
+
+        Parameters
+        ----------
+        forms: list, 每个元素为一个双线性型 (b0, b1, c), 含义和
+            serial_construct_matrix 的参数一样
+        plan: AssemblyPlan, default is None
+            所有矩阵共用的稀疏结构。为 None 时, 如果所有双线性型的 cell2dof 都
+            相同, 就生成一个临时的组装计划。
+
+        Notes
+        -----
+        一次组装多个矩阵, 积分点, 基函数和基函数梯度的值只计算一次。
+
+        用同一个组装计划组装出的矩阵有相同的稀疏结构, 它们的线性组合 (如
+        M + dt*A) 可以用 AssemblyPlan.combine 直接对 data 数组做加法。
+        """
+        if self.memory is not None:
+            return [self.chunked_construct_matrix(b0, b1=b1, c=c, q=q,
+                plan=plan, memory=self.memory) for b0, b1, c in forms]
+
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        ps = mesh.bc_to_point(bcs)
+
+        phis = {} # 已经计算过的基函数值
+        def value(basis):
+            if basis not in phis:
+                if basis.coordtype == 'barycentric':
+                    phis[basis] = basis(bcs)
+                elif basis.coordtype == 'cartesian':
+                    phis[basis] = basis(ps)
+            return phis[basis]
+
+        if plan is None:
+            c2d = [(b0[1], b0[1] if b1 is None else b1[1]) for b0, b1, _ in forms]
+            if all(b0[1] is not None for b0, _, _ in forms) and \
+                    all((a is c2d[0][0]) and (b is c2d[0][1]) for a, b in c2d):
+                b0, b1, _ = forms[0]
+                if b1 is None:
+                    plan = AssemblyPlan(b0[1], b0[2])
+                else:
+                    plan = AssemblyPlan(b0[1], b0[2], b1[1], b1[2])
+
+        As = []
+        for b0, b1, c in forms:
+            phi0 = value(b0[0])
+            phi1 = phi0 if b1 is None else value(b1[0])
+
+            if callable(c):
+                if c.coordtype == 'barycentric':
+                    c = c(bcs)
+                elif c.coordtype == 'cartesian':
+                    c = c(ps)
+
+            M = self.cell_matrix(ws, phi0, phi1, c, self.cellmeasure)
+            As.append(self.assemble_matrix(M, b0, b1=b1, plan=plan))
+        return As
+
+    def cell_matrix(self, ws, phi0, phi1, c, cellmeasure):
+        """
+
+        Parameters
+        ----------
+        ws: (NQ, ) 积分权重
+        phi0: (NQ, NC, ldof0, ...) 基函数在积分点处的值
+        phi1: (NQ, NC, ldof1, ...) 基函数在积分点处的值
+        c: 系数, 已经在积分点处求值, 可以为 None
+        cellmeasure: (NC, ) 单元的测度
+
+        Notes
+        -----
+        计算单元矩阵。
+
+        单元按编号每 self.cellblock 个分成一组, 逐组计算。每组的输入都是同样形状的
+        连续数组, einsum 的缩并路径和求和顺序只和组的大小有关, 所以只要分块的边界
+        和组的边界对齐, 分块计算的结果就和一次性计算的结果逐位相同。
+        """
+        NC = len(cellmeasure)
+        B = self.cellblock
+
+        # 按 self.ftype 的精度计算单元矩阵
+        ws = ws.astype(self.ftype, copy=False)
+        cellmeasure = cellmeasure.astype(self.ftype, copy=False)
+        if isinstance(c, np.ndarray) and (c.dtype.kind == 'f'):
+            c = c.astype(self.ftype, copy=False)
+
+        if len(phi0.shape) == 3:
+            GD = 1
+        else:
+            GD = phi0.shape[3]
+
+        # 和单元相关的系数
+        isCellCoef = isinstance(c, np.ndarray) and (c.shape not in {(GD, GD), (GD, )})
+        def block(a, index, flag=True):
+            if flag and (NC > 1) and (a.shape[1] == NC):
+                return np.ascontiguousarray(a[:, index])
+            else:
+                return a
+
+        M = None
+        for start in range(0, NC, B):
+            index = np.s_[start:start+B]
+            val = self.block_cell_matrix(ws, block(phi0, index),
+                    block(phi1, index), block(c, index, flag=isCellCoef),
+                    cellmeasure[index])
+            if M is None:
+                M = np.empty((NC, ) + val.shape[1:], dtype=val.dtype)
+            M[index] = val
+        return M
+
+    def block_cell_matrix(self, ws, phi0, phi1, c, cellmeasure):
+        """
+
+        Notes
+        -----
+        计算一组单元上的单元矩阵, 参数和 cell_matrix 一样。
+        """
+        if len(phi0.shape) == 3:
+            GD = 1
+        else:
+            GD = phi0.shape[3]
+
+        if c is None:
+            M = einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
+                    cellmeasure)
+        elif isinstance(c, (int, float)):
+            M = einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
+                    cellmeasure)
+        elif isinstance(c, np.ndarray): 
+            if c.shape == (GD, GD): # constant diffusion coefficient
+                phi0 = np.einsum('mn, ijkn->ijkm', c, phi0)
+                M = einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
+                        cellmeasure)
+            elif c.shape == (GD, ): # constant convection coefficient
+                phi0 = np.einsum('m, ijkm->ijk', c, phi0)
+                M = einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
+                        cellmeasure)
+            elif len(c.shape) == 2: # (NQ, NC)
+                M = einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
+                        cellmeasure)
+            elif len(c.shape) == 3: # (NQ, NC, GD)
+                phi0 = np.einsum('ijm, ijkm->ijk', c, phi0)
+                M = einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
+                        cellmeasure)
+            elif len(c.shape) == 4: # (NQ, NC, GD, GD)
+                phi0 = np.einsum('ijmn, ijkn->ijkm', c, phi0)
+                M = einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
+                        cellmeasure)
+        return M
+
+    def chunk_cell_matrix(self, b0, b1, c, bcs, ws, index):
+        """
+
+        Notes
+        -----
+        计算单元 index 上的单元矩阵, index 为单元编号的切片或者编号数组。
+
+        重心坐标形式的系数函数 c 需要有 index 参数, 这时只在这一块单元上求值。
+        没有 index 参数的重心坐标函数要在调用前先在所有单元上求值。
+        """
+        mesh = self.mesh
+        basis0 = b0[0]
+        basis1 = None if b1 is None else b1[0]
+
+        ps = mesh.bc_to_point(bcs, index=index)
+        if basis0.coordtype == 'barycentric':
+            phi0 = basis0(bcs, index=index)
+        elif basis0.coordtype == 'cartesian':
+            phi0 = basis0(ps, index=index)
+
+        if basis1 is None:
+            phi1 = phi0
+        elif basis1.coordtype == 'barycentric':
+            phi1 = basis1(bcs, index=index)
+        elif basis1.coordtype == 'cartesian':
+            phi1 = basis1(ps, index=index)
+
+        GD = 1 if len(phi0.shape) == 3 else phi0.shape[3]
+        if callable(c):
+            if c.coordtype == 'barycentric':
+                c = c(bcs, index=index)
+            elif c.coordtype == 'cartesian':
+                c = c(ps)
+        elif isinstance(c, np.ndarray) and (c.shape not in {(GD, GD), (GD, )}):
+            c = c[:, index] # 和单元相关的系数
+
+        M = self.cell_matrix(ws, phi0, phi1, c, self.cellmeasure[index])
+        return M
+
+    def cell_chunks(self, chunksize):
+        """
+
+        Notes
+        -----
+        把单元按编号顺序分块, 每块的单元个数不超过 chunksize 。
+
+        chunksize 不小于 self.cellblock 时, 把它取为 self.cellblock 的整数倍,
+        这样分块的边界和 cell_matrix 中单元分组的边界对齐, 分块计算的结果和一次
+        性计算的结果逐位相同。chunksize 更小时直接按它分块, 以满足调用者给定的
+        内存限制, 这时结果只相差舍入误差。
+        """
+        NC = self.mesh.number_of_cells()
+        B = self.cellblock
+        if chunksize >= B:
+            chunksize = chunksize//B*B
+        return [np.s_[i:i+chunksize] for i in range(0, NC, chunksize)]
+
+    def cell_chunk_size(self, b0, b1=None, q=None, memory=1.0):
+        """
+
+        Parameters
+        ----------
+        memory: 分块组装时允许使用的内存大小, 单位为 GB
+
+        Notes
+        -----
+        根据给定的内存大小估计每块可以处理的单元个数。这里只统计和单元个数成正比
+        的临时数组, 包括积分点, 基函数值, 系数和单元矩阵, 并留出 einsum 中间结果
+        的空间。
+        """
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        index = np.s_[0:2]
+        ps = mesh.bc_to_point(bcs, index=index)
+        nbytes = 2*(ps.nbytes//2) # 积分点和笛卡尔坐标系下的系数
+        shape = []
+        for b in (b0, b1):
+            if b is None:
+                continue
+            if b[0].coordtype == 'barycentric':
+                phi = b[0](bcs, index=index)
+            elif b[0].coordtype == 'cartesian':
+                phi = b[0](ps, index=index)
+            if phi.shape[1] > 1: # 在单元上广播的基函数不占用额外的内存
+                nbytes += 3*phi.nbytes//phi.shape[1]
+            shape.append(phi.shape[2])
+        if len(shape) == 1:
+            shape *= 2
+        nbytes += 3*shape[0]*shape[1]*np.dtype(self.ftype).itemsize
+
+        return max(int(memory*2**30)//nbytes, 2)
+
+    @timer
+    def chunked_construct_matrix(self, b0, b1=None, c=None, q=None,
+            plan=None, out=None, memory=1.0, chunksize=None):
+        """
+
+        Parameters
+        ----------
+        b0: tuple, 
+            b0[0]: basis function, 需要支持 index 参数
+            b0[1]: cell2dof
+            b0[2]: number of global dofs
+        b1: default is None, just like b0
+        plan: AssemblyPlan, default is None
+        out: csr_matrix, default is None
+        memory: 分块组装时允许使用的内存大小, 单位为 GB
+        chunksize: 每块的单元个数, 给定时忽略 memory
+
+        Notes
+        -----
+        分块组装矩阵。按单元编号顺序把单元分块, 每次只计算一块单元上的基函数值和
+        单元矩阵, 并把它直接累加到全局 CSR 矩阵的 data 中, 避免一次性生成形状为
+        (NQ, NC, ldof, GD) 的数组。
+
+        chunksize 不小于 self.cellblock 时, 组装结果和 serial_construct_matrix
+        的结果逐位相同, 见 cell_chunks 。
+
+        重心坐标形式的系数函数 c 如果有 index 参数 (如有限元函数), 就在每一块
+        上分别求值, 否则只能在所有单元上一次求值, 再按块取出。
+        """
+        cell2dof0, gdof0 = b0[1], b0[2]
+        cell2dof1, gdof1 = (None, None) if b1 is None else (b1[1], b1[2])
+
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        if plan is None:
+            plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1)
+
+        if chunksize is None:
+            chunksize = self.cell_chunk_size(b0, b1=b1, q=q, memory=memory)
+
+        if callable(c) and (c.coordtype == 'barycentric') and \
+                (not accepts_index(c)):
+            c = c(bcs) # 没有 index 参数时只能在所有单元上求值
+
+        # 用 float64 累加, 最后再转成 self.ftype
+        dtype = np.promote_types(self.ftype, np.float64)
+        data = np.zeros(plan.number_of_nonzeros(), dtype=dtype)
+        for index in self.cell_chunks(chunksize):
+            M = self.chunk_cell_matrix(b0, b1, c, bcs, ws, index)
+            plan.add_data(M, data, index=index)
+        data = data.astype(self.ftype, copy=False)
+
+        if out is not None:
+            out.data[:] = data
+            return out
+        return plan.matrix(data)
+
     @timer
     def serial_construct_vector(self, f, b, celltype=False, q=None):
         """
@@ -251,24 +645,24 @@ class FEMeshIntegralAlg():
             # f 是标量函数 (NQ, NC)，基是标量函数 (NQ, NC, ldof)
             # f 是向量函数 (NQ, NC, GD)， 基是向量函数 (NQ, NC, ldof, GD)
             if len(val.shape) == 2: #TODO: einsum have bug for ...?
-                bb = np.einsum('i, ij, ijk, j->jk', ws, val, phi, self.cellmeasure)
+                bb = einsum('i, ij, ijk, j->jk', ws, val, phi, self.cellmeasure)
             else:
-                bb = np.einsum('i, ijn, ijkn, j->jk', ws, val, phi, self.cellmeasure)
+                bb = einsum('i, ijn, ijkn, j->jk', ws, val, phi, self.cellmeasure)
 
             if celltype:
                 return bb
             shape = (gdof, )
             F = np.zeros(shape, dtype=mesh.ftype)
-            np.add.at(F, cell2dof, bb)
+            scatter_add(F, cell2dof, bb)
             return F 
         elif len(val.shape) == len(phi.shape): 
             # f 是向量函数 (NQ, NC, GD)， 基是标量函数 (NQ, NC, ldof)
-            bb = np.einsum('i, ijn, ijk, j->jkn', ws, val, phi, self.cellmeasure)
+            bb = einsum('i, ijn, ijk, j->jkn', ws, val, phi, self.cellmeasure)
             if celltype:
                 return bb
             shape = (gdof, GD)
             F = np.zeros(shape, dtype=mesh.ftype)
-            np.add.at(F, (cell2dof, np.s_[:]), bb)
+            scatter_add(F, (cell2dof, np.s_[:]), bb)
             return F
         else:
             print('Warning!, we can not deal with this f function!')
@@ -312,12 +706,12 @@ class FEMeshIntegralAlg():
             phi1 = phi0
 
         if c is None:
-            M = np.einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
-                    self.cellmeasure, optimize=True)
+            M = einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
+                    self.cellmeasure)
         else: # TODO: make here work
             if isinstance(c, (int, float)):
-                M = np.einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
-                        self.cellmeasure, optimize=True)
+                M = einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
+                        self.cellmeasure)
             elif callable(c):
                 if c.coordtype == 'barycentric':
                     c = c(bcs)
@@ -325,19 +719,19 @@ class FEMeshIntegralAlg():
                     c = c(ps)
 
                 if isinstance(c, (int, float)):
-                    M = np.einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
+                    M = einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
+                            self.cellmeasure)
                 elif isinstance(c, np.ndarray):
                     # user should make `c` have the correct shape
                     if len(c.shape) == 2:
-                        M = np.einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
-                                self.cellmeasure, optimize=True)
+                        M = einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
+                                self.cellmeasure)
                     elif len(c.shape) == 3:
-                        M = np.einsum('i, ijk..., ijk..., ijm..., j->jkm', ws, c[:, :, None, :], phi0, phi1,
-                                self.cellmeasure, optimize=True)
+                        M = einsum('i, ijk..., ijk..., ijm..., j->jkm', ws, c[:, :, None, :], phi0, phi1,
+                                self.cellmeasure)
                     elif len(c.shape) == 4:
-                        M = np.einsum('i, ijkab, ijkb, ijma, j->jkm', ws, c[:, :, None, :, :], phi0, phi1,
-                                self.cellmeasure, optimize=True)
+                        M = einsum('i, ijkab, ijkb, ijma, j->jkm', ws, c[:, :, None, :, :], phi0, phi1,
+                                self.cellmeasure)
 
         if cell2dof0 is None: # just construct cell matrix
             return M
@@ -384,12 +778,12 @@ class FEMeshIntegralAlg():
             val = f
 
         #TODO: consider more case
-        bb = np.einsum('i, ij, ijk, j->jk', ws, val, phi, self.cellmeasure)
+        bb = einsum('i, ij, ijk, j->jk', ws, val, phi, self.cellmeasure)
 
         gdof = gdof or cell2dof.max()
         shape = (gdof, )
         b = np.zeros(shape, dtype=phi.dtype)
-        np.add.at(b, cell2dof, bb)
+        scatter_add(b, cell2dof, bb)
         return b
 
     def construct_vector_v_v(self, f, basis, cell2dof, gdof=None, q=None):
@@ -420,11 +814,11 @@ class FEMeshIntegralAlg():
         elif isinstance(f, np.ndarray):
             val = f[None, None, :]
 
-        bb = np.einsum('i, ijm, ijkm, j->jk', ws, val, phi, self.cellmeasure)
+        bb = einsum('i, ijm, ijkm, j->jk', ws, val, phi, self.cellmeasure)
 
         gdof = gdof or cell2dof.max()
         b = np.zeros(gdof, dtype=phi.dtype)
-        np.add.at(b, cell2dof, bb)
+        scatter_add(b, cell2dof, bb)
         return b
 
     def construct_vector_v_s(self, f, basis, cell2dof, gdof=None, q=None):
@@ -450,16 +844,16 @@ class FEMeshIntegralAlg():
                 val = f(bcs)
             elif f.coordtype == 'cartesian':
                 val = f(ps)
-            bb = np.einsum('i, ij, ijk, j->jk',
+            bb = einsum('i, ij, ijk, j->jk',
                     ws, val, phi, self.cellmeasure)
         elif isinstance(f, (int, float)):
-            bb = np.einsum('m, mik, i->ik',
+            bb = einsum('m, mik, i->ik',
                     f*ws, phi, self.cellmeasure)
 
         gdof = gdof or cell2dof.max()
         shape = (gdof, val.shape[-1])
         b = np.zeros(shape, dtype=phi.dtype)
-        np.add.at(b, (cell2dof, np.s_[:]), bb)
+        scatter_add(b, (cell2dof, np.s_[:]), bb)
 
         return b
 
@@ -531,41 +925,189 @@ class FEMeshIntegralAlg():
                 e = np.einsum(s1, ws, f, self.facemeasure)
         return e
 
-    def cell_integral(self, f, q=None, power=None):
+    def cell_integral(self, f, q=None, power=None, chunksize=None,
+            memory=None, nprocs=None):
         """
 
+        Parameters
+        ----------
+        chunksize, memory, nprocs: 分块和并行计算的参数, 见 error
+
         Notes
         -----
         在网格的每个单元上积分函数 f。 
         """
+        def fun(bcs, ws, index):
+            ps = self.cell_points(bcs, index)
+            val = self.cell_values(f, bcs, ps, index)
+            if power is not None:
+                val = np.power(val, power) 
+            return self.cell_quadrature(val, ws, index)
+
+        if (chunksize is None) and (memory is None) and (nprocs is None):
+            mesh = self.mesh
+            qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+            bcs, ws = qf.get_quadrature_points_and_weights()
+            return fun(bcs, ws, np.s_[:])
+
+        if (memory is not None) and (chunksize is None):
+            chunksize = self.value_chunk_size([f], q=q, memory=memory)
+        return self.chunked_cell_integral(fun, q=q, chunksize=chunksize,
+                nprocs=nprocs)
+
+    def cell_points(self, bcs, index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        单元 index 上的积分点的笛卡尔坐标。
+        """
         mesh = self.mesh
-        GD = mesh.geo_dimension()
+        if isinstance(index, slice) and (index == np.s_[:]):
+            return mesh.bc_to_point(bcs, etype='cell')
+        return mesh.bc_to_point(bcs, index=index)
 
-        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
-        bcs, ws = qf.get_quadrature_points_and_weights()
+    def cell_values(self, f, bcs, ps, index=np.s_[:], coordtype=None):
+        """
 
-        if callable(f):
-            if f.coordtype == 'cartesian':
-                ps = mesh.bc_to_point(bcs, etype='cell')
-                f = f(ps)
-            elif f.coordtype == 'barycentric':
-                f = f(bcs)
+        Parameters
+        ----------
+        f: 函数, 或者积分点上的值, 常数, 常向量和常矩阵
+        bcs, ps: 积分点的重心坐标和单元 index 上的笛卡尔坐标
+        coordtype: 没有 coordtype 属性的函数的坐标类型
+
+        Notes
+        -----
+        f 在单元 index 的积分点上的值。
 
-        if power is not None:
-            f = np.power(f, power) 
+        分块计算时, 有 index 参数的函数 (如有限元函数和它的梯度) 只在这一块单元
+        上求值。没有 index 参数的重心坐标函数只能在所有单元上求值后再按块取出。
+        """
+        if isinstance(index, slice) and (index == np.s_[:]):
+            index = None
+
+        if callable(f):
+            if coordtype is None:
+                coordtype = f.coordtype
+            else:
+                coordtype = getattr(f, 'coordtype', coordtype)
+
+            x = bcs if coordtype == 'barycentric' else ps
+            if index is None:
+                return f(x)
+            if accepts_index(f):
+                return f(x, index=index)
+            if coordtype == 'cartesian':
+                return f(x)
+            f = f(x) # 在所有单元上求值
+
+        if (index is not None) and isinstance(f, np.ndarray):
+            GD = self.mesh.geo_dimension()
+            if f.shape not in {(GD, ), (GD, GD)}:
+                dim = len(bcs) if isinstance(bcs, tuple) else 1
+                f = f[(np.s_[:], )*dim + (index, )]
+        return f
+
+    def cell_quadrature(self, f, ws, index=np.s_[:]):
+        """
 
+        Notes
+        -----
+        由积分点上的值 f 计算单元 index 上的积分。
+        """
+        GD = self.mesh.geo_dimension()
+        measure = self.cellmeasure[index]
         dim = len(ws.shape) # 张量型积分公式
         if isinstance(f, (int, float)): # f为标量常函数
-            e = f*self.cellmeasure
+            e = f*measure
         elif isinstance(f, np.ndarray):
             if f.shape == (GD, ): # 常向量函数
-                e = self.cellmeasure[:, None]*f
+                e = measure[:, None]*f
             elif f.shape == (GD, GD):
-                e = self.cellmeasure[:, None, None]*f
+                e = measure[:, None, None]*f
             else:
                 s0 = 'abcde'
                 s1 = '{}, {}j..., j->j...'.format(s0[0:dim], s0[0:dim])
-                e = np.einsum(s1, ws, f, self.cellmeasure)
+                e = einsum(s1, ws, f, measure)
+        return e
+
+    def value_chunk_size(self, fs, q=None, memory=1.0, coordtype=None):
+        """
+
+        Parameters
+        ----------
+        fs: 被积函数的列表
+        memory: 允许使用的内存大小, 单位为 GB
+
+        Notes
+        -----
+        根据给定的内存大小估计分块积分时每块的单元个数。这里统计每个函数在一个
+        单元的积分点上的值, 并留出差, 幂和 einsum 中间结果的空间。
+        """
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        index = np.s_[0:2]
+        ps = self.cell_points(bcs, index)
+        nbytes = ps.nbytes//2
+        coordtype = coordtype or (None, )*len(fs)
+        for f, ctype in zip(fs, coordtype):
+            val = self.cell_values(f, bcs, ps, index, coordtype=ctype)
+            if isinstance(val, np.ndarray):
+                nbytes += 3*max(val.nbytes, ps.nbytes)//2
+        return max(int(memory*2**30)//nbytes, 2)
+
+    def chunked_cell_integral(self, fun, q=None, chunksize=None, nprocs=None):
+        """
+
+        Parameters
+        ----------
+        fun: fun(bcs, ws, index) 返回单元 index 上的积分, 形状为 (n, ...)
+        chunksize: 每块的单元个数, 默认每个进程分 4 块
+        nprocs: 进程个数, 默认为 1
+
+        Notes
+        -----
+        按单元编号顺序把单元分块, 逐块计算每个单元上的积分, 临时数组的大小和块
+        的大小成正比, 和单元个数无关。
+
+        nprocs > 1 时各个进程分别计算不同的块, 结果写到共享内存中的数组里, 子进程
+        通过 fork 继承网格和函数。在不支持 fork 的平台上退化为串行计算。
+        """
+        mesh = self.mesh
+        NC = mesh.number_of_cells()
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        nprocs = nprocs or 1
+        if chunksize is None:
+            chunksize = -(-NC//(4*nprocs))
+        chunks = self.cell_chunks(chunksize)
+
+        e0 = fun(bcs, ws, chunks[0])
+        if len(chunks) == 1:
+            return e0
+
+        parallel = (nprocs > 1) and ('fork' in mp.get_all_start_methods())
+        shape = (NC, ) + e0.shape[1:]
+        if parallel:
+            e = shared_array(shape, e0.dtype)
+        else:
+            e = np.empty(shape, dtype=e0.dtype)
+        e[chunks[0]] = e0
+
+        if parallel:
+            _context.update(fun=fun, bcs=bcs, ws=ws, e=e)
+            try:
+                with mp.get_context('fork').Pool(nprocs) as pool:
+                    pool.map(_cell_integral_task, chunks[1:])
+            finally:
+                _context.clear()
+            e = np.array(e)
+        else:
+            for index in chunks[1:]:
+                e[index] = fun(bcs, ws, index)
         return e
 
     def mesh_integral(self, u, etype='cell', q=None):
@@ -584,57 +1126,61 @@ class FEMeshIntegralAlg():
 
         return e
 
-    def error(self, u, v, power=2, celltype=False, q=None):
+    def error(self, u, v, power=2, celltype=False, q=None, chunksize=None,
+            memory=None, nprocs=None, coordtype=None, componentwise=False):
         """
 
+        Parameters
+        ----------
+        componentwise: celltype 为 True 时, 向量或张量值的函数是否保留每个
+            分量在每个单元上的误差 (NC, ...), 默认把各分量加起来得到 (NC, )
+        chunksize: 每块的单元个数
+        memory: 允许使用的内存大小, 单位为 GB, 用于确定每块的单元个数
+        nprocs: 进程个数
+        coordtype: 没有 coordtype 属性的函数 u, v 的坐标类型, 如
+            ('cartesian', 'barycentric')
+
         Notes
         -----
         给定两个函数，计算两个函数的之间的差，默认计算 L2 差（power=2)
 
         power 的取值可以是任意的 p。
 
+        给定 chunksize, memory 或 nprocs 时按单元分块计算每个单元上的误差, 每次只
+        在一块单元上对 u 和 v 求值, 用于很大的网格和向量, 张量值的函数 (如梯度),
+        见 chunked_cell_integral 。
+
         TODO
         ----
         1. 考虑无穷范数的情形
         """
-        mesh = self.mesh
-        GD = mesh.geo_dimension()
-
-        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
-        bcs, ws = qf.get_quadrature_points_and_weights()
-        ps = mesh.bc_to_point(bcs, etype='cell')
-
-        if callable(u):
-            if u.coordtype == 'cartesian':
-                u = u(ps)
-            elif u.coordtype == 'barycentric':
-                u = u(bcs)
-
-        if callable(v):
-            if v.coordtype == 'cartesian':
-                v = v(ps)
-            elif v.coordtype == 'barycentric':
-                v = v(bcs)
-
-        f = np.power(np.abs(u - v), power) 
-
-        dim = len(ws.shape) # dim > 1, 表示是张量型积分公式
-        if isinstance(f, (int, float)): # f为标量常函数
-            e = f*self.cellmeasure
-        elif isinstance(f, np.ndarray):
-            if f.shape == (GD, ): # 常向量函数
-                e = self.cellmeasure[:, None]*f
-            elif f.shape == (GD, GD):
-                e = self.cellmeasure[:, None, None]*f
-            else:
-                s0 = 'abcde'
-                s1 = '{}, {}j..., j->j...'.format(s0[0:dim], s0[0:dim])
-                e = np.einsum(s1, ws, f, self.cellmeasure)
+        coordtype = coordtype or (None, None)
+        def fun(bcs, ws, index):
+            ps = self.cell_points(bcs, index)
+            u0 = self.cell_values(u, bcs, ps, index, coordtype=coordtype[0])
+            v0 = self.cell_values(v, bcs, ps, index, coordtype=coordtype[1])
+            f = np.power(np.abs(u0 - v0), power) 
+            e = self.cell_quadrature(f, ws, index)
+            if componentwise and celltype:
+                return e
+            return np.sum(e.reshape(len(e), -1), axis=-1)
+
+        if (chunksize is None) and (memory is None) and (nprocs is None):
+            mesh = self.mesh
+            qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+            bcs, ws = qf.get_quadrature_points_and_weights()
+            e = fun(bcs, ws, np.s_[:])
+        else:
+            if (memory is not None) and (chunksize is None):
+                chunksize = self.value_chunk_size([u, v], q=q, memory=memory,
+                        coordtype=coordtype)
+            e = self.chunked_cell_integral(fun, q=q, chunksize=chunksize,
+                    nprocs=nprocs)
 
         if celltype == False:
             e = np.power(np.sum(e), 1/power)
         else:
-            e = np.power(np.sum(e, axis=tuple(range(1, len(e.shape)))), 1/power)
+            e = np.power(e, 1/power)
         return e
 
 # old api 
@@ -677,27 +1223,21 @@ class FEMeshIntegralAlg():
         else:
             return np.sqrt(e)
 
-    def L1_error(self, u, uh, celltype=False):
-        def f(x):
-            xx = self.mesh.bc_to_point(x)
-            return np.abs(u(xx) - uh(x))
-        e = self.integral(f, celltype=celltype)
-        if celltype is False:
-            return e.sum()
-        else:
-            return e
-        return
+    def L1_error(self, u, uh, celltype=False, **kwargs):
+        return self.error(u, uh, power=1, celltype=celltype,
+                coordtype=('cartesian', 'barycentric'), componentwise=True,
+                **kwargs)
 
-    def L2_error(self, u, uh, celltype=False):
-        def f(bc):
-            xx = self.mesh.bc_to_point(bc)
-            return (u(xx) - uh(bc))**2
-        e = self.integral(f, celltype=celltype)
-        if celltype is False:
-            return np.sqrt(e.sum())
-        else:
-            return np.sqrt(e)
-        return 
+    def L2_error(self, u, uh, celltype=False, **kwargs):
+        """
+
+        Notes
+        -----
+        kwargs 为分块和并行计算的参数 chunksize, memory 和 nprocs, 见 error 。
+        """
+        return self.error(u, uh, power=2, celltype=celltype,
+                coordtype=('cartesian', 'barycentric'), componentwise=True,
+                **kwargs)
 
     def L2_error_uI_uh(self, uI, uh, celltype=False):
         def f(x):
@@ -709,13 +1249,7 @@ class FEMeshIntegralAlg():
             return np.sqrt(e)
         return 
 
-    def Lp_error(self, u, uh, p, celltype=False):
-        def f(x):
-            xx = self.mesh.bc_to_point(x)
-            return np.abs(u(xx) - uh(x))**p
-        e = self.integral(f, celltype=celltype)
-        if celltype is False:
-            return e.sum()**(1/p)
-        else:
-            return e**(1/p)
-        return 
+    def Lp_error(self, u, uh, p, celltype=False, **kwargs):
+        return self.error(u, uh, power=p, celltype=celltype,
+                coordtype=('cartesian', 'barycentric'), componentwise=True,
+                **kwargs)
@@ -0,0 +1,256 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .GaussLegendreQuadrature import GaussLegendreQuadrature
+from ..common import einsum, cache_state, same_cache_state
+
+
+class FaceIntegralAlg():
+    """
+
+    Notes
+    -----
+    网格的面 (二维时为边) 上的积分, 用于间断 Galerkin, 内罚和通量类的算子。
+
+    第一次用到时计算并缓存下面的数据, 之后的罚矩阵, 通量和迹矩阵都共用它们:
+
+    * 面和单元的邻接关系 `face2cell`, 内部面和边界面的编号
+    * 面上的积分点 (NQ, NF, GD), 单位法向 (NF, GD) 和面的测度 (NF, )
+    * 基函数在面两侧单元上的迹 (NQ, NF, ldof), 见 `traces`
+
+    面的法向是左边单元 face2cell[:, 0] 的外法向。边界面的右边单元和左边单元相同,
+    它在右边单元上的迹取为 0 。
+
+    网格的节点数组被替换或者被原地修改, 或者面和单元的个数改变时会清空缓存, 和
+    GeometryCache 的规则一样 (见 `cache_state`)。只原地修改少数几个节点时需要
+    手动调用 `clear()` 。
+    """
+    def __init__(self, mesh, q):
+        self.mesh = mesh
+        self.q = q
+        TD = mesh.top_dimension()
+        self.etype = 'edge' if TD == 2 else 'face'
+        if TD == 2:
+            self.integrator = GaussLegendreQuadrature(q)
+        else:
+            self.integrator = mesh.integrator(q, etype='face')
+        self.clear()
+
+    def clear(self):
+        self.data = {}
+        self.state = None
+
+    def is_valid(self):
+        mesh = self.mesh
+        state = cache_state(mesh.entity('node'), mesh.number_of_cells(),
+                mesh.number_of_faces() if self.etype == 'face'
+                else mesh.number_of_edges())
+        if same_cache_state(self.state, state):
+            return True
+        self.data = {}
+        self.state = state
+        return False
+
+    def get(self, key, fun, *args):
+        self.is_valid()
+        val = self.data.get(key)
+        if val is None:
+            val = fun(*args)
+            if isinstance(val, np.ndarray):
+                val.setflags(write=False)
+            self.data[key] = val
+        return val
+
+    def get_quadrature_points_and_weights(self):
+        return self.integrator.get_quadrature_points_and_weights()
+
+    def face_to_cell(self):
+        def fun():
+            if self.etype == 'edge':
+                return self.mesh.ds.edge_to_cell()
+            else:
+                return self.mesh.ds.face_to_cell()
+        return self.get('face2cell', fun)
+
+    def is_interior_face(self):
+        face2cell = self.face_to_cell()
+        return self.get('isInFace', lambda: face2cell[:, 0] != face2cell[:, 1])
+
+    def interior_face_index(self):
+        isInFace = self.is_interior_face()
+        return self.get('inFaceIndex', lambda: np.nonzero(isInFace)[0])
+
+    def boundary_face_index(self):
+        isInFace = self.is_interior_face()
+        return self.get('bdFaceIndex', lambda: np.nonzero(~isInFace)[0])
+
+    def face_measure(self):
+        return self.get('measure', self.mesh.entity_measure, self.etype)
+
+    def unit_normal(self):
+        mesh = self.mesh
+        if self.etype == 'edge':
+            return self.get('normal', mesh.edge_unit_normal)
+        return self.get('normal', mesh.face_unit_normal)
+
+    def quadrature_points(self):
+        """
+
+        Notes
+        -----
+        面上的积分点 (NQ, NF, GD)。
+        """
+        def fun():
+            mesh = self.mesh
+            bcs = self.integrator.get_quadrature_points_and_weights()[0]
+            node = mesh.entity('node')
+            face = mesh.entity(self.etype)
+            if (not isinstance(face, np.ndarray)) or (face.ndim != 2) or \
+                    (face.shape[1] != bcs.shape[-1]):
+                return mesh.bc_to_point(bcs, etype=self.etype)
+            return np.einsum('qj, fjd->qfd', bcs, node[face])
+        return self.get('points', fun)
+
+    def traces(self, basis, key=None):
+        """
+
+        Parameters
+        ----------
+        basis: 笛卡尔坐标的基函数, basis(ps, index=cellidx) 的形状为
+            (NQ, n, ldof)
+        key: 缓存的标识, 默认为 basis 本身
+
+        Returns
+        -------
+        phi0: (NQ, NF, ldof), 基函数在左边单元上的迹
+        phi1: (NQ, NF, ldof), 基函数在右边单元上的迹, 边界面上为 0
+        """
+        key = ('traces', basis if key is None else key)
+        def fun():
+            ps = self.quadrature_points()
+            face2cell = self.face_to_cell()
+            index = self.interior_face_index()
+            phi0 = basis(ps, index=face2cell[:, 0])
+            phi1 = np.zeros_like(phi0)
+            phi1[:, index] = basis(ps[:, index], index=face2cell[index, 1])
+            phi0.setflags(write=False)
+            phi1.setflags(write=False)
+            return phi0, phi1
+        return self.get(key, fun)
+
+    def face_values(self, basis, key=None):
+        """
+
+        Notes
+        -----
+        定义在面上的基函数 (如边上的缩放单项式) 在积分点处的值 (NQ, NF, ldof)。
+        """
+        key = ('face_values', basis if key is None else key)
+        return self.get(key, lambda: basis(self.quadrature_points()))
+
+    def jump(self, basis, key=None):
+        """
+
+        Notes
+        -----
+        基函数的跳量 [phi] = phi|_L - phi|_R, 形状为 (NQ, NF, 2*ldof), 前 ldof
+        个对应左边单元的基函数, 后 ldof 个对应右边单元的基函数。边界面上只有左
+        边单元的部分。
+        """
+        phi0, phi1 = self.traces(basis, key=key)
+        return np.concatenate((phi0, -phi1), axis=2)
+
+    def average(self, basis, key=None):
+        """
+
+        Notes
+        -----
+        基函数的平均 {phi} = (phi|_L + phi|_R)/2, 形状和 `jump` 相同。边界面上
+        取为左边单元上的迹。
+        """
+        phi0, phi1 = self.traces(basis, key=key)
+        w = np.where(self.is_interior_face(), 0.5, 1.0)
+        w = w.reshape((-1, ) + (1, )*(phi0.ndim - 2))
+        return np.concatenate((w*phi0, w*phi1), axis=2)
+
+    def face_to_dof(self, cell2dof):
+        """
+
+        Notes
+        -----
+        面两侧单元的自由度 (NF, 2*ldof), 和 `jump`, `average` 的排列方式一致。
+        """
+        face2cell = self.face_to_cell()
+        return np.concatenate((cell2dof[face2cell[:, 0]],
+            cell2dof[face2cell[:, 1]]), axis=-1)
+
+    def face_matrix(self, phi0, phi1=None, c=None):
+        """
+
+        Parameters
+        ----------
+        phi0, phi1: (NQ, NF, ldof0), (NQ, NF, ldof1) 的积分点处的值
+        c: 常数, 或者积分点处的系数 (NQ, NF), 或者面上的常数 (NF, )
+
+        Returns
+        -------
+        M: (NF, ldof0, ldof1), M[f] = \\int_f c phi0 phi1 ds
+        """
+        ws = self.integrator.get_quadrature_points_and_weights()[1]
+        measure = self.face_measure()
+        phi1 = phi0 if phi1 is None else phi1
+        if c is not None:
+            c = np.asarray(c)
+            if c.ndim == 2:
+                phi0 = c[..., None]*phi0
+            else:
+                measure = c*measure
+        return einsum('q, qfi, qfj, f->fij', ws, phi0, phi1, measure)
+
+    def assemble(self, M, face2dof0, gdof0, face2dof1=None, gdof1=None):
+        """
+
+        Notes
+        -----
+        把面上的矩阵 M (NF, ldof0, ldof1) 组装为全局稀疏矩阵。
+        """
+        face2dof1 = face2dof0 if face2dof1 is None else face2dof1
+        gdof1 = gdof0 if gdof1 is None else gdof1
+        I = np.broadcast_to(face2dof0[:, :, None], shape=M.shape)
+        J = np.broadcast_to(face2dof1[:, None, :], shape=M.shape)
+        return csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof0, gdof1))
+
+    def jump_matrix(self, basis, cell2dof, gdof, c=None, key=None):
+        """
+
+        Notes
+        -----
+        罚矩阵 \\sum_f \\int_f c [u][v] ds 。
+        """
+        phi = self.jump(basis, key=key)
+        M = self.face_matrix(phi, c=c)
+        face2dof = self.face_to_dof(cell2dof)
+        return self.assemble(M, face2dof, gdof)
+
+    def average_jump_matrix(self, gbasis, basis, cell2dof, gdof, c=None,
+            key=None):
+        """
+
+        Parameters
+        ----------
+        gbasis: 基函数的梯度, gbasis(ps, index=cellidx) 的形状为
+            (NQ, n, ldof, GD)
+
+        Notes
+        -----
+        内罚方法中的通量矩阵 \\sum_f \\int_f c {\\nabla u\\cdot n} [v] ds, 行对
+        应 v, 列对应 u 。
+        """
+        n = self.unit_normal()
+        gkey = None if key is None else ('grad', key)
+        gphi = self.average(gbasis, key=gkey)
+        avg = np.einsum('qfim, fm->qfi', gphi, n)
+        jmp = self.jump(basis, key=key)
+        M = self.face_matrix(jmp, avg, c=c)
+        face2dof = self.face_to_dof(cell2dof)
+        return self.assemble(M, face2dof, gdof)
@@ -1,6 +1,7 @@
 import numpy as np
 from .GaussLobattoQuadrature import GaussLobattoQuadrature
 from .GaussLegendreQuadrature import GaussLegendreQuadrature
+from ..common import scatter_add
 
 class PolygonMeshIntegralAlg():
     def __init__(self, mesh, q, cellmeasure=None, cellbarycenter=None):
@@ -77,7 +78,7 @@ class PolygonMeshIntegralAlg():
         e = np.zeros(shape, dtype=np.float64)
 
         ee = np.einsum('i, ij..., j->j...', ws, val, a)
-        np.add.at(e, edge2cell[:, 0], ee)
+        scatter_add(e, edge2cell[:, 0], ee)
 
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
         if np.sum(isInEdge) > 0:
@@ -90,7 +91,7 @@ class PolygonMeshIntegralAlg():
             pp = np.einsum('ij, jkm->ikm', bcs, tri)
             val = u(pp, edge2cell[isInEdge, 1])
             ee = np.einsum('i, ij..., j->j...', ws, val, a)
-            np.add.at(e, edge2cell[isInEdge, 1], ee)
+            scatter_add(e, edge2cell[isInEdge, 1], ee)
 
         if celltype is True:
             return e
@@ -0,0 +1,68 @@
+"""
+
+Notes
+-----
+积分公式的表格都存放在 data/quadrature.npz 中, 键为 '<name>_<index>', 值为
+原始的表格 A:
+
+* triangle, tetrahedron: 每行为积分点的重心坐标和权重
+* gauss_legendre, interval, gauss_lobatto: 每行为 [-1, 1] 上的积分点和权重
+
+第一次用到时才读入文件, 每个 (name, index) 对应的积分点和权重只计算一次, 并且
+设为只读, 所有的积分公式对象共用它们。
+"""
+
+import os
+import numpy as np
+
+DATAFILE = os.path.join(os.path.dirname(__file__), 'data', 'quadrature.npz')
+
+_tables = None
+_rules = {}
+
+
+def quadrature_table(name, index):
+    global _tables
+    if _tables is None:
+        with np.load(DATAFILE) as data:
+            _tables = {key: data[key] for key in data.files}
+    key = '{}_{}'.format(name, index)
+    if key not in _tables:
+        indices = sorted(int(k.rsplit('_', 1)[1]) for k in _tables
+                if k.rsplit('_', 1)[0] == name)
+        raise ValueError("There is no {} quadrature with index {}, the "
+                "available indices are {}!".format(name, index, indices))
+    return _tables[key]
+
+
+def quadrature_rule(name, index):
+    """
+
+    Returns
+    -------
+    quadpts: 积分点的重心坐标 (NQ, TD+1), 只读
+    weights: 积分权重 (NQ, ), 只读
+    """
+    rule = _rules.get((name, index))
+    if rule is not None:
+        return rule
+
+    A = quadrature_table(name, index)
+    if name in {'triangle', 'tetrahedron'}:
+        quadpts = np.array(A[:, :-1])
+        weights = np.array(A[:, -1])
+    else:
+        quadpts = np.zeros((A.shape[0], 2), dtype=np.float64)
+        if name == 'gauss_lobatto':
+            quadpts[:, 1] = (A[:, 0] + 1)/2.0
+            quadpts[:, 0] = 1 - quadpts[:, 1]
+        else:
+            quadpts[:, 0] = (A[:, 0] + 1)/2.0
+            quadpts[:, 1] = 1 - quadpts[:, 0]
+        weights = A[:, 1]/2
+
+    quadpts.setflags(write=False)
+    weights.setflags(write=False)
+    rule = (quadpts, weights)
+    _rules[(name, index)] = rule
+    return rule
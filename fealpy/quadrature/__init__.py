@@ -7,6 +7,9 @@ from .QuadrangleQuadrature import QuadrangleQuadrature
 from .HexahedronQuadrature import HexahedronQuadrature
 from .PrismQuadrature import PrismQuadrature
 from .FEMeshIntegralAlg import FEMeshIntegralAlg
+from .AssemblyPlan import AssemblyPlan
+from .CellMatrixCache import CellMatrixCache
+from .FaceIntegralAlg import FaceIntegralAlg
 from .PolygonMeshIntegralAlg import PolygonMeshIntegralAlg
 from .PolyhedronMeshIntegralAlg import PolyhedronMeshIntegralAlg
 
@@ -1,14 +1,17 @@
-
-from .solve import solve, active_set_solver
-from .amg import AMGSolver
 from .matlab_solver import MatlabSolver
+from .mixed_precision_solver import MixedPrecisionSolver
+
+try:
+    from .solve import solve, active_set_solver
+    from .amg import AMGSolver
+    from .fast_solver import HighOrderLagrangeFEMFastSolver
+    from .fast_solver import SaddlePointFastSolver
+    from .fast_solver import LinearElasticityLFEMFastSolver
+    from .fast_solver import LinearElasticityRLFEMFastSolver
+except ImportError:
+    print('I do not find pyamg installed on this system!, so you can not use the amg and fast solvers')
 
 try:
     from .petsc_solver import PETScSolver
 except ImportError:
     print('I do not find petsc and petsc4py installed on this system!, so you can not use it')
-
-from .fast_solver import HighOrderLagrangeFEMFastSolver
-from .fast_solver import SaddlePointFastSolver
-from .fast_solver import LinearElasticityLFEMFastSolver 
-from .fast_solver import LinearElasticityRLFEMFastSolver
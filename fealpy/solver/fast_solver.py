@@ -7,6 +7,7 @@ from scipy.sparse.linalg import spilu
 import pyamg
 
 from ..decorator import timer
+from ..boundarycondition import dirichlet_elimination
 
 class IterationCounter(object):
     def __init__(self, disp=True):
@@ -27,12 +28,7 @@ class GaussSeidelSmoother():
         """
         if isDDof is not None:
             # 处理 D 氏 自由度条件
-            gdof = len(isDDof)
-            bdIdx = np.zeros(gdof, dtype=np.int_)
-            bdIdx[isDDof] = 1 
-            Tbd = spdiags(bdIdx, 0, gdof, gdof)
-            T = spdiags(1-bdIdx, 0, gdof, gdof)
-            A = T@A@T + Tbd
+            A = dirichlet_elimination(A, isDDof)
 
         self.L0 = tril(A).tocsr()
         self.U0 = triu(A, k=1).tocsr()
@@ -54,12 +50,7 @@ class JacobiSmoother():
     def __init__(self, A, isDDof=None):
         if isDDof is not None:
             # 处理 D 氏 自由度条件
-            gdof = len(isDDof)
-            bdIdx = np.zeros(gdof, dtype=np.int_)
-            bdIdx[isDDof] = 1 
-            Tbd = spdiags(bdIdx, 0, gdof, gdof)
-            T = spdiags(1-bdIdx, 0, gdof, gdof)
-            A = T@A@T + Tbd
+            A = dirichlet_elimination(A, isDDof)
 
         self.D = A.diagonal() 
         self.L = tril(A, k=-1).tocsr()
@@ -91,12 +82,7 @@ class HighOrderLagrangeFEMFastSolver():
         self.isBdDof = isBdDof
 
         # 获得磨光子
-        gdof = self.gdof
-        bdIdx = np.zeros(gdof, dtype=np.int_)
-        bdIdx[isBdDof] = 1 # 这里假定 A 的前 NN 个自由度是网格节点
-        Tbd = spdiags(bdIdx, 0, gdof, gdof)
-        T = spdiags(1-bdIdx, 0, gdof, gdof)
-        A = T@A@T + Tbd
+        A = dirichlet_elimination(A, isBdDof)
 
         self.L0 = tril(A).tocsr()
         self.U0 = triu(A, k=1).tocsr()
@@ -107,11 +93,8 @@ class HighOrderLagrangeFEMFastSolver():
 
         # 处理预条件子的边界条件
         NN = P.shape[0]
-        bdIdx = np.zeros(NN, dtype=np.int_)
-        bdIdx[isBdDof[:NN]] = 1 # 这里假定 A 的前 NN 个自由度是网格节点
-        Tbd = spdiags(bdIdx, 0, NN, NN)
-        T = spdiags(1-bdIdx, 0, NN, NN)
-        P = T@P@T + Tbd
+        # 这里假定 A 的前 NN 个自由度是网格节点
+        P = dirichlet_elimination(P, isBdDof[:NN])
         self.ml = pyamg.ruge_stuben_solver(P)  # P 的 D 氏边界条件用户先处理一下
 
 
@@ -198,11 +181,7 @@ class LinearElasticityRLFEMFastSolver():
         self.G = G
 
         # 处理预条件子的边界条件
-        bdIdx = np.zeros(P.shape[0], dtype=np.int_)
-        bdIdx[isBdDof] = 1
-        Tbd = spdiags(bdIdx, 0, P.shape[0], P.shape[0])
-        T = spdiags(1-bdIdx, 0, P.shape[0], P.shape[0])
-        P = T@P@T + Tbd
+        P = dirichlet_elimination(P, isBdDof)
         self.ml = pyamg.ruge_stuben_solver(P) 
 
     def linear_operator(self, b):
@@ -321,11 +300,7 @@ class LinearElasticityLFEMFastSolver():
         self.isBdDof = isBdDof
 
         # 处理预条件子的边界条件
-        bdIdx = np.zeros(P.shape[0], dtype=np.int_)
-        bdIdx[isBdDof] = 1
-        Tbd = spdiags(bdIdx, 0, P.shape[0], P.shape[0])
-        T = spdiags(1-bdIdx, 0, P.shape[0], P.shape[0])
-        P = T@P@T + Tbd
+        P = dirichlet_elimination(P, isBdDof)
         self.ml = pyamg.ruge_stuben_solver(P) 
 
     def linear_operator(self, b):
@@ -0,0 +1,98 @@
+import inspect
+
+import numpy as np
+from scipy.sparse.linalg import splu, gmres, LinearOperator
+
+# SciPy 1.12 把 gmres 的 tol 改名为 rtol, 之后删掉了 tol
+GMRES_TOL = 'rtol' if 'rtol' in inspect.signature(gmres).parameters else 'tol'
+
+
+class MixedPrecisionSolver():
+    """
+    混合精度的迭代加细解法器, 求解
+
+    Ax = b
+
+    Notes
+    -----
+    用单精度的矩阵 A32 做 LU 分解, 在双精度下计算残量 r = b - A x, 再用单精度的
+    分解求解修正量 A32 e = r, 更新 x += e 。单精度分解的内存和计算量大约是双精度
+    的一半, 而 A 的条件数不太大时, 几步加细就可以得到双精度的精度。
+
+    A32 可以直接用 `LagrangeFiniteElementSpace(mesh, p, ftype=np.float32)` 组装,
+    不给定时由 A 转换得到。
+
+    当迭代加细不收敛时 (A 的条件数和单精度的机器精度之积接近 1), 可以改用
+    `gmres`, 把单精度的分解当作预条件子。
+    """
+    def __init__(self, A, A32=None):
+        self.A = A.tocsr()
+        if A32 is None:
+            A32 = A.astype(np.float32)
+        self.lu = splu(A32.tocsc())
+        self.niter = 0
+
+    def preconditioner(self, r):
+        """
+
+        Notes
+        -----
+        用单精度的 LU 分解求解 A32 e = r, 返回双精度的 e 。
+        """
+        e = self.lu.solve(r.astype(np.float32))
+        return e.astype(np.float64)
+
+    def linear_operator(self):
+        """
+
+        Notes
+        -----
+        返回预条件子对应的 LinearOperator, 可以传给 scipy 的 Krylov 迭代法。
+        """
+        N = self.A.shape[0]
+        return LinearOperator((N, N), matvec=self.preconditioner, dtype=np.float64)
+
+    def solve(self, uh, F, tol=1e-12, maxit=20, method='refine'):
+        """
+
+        Parameters
+        ----------
+        uh: 初值, 结果直接存在 uh 中
+        F: 右端向量
+        tol: 相对残量 |F - A uh|/|F| 的停止准则
+        maxit: 最大迭代步数
+        method: 'refine' 为迭代加细, 'gmres' 为单精度分解预条件的 GMRES
+
+        Returns
+        -------
+        uh: 数值解
+        """
+        A = self.A
+        x = np.array(uh, dtype=np.float64).reshape(-1) # uh 可能不连续, 最后写回
+        b = F.reshape(-1).astype(np.float64)
+        nb = np.linalg.norm(b)
+        if nb == 0.0:
+            nb = 1.0
+
+        if method == 'gmres':
+            counter = [0]
+            def callback(rk):
+                counter[0] += 1
+            x[:], info = gmres(A, b, x0=x, maxiter=maxit,
+                    M=self.linear_operator(), callback=callback,
+                    callback_type='pr_norm', **{GMRES_TOL: tol})
+            self.niter = counter[0]
+            uh.flat[:] = x
+            return uh
+        elif method != 'refine':
+            raise ValueError("`method` should be 'refine' or 'gmres'!")
+
+        self.niter = 0
+        for i in range(maxit):
+            r = b - A@x
+            if np.linalg.norm(r)/nb < tol:
+                break
+            x += self.preconditioner(r)
+            self.niter += 1
+        uh.flat[:] = x
+        return uh
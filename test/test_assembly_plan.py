@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import TriangleMesh
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.quadrature import AssemblyPlan, CellMatrixCache
+from fealpy.decorator import cartesian, barycentric
+
+
+def init_mesh(n=2):
+    node = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64)
+    cell = np.array([[1, 2, 0], [3, 0, 2]], dtype=np.int_)
+    mesh = TriangleMesh(node, cell)
+    mesh.uniform_refine(n=n)
+    return mesh
+
+
+def coo_assemble(M, cell2dof, gdof):
+    I = np.broadcast_to(cell2dof[:, :, None], shape=M.shape)
+    J = np.broadcast_to(cell2dof[:, None, :], shape=M.shape)
+    return csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof, gdof))
+
+
+def test_assembly_plan():
+    mesh = init_mesh()
+    for p in range(1, 4):
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        gdof = space.number_of_global_dofs()
+        cell2dof = space.cell_to_dof()
+
+        b0 = (space.grad_basis, None, gdof)
+        M = space.integralalg.serial_construct_matrix(b0)
+
+        plan = AssemblyPlan(cell2dof, gdof)
+        A = plan.assemble(M)
+        B = coo_assemble(M, cell2dof, gdof)
+        assert A.nnz == B.nnz
+        assert np.allclose(A.toarray(), B.toarray())
+
+
+def test_space_reuses_plan():
+    mesh = init_mesh()
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    A = space.stiff_matrix()
+    assert space.assembly_plan() is space.assembly_plan()
+
+    # 原地更新 A 的 data, 稀疏结构保持不变
+    indptr = A.indptr
+    B = space.stiff_matrix(c=2.0, out=A)
+    assert B is A
+    assert B.indptr is indptr
+
+    M = space.mass_matrix()
+    assert np.all(M.indices == A.indices)
+    assert np.abs(M.sum() - 1.0) < 1e-12
+
+
+def test_chunked_construct_matrix():
+    mesh = init_mesh(n=3)
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    gdof = space.number_of_global_dofs()
+    cell2dof = space.cell_to_dof()
+    b0 = (space.grad_basis, cell2dof, gdof)
+    alg = space.integralalg
+    alg.cellblock = 4 # 让网格分成很多组
+    A = space.stiff_matrix()
+    for chunksize in (4, 7, 100):
+        B = alg.chunked_construct_matrix(b0, chunksize=chunksize)
+        assert np.array_equal(A.data, B.data)
+        assert np.array_equal(A.indices, B.indices)
+
+    # 比 cellblock 小的 chunksize 也要遵守
+    for chunksize in (2, 3):
+        chunks = alg.cell_chunks(chunksize)
+        assert max(s.stop - s.start for s in chunks) == chunksize
+        B = alg.chunked_construct_matrix(b0, chunksize=chunksize)
+        assert np.allclose(A.data, B.data)
+
+    # 有 index 参数的重心坐标系数只在每一块单元上求值
+    NC = mesh.number_of_cells()
+    uh = space.interpolation(lambda p: 1 + p[..., 0]**2)
+    sizes = []
+    @barycentric
+    def c(bcs, index=np.s_[:]):
+        val = uh(bcs, index=index)
+        sizes.append(val.shape[1])
+        return val
+    A = space.stiff_matrix(c=c)
+    sizes.clear()
+    B = alg.chunked_construct_matrix(b0, c=c, chunksize=7)
+    assert max(sizes) < NC
+    assert np.allclose(A.data, B.data)
+
+
+def test_parallel_construct_matrix():
+    mesh = init_mesh(n=3)
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    space.integralalg.cellblock = 3
+    A = space.stiff_matrix(c=2.0)
+    B = space.parallel_stiff_matrix(c=2.0, nprocs=2)
+    assert np.array_equal(A.data, B.data)
+
+    M = space.mass_matrix()
+    B = space.parallel_mass_matrix(nprocs=3)
+    assert np.array_equal(M.data, B.data)
+
+
+def test_chunked_error():
+    from fealpy.pde.poisson_2d import CosCosData
+    pde = CosCosData()
+    mesh = init_mesh(n=3)
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    uh = space.interpolation(pde.solution)
+    alg = space.integralalg
+
+    e0 = alg.L2_error(pde.solution, uh)
+    e1 = alg.error(pde.gradient, uh.grad_value, celltype=True)
+    for kwargs in ({'chunksize': 7}, {'memory': 1e-6}, {'nprocs': 2}):
+        assert np.isclose(alg.L2_error(pde.solution, uh, **kwargs), e0)
+        e = alg.error(pde.gradient, uh.grad_value, celltype=True, **kwargs)
+        assert np.allclose(e, e1)
+
+    # 向量值函数的 L2_error 保留每个分量在每个单元上的误差
+    NC = mesh.number_of_cells()
+    eg = alg.L2_error(pde.gradient, uh.grad_value, celltype=True)
+    assert eg.shape == (NC, 2)
+    assert np.allclose(np.sum(eg**2, axis=-1), e1**2)
+    assert np.allclose(alg.L2_error(pde.gradient, uh.grad_value, celltype=True,
+        chunksize=7), eg)
+
+    e = alg.cell_integral(uh.grad_value, power=2)
+    assert np.allclose(alg.cell_integral(uh.grad_value, power=2, chunksize=7), e)
+
+
+def test_construct_matrices():
+    mesh = init_mesh(n=3)
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    b = np.array([1.0, -1.0])
+    A, M, B = space.construct_matrices(['stiff', ('mass', 2.0), ('convection', b)])
+    assert np.array_equal(A.data, space.stiff_matrix().data)
+    assert np.array_equal(M.data, space.mass_matrix(c=2.0).data)
+    assert np.array_equal(B.data, space.convection_matrix(c=b).data)
+    assert np.shares_memory(A.indices, M.indices)
+    assert np.shares_memory(A.indptr, B.indptr)
+
+    plan = space.assembly_plan()
+    S = plan.combine([M, A], [1.0, 0.1])
+    assert np.shares_memory(S.indices, A.indices)
+    assert np.allclose(S.toarray(), (M + 0.1*A).toarray())
+
+
+def test_cell_matrix_cache():
+    @cartesian
+    def c(p):
+        return 1 + p[..., 0]**2
+
+    mesh = init_mesh(n=2)
+    cache = CellMatrixCache()
+    for i in range(3):
+        space = LagrangeFiniteElementSpace(mesh, p=2)
+        A = space.stiff_matrix(c=c, cache=cache)
+        assert np.allclose(A.toarray(), space.stiff_matrix(c=c).toarray())
+        if i > 0: # 只重新计算新单元上的单元矩阵
+            assert cache.nchanged == np.sum(mesh.cellmap < 0)
+        NC = mesh.number_of_cells()
+        isMarkedCell = np.zeros(NC, dtype=np.bool_)
+        isMarkedCell[:2] = True
+        mesh.bisect(isMarkedCell)
+
+    # 没有 cellmap 时按顶点坐标匹配
+    cellmap = mesh.cellmap
+    del mesh.cellmap
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    A = space.stiff_matrix(c=c, cache=cache)
+    assert cache.nchanged == np.sum(cellmap < 0)
+    assert np.allclose(A.toarray(), space.stiff_matrix(c=c).toarray())
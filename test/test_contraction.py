@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.common import einsum
+
+
+@pytest.mark.parametrize('subscripts, shape0, shape1', [
+    ('i, ijk, ijm, j->jkm', (6, 9, 3), (6, 9, 4)),
+    ('i, ijkl, ijml, j->jkm', (6, 9, 3, 2), (6, 9, 3, 2)),
+    ('i, ijk..., ijm..., j->jkm', (6, 1, 3, 2, 2), (6, 9, 5, 2, 2)),
+    ('m, mij, mik, i->ijk', (6, 9, 3), (6, 1, 3)),
+    ('i, ijk, ijk, j->jk', (6, 9, 3), (6, 9, 3)), # 不是矩阵乘法的形式
+    ])
+def test_einsum(subscripts, shape0, shape1):
+    ws = np.random.rand(6)
+    measure = np.random.rand(9)
+    phi0 = np.random.rand(*shape0)
+    phi1 = np.random.rand(*shape1)
+    M0 = np.einsum(subscripts, ws, phi0, phi1, measure, optimize=True)
+    for i in range(2): # 第二次用缓存的缩并路径
+        M = einsum(subscripts, ws, phi0, phi1, measure)
+        assert M.shape == M0.shape
+        assert np.allclose(M, M0)
+
+    M = einsum(subscripts, ws.astype(np.float32), phi0.astype(np.float32),
+            phi1.astype(np.float32), measure.astype(np.float32))
+    assert M.dtype == np.float32
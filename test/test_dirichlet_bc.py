@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from scipy.sparse import spdiags, csr_matrix, random as sprandom
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import dirichlet_elimination
+
+
+def triple_product(A, isDDof):
+    N = A.shape[0]
+    bdIdx = np.zeros(N, dtype=np.int_)
+    bdIdx[isDDof] = 1
+    Tbd = spdiags(bdIdx, 0, N, N)
+    T = spdiags(1-bdIdx, 0, N, N)
+    return T@A@T + Tbd
+
+
+def test_dirichlet_elimination():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    A = space.stiff_matrix()
+    isDDof = space.boundary_dof()
+    x = np.random.rand(len(isDDof))
+    F = np.random.rand(len(isDDof))
+
+    B, F0 = dirichlet_elimination(A, isDDof, F=F.copy(), x=x)
+    assert np.allclose(B.toarray(), triple_product(A, isDDof).toarray())
+    # 稀疏结构不变, 原矩阵不变
+    assert np.shares_memory(B.indices, A.indices)
+    assert space.assembly_plan().is_pattern_of(B)
+    assert not np.shares_memory(B.data, A.data)
+
+    xd = np.where(isDDof, x, 0)
+    F1 = F - A@xd
+    F1[isDDof] = x[isDDof]
+    assert np.allclose(F0, F1)
+
+    # 按分量排列的向量型问题
+    A = space.linear_elasticity_matrix(1.0, 1.0)
+    isDDof = np.tile(isDDof, 2)
+    data = A.data
+    B = dirichlet_elimination(A, isDDof, inplace=True)
+    assert (B is A) and (B.data is data)
+    assert np.allclose(B.toarray(),
+            triple_product(space.linear_elasticity_matrix(1.0, 1.0), isDDof).toarray())
+
+
+def test_dirichlet_elimination_missing_diagonal():
+    A = sprandom(20, 20, density=0.2, format='csr') 
+    A.setdiag(0)
+    A.eliminate_zeros()
+    isDDof = np.zeros(20, dtype=np.bool_)
+    isDDof[[1, 5, 7]] = True
+    B = dirichlet_elimination(A, np.array([1, 5, 7]))
+    assert np.allclose(B.toarray(), triple_product(A, isDDof).toarray())
+
+
+def test_dirichlet_elimination_duplicate_entries():
+    # 对角元 (0, 0) 重复出现, 非规范的 CSR 矩阵
+    A = csr_matrix((np.array([1.0, 1.0, 2.0, 5.0]), np.array([0, 0, 1, 1]),
+        np.array([0, 3, 4])), shape=(2, 2))
+    assert not A.has_canonical_format
+    F = np.array([1.0, 1.0])
+    B, F = dirichlet_elimination(A, np.array([0]), F=F, x=np.array([3.0, 0.0]))
+    assert np.allclose(B.toarray(), [[1, 0], [0, 5]])
+    assert np.allclose(F, [3.0, 1.0])
+    assert np.allclose(A.toarray(), [[2, 2], [0, 5]]) # 原矩阵不变
+
+    B = dirichlet_elimination(A, np.array([0]), inplace=True)
+    assert np.allclose(B.toarray(), [[1, 0], [0, 5]])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.decorator import cartesian
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import ScaledMonomialSpace2d
+from fealpy.quadrature import GaussLegendreQuadrature, FaceIntegralAlg
+
+
+@pytest.mark.parametrize('p', [1, 2])
+def test_face_integral_alg(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    space = ScaledMonomialSpace2d(mesh, p)
+
+    # 直接计算
+    edge2cell = mesh.ds.edge_to_cell()
+    isInEdge = edge2cell[:, 0] != edge2cell[:, 1]
+    eh = mesh.entity_measure('edge')
+    qf = GaussLegendreQuadrature(p + 3)
+    bcs, ws = qf.quadpts, qf.weights
+    ps = mesh.edge_bc_to_point(bcs)
+
+    ldof = space.number_of_local_dofs()
+    phi = np.zeros(ps.shape[:-1] + (2*ldof, ))
+    phi[:, :, :ldof] = space.basis(ps, index=edge2cell[:, 0])
+    phi[:, isInEdge, ldof:] = -space.basis(ps[:, isInEdge],
+            index=edge2cell[isInEdge, 1])
+    H = np.einsum('i, ijk, ijm, j->jkm', ws, phi, phi, eh)
+
+    P = space.penalty_matrix()
+    cell2dof = space.cell_to_dof()
+    face2dof = np.concatenate((cell2dof[edge2cell[:, 0]],
+        cell2dof[edge2cell[:, 1]]), axis=-1)
+    I = np.broadcast_to(face2dof[:, :, None], H.shape)
+    J = np.broadcast_to(face2dof[:, None, :], H.shape)
+    P0 = np.zeros(P.shape)
+    np.add.at(P0, (I, J), H)
+    assert np.allclose(P.toarray(), P0)
+
+    # 常数函数的跳量为 0, 只剩边界上的积分
+    u = np.zeros(space.number_of_global_dofs())
+    u[cell2dof[:, 0]] = 1.0
+    assert np.isclose(u@P@u, 4.0)
+
+    phi0 = space.edge_basis(ps)
+    phi1 = space.basis(ps, index=edge2cell[:, 0], p=p+1)
+    phi2 = space.basis(ps, index=edge2cell[:, 1], p=p+1)
+    LM, RM = space.edge_cell_mass_matrix()
+    assert np.allclose(LM, np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1, eh))
+    assert np.allclose(RM, np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi2, eh))
+    assert np.allclose(space.edge_mass_matrix_1(), space.edge_mass_matrix())
+
+    # 次数比空间高时用更高阶的积分公式
+    for q in range(p+1, p+6):
+        assert np.allclose(space.edge_mass_matrix_1(p=q),
+                space.edge_mass_matrix(p=q), rtol=1e-12, atol=1e-14)
+
+    # 表格只计算一次, 网格改变后重新计算
+    facealg = space.facealg
+    assert facealg.quadrature_points() is facealg.quadrature_points()
+    mesh.uniform_refine()
+    assert facealg.quadrature_points().shape[1] == mesh.number_of_edges()
+
+    # 原地修改节点坐标后也重新计算
+    eh = facealg.face_measure().copy()
+    ps = facealg.quadrature_points().copy()
+    mesh.node[:] *= 2
+    assert np.allclose(facealg.face_measure(), 2*eh)
+    assert np.allclose(facealg.quadrature_points(), 2*ps)
+
+
+def test_average_jump_matrix():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    space = ScaledMonomialSpace2d(mesh, 1)
+    facealg = FaceIntegralAlg(mesh, 3)
+    cell2dof = space.cell_to_dof()
+    gdof = space.number_of_global_dofs()
+    S = facealg.average_jump_matrix(space.grad_basis, space.basis, cell2dof,
+            gdof)
+
+    # u = v = x 的跳量为 0, 只剩边界上的积分 \int_{\partial\Omega} x n_x ds
+    @cartesian
+    def f(p):
+        return p[..., 0]
+    u = space.local_projection(f)
+    assert np.isclose(u@S@u, 1.0)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import SurfaceTriangleMesh
+from fealpy.geometry import SphereSurface
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'tet'])
+def test_geometry_cache(meshtype):
+    if meshtype == 'tri':
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=1, meshtype='tet')
+
+    Dlambda = mesh.grad_lambda()
+    assert mesh.grad_lambda() is Dlambda
+    assert not Dlambda.flags.writeable
+
+    measure = mesh.entity_measure('cell')
+    assert np.abs(measure.sum() - 1.0) < 1e-12
+    assert np.all(mesh.entity_measure('cell', index=[0, 1]) == measure[[0, 1]])
+
+    qf = mesh.integrator(2, 'cell')
+    bcs, ws = qf.get_quadrature_points_and_weights()
+    ps = mesh.bc_to_point(bcs)
+    assert mesh.bc_to_point(bcs.copy()) is ps
+    assert np.allclose(ps[0], mesh.bc_to_point(bcs[0], index=np.s_[:]))
+
+    bc = mesh.entity_barycenter('cell')
+    assert np.allclose(bc, mesh.bc_to_point(np.ones(bcs.shape[-1])/bcs.shape[-1]))
+
+    # 替换节点坐标后自动重新计算
+    mesh.node = 2*mesh.node
+    assert mesh.grad_lambda() is not Dlambda
+    assert np.allclose(mesh.grad_lambda(), Dlambda/2)
+    assert np.allclose(mesh.bc_to_point(bcs), 2*ps)
+
+    # 加密后单元改变
+    mesh.uniform_refine()
+    NC = mesh.number_of_cells()
+    assert mesh.grad_lambda().shape[0] == NC
+    assert len(mesh.entity_measure('cell')) == NC
+    assert np.abs(mesh.entity_measure('cell').sum() - 2**mesh.geo_dimension()) < 1e-12
+
+    # 原地修改节点坐标后也重新计算
+    mesh.node *= 0.5
+    assert np.abs(mesh.entity_measure('cell').sum() - 1.0) < 1e-12
+
+
+def test_surface_mesh_scale():
+    surface = SphereSurface()
+    mesh = surface.init_mesh()
+    area = mesh.entity_measure('cell').copy()
+
+    # SurfaceTriangleMesh 原地放大了 mesh.node
+    smesh = SurfaceTriangleMesh(mesh, surface, p=1, scale=10)
+    assert np.allclose(mesh.entity_measure('cell'), 100*area)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.common import index_type
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+def test_index_type():
+    assert index_type(2**31 - 1, np.int32) == np.int32
+    assert index_type(2**31, np.int32) == np.int64
+    assert index_type(100, np.int64) == np.int64
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'tet'])
+@pytest.mark.parametrize('p', [1, 2, 3])
+def test_int32_mode(meshtype, p):
+    if meshtype == 'tri':
+        mesh0 = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+        mesh1 = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri',
+                itype=np.int32)
+    else:
+        mesh0 = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=1, meshtype='tet')
+        mesh1 = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=1, meshtype='tet',
+                itype=np.int32)
+    mesh0.uniform_refine()
+    mesh1.uniform_refine()
+    assert mesh1.entity('cell').dtype == np.int32
+    assert mesh1.ds.cell_to_edge().dtype == np.int32
+
+    space0 = LagrangeFiniteElementSpace(mesh0, p)
+    space1 = LagrangeFiniteElementSpace(mesh1, p)
+    cell2dof = space1.cell_to_dof()
+    assert cell2dof.dtype == np.int32
+    assert np.all(cell2dof == space0.cell_to_dof())
+
+    A0 = space0.stiff_matrix()
+    A1 = space1.stiff_matrix()
+    assert A1.indices.dtype == np.int32
+    assert np.abs(A0 - A1).max() == 0.0
+
+
+def test_index_type_promotion():
+    # 8 位整数很快就不够用了, 加密后自动提升为 int64
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri', itype=np.int8)
+    assert mesh.entity('cell').dtype == np.int8
+    NE = mesh.number_of_edges()
+    assert mesh.ds.cell_to_edge().max() == NE - 1
+    mesh.uniform_refine()
+    NN = mesh.number_of_nodes()
+    assert mesh.entity('cell').dtype == np.int64
+    assert mesh.entity('cell').max() == NN - 1
+    assert np.all(mesh.entity_measure('cell') > 0)
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=7, ny=7, meshtype='tri', itype=np.int8)
+    mesh.bisect()
+    assert mesh.entity('cell').dtype == np.int64
+    assert np.isclose(mesh.entity_measure('cell').sum(), 1.0)
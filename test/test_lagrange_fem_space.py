@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+def test_basis_table():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=3)
+    bcs, ws = space.integrator.get_quadrature_points_and_weights()
+
+    phi = space.basis(bcs)
+    assert phi.shape == (len(ws), 1, space.number_of_local_dofs())
+    assert np.allclose(phi.sum(axis=-1), 1.0)
+    assert not phi.flags.writeable
+
+    # 同一组积分点只计算一次
+    R = space.grad_basis_table(bcs)
+    assert space.grad_basis_table(bcs.copy()) is R
+    assert space.basis_table(bcs) is space.basis_table(bcs)
+
+    gphi = space.grad_basis(bcs)
+    Dlambda = mesh.grad_lambda()
+    assert np.allclose(gphi, np.einsum('qij, cjm->qcim', R, Dlambda))
+    assert np.allclose(gphi.sum(axis=-2), 0.0)
+
+    # 逐点求值的 bc 不进入缓存, 缓存的总字节数有上限
+    n = len(space.basistables)
+    rng = np.random.default_rng(0)
+    p = rng.random((5000, 2))
+    u = lambda p: p[..., 0]**2 + p[..., 1]
+    uh = space.interpolation(u)
+    assert np.allclose(uh.point_value(p), u(p))
+    bc = rng.dirichlet(np.ones(3), size=space.maxtablepoints+1)
+    assert space.basis_table(bc).flags.writeable
+    assert len(space.basistables) == n
+
+    space.maxtablebytes = 2*phi.nbytes
+    for q in range(1, 6):
+        qf = mesh.integrator(q, 'cell')
+        space.basis(qf.get_quadrature_points_and_weights()[0])
+    nbytes = sum(v.nbytes for v in space.basistables.values())
+    assert 0 < nbytes <= space.maxtablebytes
+
+
+def test_matrix_free_operator():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=2, meshtype='tet')
+    space = LagrangeFiniteElementSpace(mesh, p=3)
+    space.integralalg.cellblock = 5
+    x = np.random.rand(space.number_of_global_dofs())
+
+    K = np.array([[2.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 3.0]])
+    b = np.array([1.0, 2.0, 3.0])
+    for A, B in [
+            (space.stiff_matrix(), space.stiff_operator()),
+            (space.stiff_matrix(c=K), space.stiff_operator(c=K)),
+            (space.mass_matrix(c=2.0), space.mass_operator(c=2.0)),
+            (space.convection_matrix(c=b), space.convection_operator(c=b))]:
+        assert np.allclose(A@x, B@x)
+        assert np.allclose(A.T@x, B.H@x)
+        assert np.allclose(A.diagonal(), B.diagonal())
+
+    isDDof = space.boundary_dof()
+    B = space.stiff_operator().dirichlet(isDDof)
+    y = B@x
+    assert np.all(y[isDDof] == x[isDDof])
+    assert np.all(B.diagonal()[isDDof] == 1)
+
+
+def test_single_precision():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    space32 = LagrangeFiniteElementSpace(mesh, p=2, ftype=np.float32)
+
+    A = space.stiff_matrix()
+    A32 = space32.stiff_matrix()
+    assert A32.dtype == np.float32
+    assert np.allclose(A.toarray(), A32.toarray(), atol=1e-6)
+
+    # 分块组装用双精度累加, 和一次组装的结果逐位相同
+    space32.integralalg.memory = 1e-5
+    assert np.all(space32.stiff_matrix().data == A32.data)
+
+
+def test_linear_elasticity_bsr():
+    from scipy.sparse.linalg import spsolve
+    from fealpy.boundarycondition import DirichletBC
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    gdof = space.number_of_global_dofs()
+    NC = mesh.number_of_cells()
+
+    A = space.linear_elasticity_matrix(1.5, 0.5)
+    B = space.linear_elasticity_matrix(1.5, 0.5, format='bsr')
+    assert B.blocksize == (2, 2)
+    # 按分量排列的编号在交错排列中的位置
+    perm = (2*np.arange(gdof) + np.arange(2)[:, None]).reshape(-1)
+    assert np.allclose(B.toarray()[perm][:, perm], A.toarray())
+
+    # 单元分片常数的拉梅参数
+    C = space.linear_elasticity_matrix(np.full(NC, 1.5), np.full(NC, 0.5),
+            format='bsr')
+    assert np.allclose(C.toarray(), B.toarray())
+
+    gD = lambda p: np.stack((p[..., 0]**2, p[..., 1]), axis=-1)
+    gD.coordtype = 'cartesian'
+    F = np.random.rand(gdof, 2)
+    bc = DirichletBC(space, gD)
+
+    uh = space.function(dim=2)
+    A, F0 = bc.apply(A, F.copy(), uh)
+    uh.T.flat[:] = spsolve(A, F0)
+
+    vh = space.function(dim=2)
+    B, F1 = bc.apply(B, F.copy(), vh)
+    assert B.blocksize == (2, 2)
+    vh.flat[:] = spsolve(B.tocsr(), F1)
+    assert np.allclose(uh, vh)
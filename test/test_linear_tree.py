@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import LinearQuadtree, LinearOctree
+from fealpy.mesh.LinearTree import spread_bits, compact_bits
+
+
+@pytest.mark.parametrize('GD', [2, 3])
+def test_spread_bits(GD):
+    rng = np.random.default_rng(0)
+    x = rng.integers(0, 2**(64//GD), size=100)
+    assert np.all(compact_bits(spread_bits(x, GD), GD) == x)
+    assert spread_bits(0b101, GD) == 1 + 2**(2*GD)
+
+
+def test_linear_quadtree():
+    tree = LinearQuadtree([0, 1, 0, 1], nx=2, ny=3)
+    tree.uniform_refine(2)
+    for i in range(5):
+        bc = tree.leaf_barycenter()
+        tree.refine(np.linalg.norm(bc - 0.3, axis=-1) < 0.05)
+    assert not tree.is_balanced()
+    tree.balance()
+    assert tree.is_balanced()
+    assert np.all(tree.key[1:] > tree.key[:-1])
+    assert np.isclose(tree.leaf_measure().sum(), 1.0)
+
+    # 点所在的叶子包含该点
+    rng = np.random.default_rng(0)
+    p = rng.random((100, 2))
+    idx = tree.locate(p)
+    node, cell = tree.node_and_cell()
+    assert np.all(node[cell[idx, 0]] <= p) and np.all(p <= node[cell[idx, -1]])
+    assert np.all(tree.locate(np.array([[-0.1, 0.5], [0.5, 1.1]])) == -1)
+
+    # 上边界上的点也在区域中
+    p = np.array([[1.0, 0.5], [0.5, 1.0], [1.0, 1.0], [0.0, 0.0]])
+    idx = tree.locate(p)
+    assert np.all(idx >= 0)
+    assert np.all(node[cell[idx, 0]] <= p) and np.all(p <= node[cell[idx, -1]])
+
+    # 悬挂点上线性函数的插值是精确的
+    hnode, H = tree.hanging_node()
+    f = lambda p: p[:, 0] + 3*p[:, 1]
+    assert len(hnode) > 0
+    assert np.allclose(H@f(node), f(node[hnode]))
+
+    mesh = tree.to_polygon_mesh()
+    assert mesh.number_of_cells() == tree.number_of_leaves()
+    assert np.allclose(mesh.entity_measure('cell'), tree.leaf_measure())
+    assert np.sum(mesh.ds.boundary_edge_flag()) == 2*(4*2 + 4*3)
+
+
+def test_linear_octree():
+    tree = LinearOctree([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2)
+    tree.uniform_refine(1)
+    for i in range(3):
+        bc = tree.leaf_barycenter()
+        tree.refine(np.linalg.norm(bc - 0.3, axis=-1) < 0.2)
+    tree.balance(connect='corner')
+    assert tree.is_balanced(connect='corner')
+    assert np.isclose(tree.leaf_measure().sum(), 1.0)
+
+    node, cell = tree.node_and_cell()
+    hnode, H = tree.hanging_node()
+    f = lambda p: p[:, 0] + 3*p[:, 1] - 2*p[:, 2]
+    assert np.allclose(H@f(node), f(node[hnode]))
+
+    mesh = tree.to_hexahedron_mesh()
+    rng = np.random.default_rng(0)
+    p = rng.random((100, 3))
+    assert np.all(mesh.location(p) == tree.locate(p))
+
+    # 粗化后叶子上的数据取孩子的平均值
+    NL = tree.number_of_leaves()
+    data = {'x': tree.leaf_barycenter()}
+    child = tree.coarsen(np.arange(NL) < NL//2, data=data)
+    assert tree.number_of_leaves() == len(child) < NL
+    assert np.all(tree.key[1:] > tree.key[:-1])
+    assert np.allclose(data['x'], tree.leaf_barycenter())
+    assert np.isclose(tree.leaf_measure().sum(), 1.0)
+
+
+def test_maxdepth():
+    with pytest.raises(ValueError):
+        LinearOctree([0, 1, 0, 1, 0, 1], maxdepth=22)
+    tree = LinearQuadtree([0, 1, 0, 1], maxdepth=2)
+    tree.uniform_refine(3)
+    assert tree.number_of_leaves() == 16
+
+
+def test_polygon_mesh_at_maxdepth():
+    tree = LinearQuadtree([0, 1, 0, 1], maxdepth=2)
+    tree.uniform_refine(2)
+    mesh = tree.to_polygon_mesh()
+    assert mesh.number_of_edges() == 40
+    assert np.all(mesh.entity_measure('edge') > 0)
+
+    # 最细一层的叶子和粗一层的叶子相邻
+    tree = LinearQuadtree([0, 1, 0, 1], maxdepth=3)
+    tree.uniform_refine(2)
+    tree.refine(np.arange(16) < 4)
+    mesh = tree.to_polygon_mesh()
+    NV = mesh.number_of_vertices_of_cells()
+    assert np.all(NV[:16] == 4) and np.sum(NV[16:] == 5) == 4
+    assert np.allclose(mesh.entity_measure('cell'), tree.leaf_measure())
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+from scipy.sparse.linalg import spsolve
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.solver.mixed_precision_solver import MixedPrecisionSolver
+
+
+@pytest.mark.parametrize('method', ['refine', 'gmres'])
+def test_mixed_precision_solver(method):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    space32 = LagrangeFiniteElementSpace(mesh, p=2, ftype=np.float32)
+
+    A = space.stiff_matrix() + space.mass_matrix()
+    A32 = space32.stiff_matrix() + space32.mass_matrix()
+    F = np.random.rand(A.shape[0])
+
+    solver = MixedPrecisionSolver(A, A32)
+    uh = np.zeros_like(F)
+    solver.solve(uh, F, method=method)
+    assert np.allclose(uh, spsolve(A, F), rtol=1e-10, atol=1e-12)
+
+    # uh 不连续时 reshape 会复制, 结果也要写回 uh
+    n = int(np.sqrt(len(F)))
+    uh = np.zeros((n, n)).T
+    solver.solve(uh, F, method=method)
+    assert np.allclose(uh.reshape(-1), spsolve(A, F), rtol=1e-10, atol=1e-12)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+
+
+def test_triangle_mesh_location():
+    # 带洞的 L 形区域, 非凸
+    def threshold(p):
+        x = p[..., 0]
+        y = p[..., 1]
+        return ((x > 0) & (y < 0)) | \
+                ((np.abs(x + 0.5) < 0.2) & (np.abs(y - 0.5) < 0.2))
+    mesh = MF.boxmesh2d([-1, 1, -1, 1], nx=20, ny=20, threshold=threshold)
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+
+    points = np.random.default_rng(0).random((5000, 2))*2.4 - 1.2
+    cellidx, bc = mesh.location(points, return_bc=True)
+
+    x = points[:, 0]
+    y = points[:, 1]
+    isIn = np.all(np.abs(points) < 1, axis=-1) & ~((x > 0) & (y < 0)) & \
+            ~((np.abs(x + 0.5) < 0.2) & (np.abs(y - 0.5) < 0.2))
+    assert np.all((cellidx >= 0) == isIn)
+    assert np.all(np.isnan(bc[~isIn]))
+
+    flag = cellidx >= 0
+    assert np.all(bc[flag] >= -1e-12)
+    ps = np.einsum('ij, ijk->ik', bc[flag], node[cell[cellidx[flag]]])
+    assert np.allclose(ps, points[flag])
+
+    # 网格节点都在网格中, 索引只生成一次
+    data = mesh.locator.index()
+    assert np.all(mesh.location(node) >= 0)
+    assert mesh.locator.index() is data
+
+    # 加密后重新生成
+    mesh.uniform_refine()
+    cellidx = mesh.location(points)
+    assert mesh.locator.index() is not data
+    assert np.all((cellidx >= 0) == isIn)
+    bc = mesh.entity_barycenter('cell')
+    assert np.all(mesh.location(bc) == np.arange(mesh.number_of_cells()))
+
+    # 原地修改节点坐标后也重新生成
+    mesh.node[:] *= 2
+    cellidx = mesh.location(2*points)
+    assert np.all((cellidx >= 0) == isIn)
+    assert np.all(mesh.location(2*bc) == np.arange(mesh.number_of_cells()))
+
+
+@pytest.mark.parametrize('meshtype', ['tet', 'hex'])
+def test_3d_mesh_location(meshtype):
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=4, ny=4, nz=4, meshtype=meshtype)
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+    rng = np.random.default_rng(0)
+    if meshtype == 'hex':
+        # 扰动内部节点, 单元的面不再是平面
+        isBdNode = np.any((node == 0) | (node == 1), axis=-1)
+        node[~isBdNode] += rng.random((np.sum(~isBdNode), 3))*0.08 - 0.04
+
+    points = rng.random((5000, 3))*1.2 - 0.1
+    cellidx, bc = mesh.location(points, return_bc=True)
+    isIn = np.all((points >= 0) & (points <= 1), axis=-1)
+    assert np.all((cellidx >= 0) == isIn)
+    assert np.all(np.isnan(bc[~isIn]))
+
+    flag = cellidx >= 0
+    if meshtype == 'tet':
+        assert bc.shape == (5000, 4)
+        phi = bc[flag]
+    else:
+        # 参考单元 [0, 1]^3 上的三线性基函数
+        assert bc.shape == (5000, 3)
+        x, y, z = bc[flag].T
+        assert np.all((bc[flag] >= -1e-12) & (bc[flag] <= 1 + 1e-12))
+        phi = np.stack([(1-x)*(1-y)*(1-z), x*(1-y)*(1-z), x*y*(1-z),
+            (1-x)*y*(1-z), (1-x)*(1-y)*z, x*(1-y)*z, x*y*z, (1-x)*y*z], axis=1)
+    ps = np.einsum('ij, ijk->ik', phi, node[cell[cellidx[flag]]])
+    assert np.allclose(ps, points[flag])
+    assert np.all(mesh.location(node) >= 0)
+
+
+def test_polyhedron_mesh_location():
+    from fealpy.mesh.PolyhedronMesh import PolyhedronMesh
+
+    # 把 2x2x2 六面体网格中的三个单元合并成一个非凸的 L 形单元
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='hex')
+    cmap = np.array([0, 0, 1, 2, 0, 3, 4, 5])
+    face = mesh.entity('face')
+    face2cell = mesh.ds.face2cell.copy()
+    face2cell[:, :2] = cmap[face2cell[:, :2]]
+    flag = (face2cell[:, 0] != face2cell[:, 1]) | \
+            (mesh.ds.face2cell[:, 0] == mesh.ds.face2cell[:, 1])
+    NF = np.sum(flag)
+    pmesh = PolyhedronMesh(mesh.entity('node'), face[flag].reshape(-1),
+            np.arange(0, 4*(NF+1), 4), face2cell[flag], NC=6)
+
+    points = np.random.default_rng(0).random((5000, 3))*1.2 - 0.1
+    cellidx, lc = pmesh.location(points, return_bc=True)
+    isIn = np.all((points >= 0) & (points <= 1), axis=-1)
+    assert np.all((cellidx >= 0) == isIn)
+    assert np.all(cellidx[isIn] == cmap[mesh.location(points[isIn])])
+    assert np.all(lc[isIn] == points[isIn])
+    assert np.all(np.isnan(lc[~isIn]))
+
+
+def test_point_value():
+    from fealpy.functionspace import LagrangeFiniteElementSpace
+
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    space = LagrangeFiniteElementSpace(mesh, 2)
+    uh = space.interpolation(lambda p: p[..., 0]**2 + p[..., 1]*p[..., 2])
+
+    points = np.random.default_rng(0).random((2, 100, 3))*1.2 - 0.1
+    val = uh.point_value(points)
+    assert val.shape == (2, 100)
+    isIn = np.all((points >= 0) & (points <= 1), axis=-1)
+    assert np.all(np.isnan(val[~isIn]))
+    p = points[isIn]
+    assert np.allclose(val[isIn], p[:, 0]**2 + p[:, 1]*p[:, 2])
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.quadrature import TriangleQuadrature, TetrahedronQuadrature
+from fealpy.quadrature import GaussLegendreQuadrature, GaussLobattoQuadrature
+
+
+@pytest.mark.parametrize('cls, indices', [
+    (TriangleQuadrature, range(1, 12)),
+    (TetrahedronQuadrature, range(1, 8)),
+    (GaussLegendreQuadrature, range(1, 21)),
+    (GaussLobattoQuadrature, range(2, 12)),
+    ])
+def test_quadrature_tables(cls, indices):
+    for k in indices:
+        qf = cls(k)
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        assert np.isclose(ws.sum(), 1.0)
+        assert np.allclose(bcs.sum(axis=-1), 1.0)
+
+        # 同一个积分公式的数组只构造一次, 并且是只读的
+        assert bcs is cls(k).quadpts
+        assert not bcs.flags.writeable
+        assert not ws.flags.writeable
+
+    with pytest.raises(ValueError):
+        cls(100)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.reorder import hilbert_code
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+@pytest.mark.parametrize('GD', [2, 3])
+def test_hilbert_code(GD):
+    # Hilbert 序中相邻的格点在空间中也相邻
+    n = 8 if GD == 2 else 4
+    p = np.stack(np.meshgrid(*(np.arange(n), )*GD), axis=-1).reshape(-1, GD)
+    key = hilbert_code(p.astype(np.float64), nbits=int(np.log2(n)))
+    assert len(np.unique(key)) == n**GD
+    d = np.diff(p[np.argsort(key)], axis=0)
+    assert np.all(np.sum(np.abs(d), axis=-1) == 1)
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'tet'])
+@pytest.mark.parametrize('method', ['hilbert', 'morton', 'rcm'])
+def test_mesh_reorder(meshtype, method):
+    if meshtype == 'tri':
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    mesh.uniform_refine()
+
+    def f(p):
+        return np.sin(3*p[..., 0]) + p[..., 1]**2
+
+    space = LagrangeFiniteElementSpace(mesh, 3)
+    data = {'uh': space.interpolation(f)}
+    mesh.nodedata['x'] = mesh.entity('node')[:, 0].copy()
+    mesh.celldata['measure'] = mesh.entity_measure('cell').copy()
+    mesh.edgedata['length'] = mesh.entity_measure('edge').copy()
+    A0 = LagrangeFiniteElementSpace(mesh, 1).stiff_matrix()
+
+    nodeperm, cellperm = mesh.reorder(method, data=data)
+    assert np.all(mesh.cellmap == cellperm)
+    assert np.allclose(mesh.nodedata['x'], mesh.entity('node')[:, 0])
+    assert np.allclose(mesh.celldata['measure'], mesh.entity_measure('cell'))
+    assert np.allclose(mesh.edgedata['length'], mesh.entity_measure('edge'))
+
+    # 有限元函数和刚度矩阵都只是重排
+    space = LagrangeFiniteElementSpace(mesh, 3)
+    uh = space.function(array=data['uh'])
+    assert np.allclose(uh, f(space.interpolation_points()))
+    A1 = LagrangeFiniteElementSpace(mesh, 1).stiff_matrix()
+    assert np.allclose(A1.toarray(), A0[nodeperm][:, nodeperm].toarray())
+
+    if method == 'rcm':
+        A = A1.tocoo()
+        B = A0.tocoo()
+        assert np.max(np.abs(A.row - A.col)) < np.max(np.abs(B.row - B.col))
+
+
+def test_autoreorder():
+    def f(p):
+        return 2*p[..., 0] + 3*p[..., 1]
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    mesh.autoreorder = 'hilbert'
+    u0 = f(mesh.entity('node'))
+    IM = mesh.bisect(returnim=True)
+    assert np.allclose(IM@u0, f(mesh.entity('node')))
+    u0 = f(mesh.entity('node'))
+    nodeIMatrix, _ = mesh.uniform_refine(returnim=True)
+    assert np.allclose(nodeIMatrix[-1]@u0, f(mesh.entity('node')))
+    node = mesh.entity('node')
+    assert np.all(np.diff(hilbert_code(node)) >= 0)
+
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    mesh.autoreorder = 'rcm'
+    u0 = f(mesh.entity('node'))
+    IM = mesh.bisect(returnim=True)
+    assert np.allclose(IM@u0, f(mesh.entity('node')))
+    mesh.uniform_refine()
+    assert np.isclose(np.sum(mesh.entity_measure('cell')), 1.0)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.common import scatter_add
+
+
+def add_at(target, index, value):
+    target = target.copy()
+    np.add.at(target, index, value)
+    return target
+
+
+@pytest.mark.parametrize('shape, vshape', [
+    ((20, ), (7, 3)),
+    ((20, 2), (7, 3, 2)),
+    ((20, 4, 5), (7, 3, 4, 5)), # 列数较多, 用稀疏矩阵求和
+    ])
+def test_scatter_add(shape, vshape):
+    target = np.random.rand(*shape)
+    index = np.random.randint(0, shape[0], size=vshape[:2])
+    value = np.random.rand(*vshape)
+
+    a = add_at(target, index, value)
+    b = scatter_add(target.copy(), index, value)
+    assert np.allclose(a, b)
+
+    if len(shape) == 2:
+        b = scatter_add(target.copy(), (index, np.s_[:]), value)
+        assert np.allclose(a, b)
+
+    # 常数, 可以广播的值, 复数和负数下标
+    assert np.allclose(add_at(target, index, 2.0),
+            scatter_add(target.copy(), index, 2.0))
+    value = np.random.rand(vshape[0], 1, *vshape[2:])
+    assert np.allclose(add_at(target, index, value),
+            scatter_add(target.copy(), index, value))
+    value = value + 1j*value
+    assert np.allclose(add_at(target+0j, -index, value),
+            scatter_add(target+0j, -index, value))
+
+
+def test_scatter_add_axis():
+    B = np.random.rand(4, 10)
+    idx = np.random.randint(0, 10, size=(6, 3))
+    val = np.random.rand(4, 6, 3)
+    assert np.allclose(add_at(B, (np.s_[:], idx), val),
+            scatter_add(B.copy(), (np.s_[:], idx), val))
+
+    deg = np.zeros(10, dtype=np.int_)
+    scatter_add(deg, idx, 1)
+    assert np.all(deg == np.bincount(idx.flat, minlength=10))
+
+    # 其它形式的下标交给 np.add.at
+    I = np.random.randint(0, 4, size=5)
+    J = np.random.randint(0, 10, size=5)
+    assert np.allclose(add_at(B, (I, J), 1.0), scatter_add(B.copy(), (I, J), 1.0))
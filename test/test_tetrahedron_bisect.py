@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.core import EdgeMidpointTable
+
+
+def test_edge_midpoint_table():
+    table = EdgeMidpointTable()
+    assert np.all(table.find(np.array([[0, 1], [2, 3]])) == -1)
+    table.insert(np.array([[5, 2], [0, 1]]), np.array([10, 11]))
+    table.insert(np.array([[3, 4]]), np.array([12]))
+    assert len(table) == 3
+    edge = np.array([[1, 0], [2, 5], [4, 3], [0, 2], [9, 8]])
+    assert np.all(table.find(edge) == [11, 10, 12, -1, -1])
+
+
+def test_tetrahedron_bisect():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    np.random.seed(0)
+    for i in range(4):
+        node = mesh.entity('node').copy()
+        bc = mesh.entity_barycenter('cell')
+        isMarkedCell = np.linalg.norm(bc - 0.3, axis=-1) < 0.4
+        IM = mesh.bisect(isMarkedCell, returnim=True)
+
+        # 线性函数的插值是精确的
+        f = lambda p: p[..., 0] + 2*p[..., 1] - 3*p[..., 2]
+        assert np.allclose(IM@f(node), f(mesh.entity('node')))
+
+        # 体积不变, 没有悬挂点: 边界面的面积之和为 6, 内部面两侧各一个单元
+        assert np.all(mesh.entity_measure('cell') > 0)
+        assert np.isclose(mesh.entity_measure('cell').sum(), 1.0)
+        isBdFace = mesh.ds.boundary_face_flag()
+        assert np.isclose(mesh.entity_measure('face')[isBdFace].sum(), 6.0)
+
+    # 网格中的数组不是 DynamicArray 存储的视图
+    assert mesh.entity('node').base is None
+    assert mesh.entity('cell').base is None
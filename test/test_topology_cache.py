@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import LagrangeTriangleMesh, LagrangeQuadrangleMesh
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'quad', 'tet'])
+def test_topology_cache(meshtype):
+    if meshtype == 'tet':
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=1, nz=1, meshtype='tet')
+    else:
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype=meshtype)
+    ds = mesh.ds
+
+    # 稠密和稀疏的形式分别缓存, 默认参数和显式给出的参数是同一个键
+    cell2cell = ds.cell_to_cell()
+    assert ds.cell_to_cell(return_sparse=False) is cell2cell
+    assert not cell2cell.flags.writeable
+    A = ds.cell_to_cell(return_sparse=True)
+    assert ds.cell_to_cell(return_sparse=True) is A
+    assert not A.data.flags.writeable
+    assert A.shape == (mesh.number_of_cells(), )*2
+
+    isBdNode = ds.boundary_node_flag()
+    assert ds.boundary_node_flag() is isBdNode
+    assert ds.node_to_node() is ds.node_to_node()
+    assert ds.node_to_cell() is ds.node_to_cell()
+    stat = ds.topocache.statistics()
+    assert stat['hit'] >= 5
+
+    # 加密后重新计算
+    mesh.uniform_refine()
+    assert ds.boundary_node_flag().shape == (mesh.number_of_nodes(), )
+    assert ds.node_to_node().shape == (mesh.number_of_nodes(), )*2
+    assert ds.topocache.statistics()['miss'] > stat['miss']
+
+    ds.clear()
+    assert ds.topocache.statistics()['size'] == 0
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'quad'])
+def test_lagrange_mesh(meshtype):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype=meshtype)
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+    if meshtype == 'tri':
+        lmesh = LagrangeTriangleMesh(node, cell, p=2)
+    else:
+        lmesh = LagrangeQuadrangleMesh(node, cell, p=2)
+
+    # 加密高阶网格不能修改缓存中的 cell_to_edge
+    NC = lmesh.number_of_cells()
+    lmesh.uniform_refine()
+    assert lmesh.number_of_cells() == 4*NC
+    assert lmesh.entity('cell').shape[1] == (6 if meshtype == 'tri' else 9)
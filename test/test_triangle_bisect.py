@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import copy
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.TriangleMesh import TriangleMeshDataStructure
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+def check_topology(mesh):
+    cell = mesh.entity('cell')
+    edge = mesh.entity('edge')
+    edge2cell = mesh.ds.edge2cell
+    localEdge = mesh.ds.localEdge
+    NE = len(edge)
+
+    # edge2cell[:, 0] 一侧的单元中边的方向和 edge 相同, 另一侧相反
+    e0 = cell[edge2cell[:, [0]], localEdge[edge2cell[:, 2]]]
+    e1 = cell[edge2cell[:, [1]], localEdge[edge2cell[:, 3]]]
+    isBdEdge = edge2cell[:, 0] == edge2cell[:, 1]
+    assert np.all(e0 == edge)
+    assert np.all(e1[~isBdEdge] == edge[~isBdEdge, ::-1])
+    assert np.all(e1[isBdEdge] == edge[isBdEdge])
+
+    # 和由 cell 重新生成的边相同 (编号不同)
+    ds = TriangleMeshDataStructure(mesh.number_of_nodes(), cell.copy())
+    assert ds.NE == NE
+    assert np.sum(ds.edge2cell[:, 0] == ds.edge2cell[:, 1]) == np.sum(isBdEdge)
+    assert np.array_equal(
+            np.unique(np.sort(ds.edge, axis=1), axis=0),
+            np.unique(np.sort(edge, axis=1), axis=0))
+
+
+def test_bisect_topology():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    rng = np.random.default_rng(0)
+    for i in range(6):
+        NC = mesh.number_of_cells()
+        mesh.bisect(rng.random(NC) < 0.3)
+        check_topology(mesh)
+        area = mesh.entity_measure('cell')
+        assert np.all(area > 0)
+        assert np.isclose(area.sum(), 1.0)
+
+    # 网格中的数组正好是实体的个数, 不是更大数组的视图
+    mesh.bisect()
+    assert mesh.entity('cell').base is None
+    assert mesh.entity('node').base is None
+    check_topology(mesh)
+
+    mesh.uniform_refine()
+    mesh.bisect()
+    check_topology(mesh)
+
+
+def test_bisect_keeps_old_arrays():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    mesh.bisect()
+    space = LagrangeFiniteElementSpace(mesh, 1)
+    cell2dof = space.cell_to_dof().copy()
+    cell = mesh.entity('cell')
+    edge2cell = mesh.ds.edge2cell
+    data = (cell.copy(), edge2cell.copy())
+
+    # 加密前取出的数组和旧网格上的空间在之后的加密中保持不变
+    rng = np.random.default_rng(2)
+    for i in range(2):
+        NC = mesh.number_of_cells()
+        mesh.bisect(rng.random(NC) < 0.5)
+    assert np.array_equal(cell, data[0])
+    assert np.array_equal(edge2cell, data[1])
+    assert np.array_equal(space.cell_to_dof(), cell2dof)
+
+
+@pytest.mark.parametrize('p', [1, 2, 3])
+def test_bisect_interpolation_matrix(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    rng = np.random.default_rng(1)
+    u = lambda x: np.sin(3*x[..., 0])*x[..., 1]**2
+    for i in range(3):
+        uh = LagrangeFiniteElementSpace(mesh, p).interpolation(u)
+        mesh0 = copy.deepcopy(mesh)
+        uh0 = LagrangeFiniteElementSpace(mesh0, p).function(array=uh)
+        NC = mesh.number_of_cells()
+        IM = mesh.bisect(rng.random(NC) < 0.4, returnim=True, p=p)
+
+        # 加密后的空间包含原来的空间, 插值前后是同一个函数
+        space = LagrangeFiniteElementSpace(mesh, p)
+        ipoint = space.interpolation_points()
+        assert IM.shape == (space.number_of_global_dofs(), len(uh))
+        assert np.allclose(IM@uh, uh0.point_value(ipoint))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+from scipy.special import comb
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.core import unique_entity
+from fealpy.mesh.LagrangeHexahedronMesh import LinearHexahedronMeshDataStructure
+
+
+def np_unique_entity(entity):
+    _, i0, j = np.unique(np.sort(entity, axis=1), return_index=True,
+            return_inverse=True, axis=0)
+    j = j.reshape(-1)
+    i1 = np.zeros(len(i0), dtype=np.int_)
+    i1[j] = np.arange(len(entity))
+    return i0, i1, j
+
+
+@pytest.mark.parametrize('k, NN', [(2, 50), (3, 50), (4, 30), (4, 10**6), (3, 3*10**6), (6, 7)])
+@pytest.mark.parametrize('nthreads, chunksize', [(1, None), (4, None), (3, 777)])
+def test_unique_entity(k, NN, nthreads, chunksize):
+    entity = np.random.default_rng(0).integers(0, NN, (10000, k))
+    i0, i1, j = unique_entity(entity, nthreads=nthreads, chunksize=chunksize)
+    r0, r1, rj = np_unique_entity(entity)
+    assert np.array_equal(i0, r0)
+    assert np.array_equal(i1, r1)
+    assert np.array_equal(j, rj)
+
+
+@pytest.mark.parametrize('k', [2, 3, 4])
+@pytest.mark.parametrize('nthreads, chunksize', [(1, None), (3, 777)])
+def test_unique_entity_colex(k, nthreads, chunksize):
+    # 和 LinearMeshDataStructure 原来的组合数编码的顺序一样
+    entity = np.random.default_rng(1).integers(0, 40, (10000, k))
+    index = np.sort(entity, axis=1)
+    I = sum(comb(index[:, i] + i, i + 1) for i in range(k))
+    _, r0, rj = np.unique(I, return_index=True, return_inverse=True)
+    i0, i1, j = unique_entity(entity, nthreads=nthreads, chunksize=chunksize,
+            colex=True)
+    assert np.array_equal(i0, r0)
+    assert np.array_equal(j, rj)
+
+
+def test_construct_face_with_large_index():
+    # 节点编号很大时, 原来的四次多项式键会溢出 int64
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='hex')
+    cell = mesh.entity('cell')
+    NN = mesh.number_of_nodes()
+    shift = 10**6
+    ds0 = LinearHexahedronMeshDataStructure(NN, cell)
+    ds = LinearHexahedronMeshDataStructure(NN + shift, cell + shift)
+    assert ds.NF == ds0.NF
+    assert np.array_equal(ds.face2cell, ds0.face2cell)
+    assert np.array_equal(ds.face - shift, ds0.face)
+    assert np.array_equal(ds.edge - shift, ds0.edge)
+
+
+@pytest.mark.parametrize('meshtype', ['tri', 'tet'])
+def test_construct_with_threads(meshtype):
+    if meshtype == 'tri':
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=10, ny=10, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=3, ny=3, nz=3, meshtype='tet')
+    ds = mesh.ds
+    edge = ds.edge
+    cell2edge = ds.cell_to_edge()
+    ds.nthreads = 4
+    ds.construct()
+    assert np.array_equal(ds.edge, edge)
+    assert np.array_equal(ds.cell_to_edge(), cell2edge)